@@ -1,12 +1,49 @@
 import sys
+import argparse
 
-from PySide6.QtWidgets import QApplication
+from .startup import StartupTimer
 
-from .window import MainWindow
 
+def run_gui(startup_report=False, quit_when_shown=False):
+    timer = StartupTimer()
+    if startup_report:
+        timer.import_subsystems()
 
-if __name__ == '__main__':
-    app = QApplication(sys.argv)
+    # imported here, not at the top, so the startup report can break them down
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtCore import QTimer
+    from .window import MainWindow
+    timer.mark('imports')
+
+    app = QApplication(sys.argv[:1])
+    timer.mark('QApplication')
     win = MainWindow()
+    timer.mark('MainWindow')
     win.show()
-    sys.exit(app.exec())
+
+    def shown():
+        timer.mark('first window shown')
+        if startup_report:
+            print(timer.report(), flush=True)
+        if quit_when_shown:
+            app.quit()
+
+    # runs once the event loop has processed the events queued by showing the window
+    QTimer.singleShot(0, shown)
+    return app.exec()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and not sys.argv[1].startswith('-'):
+        # a command: run headless, without importing Qt
+        from .cli import main
+        sys.exit(main(sys.argv[1:]))
+
+    parser = argparse.ArgumentParser(
+        prog='python -m annot',
+        epilog='Dataset commands (stats, merge, guess, export) run without the GUI: see "python -m annot <command> --help".'
+    )
+    parser.add_argument('--startup-report', action='store_true', help='print time taken by each step of starting up')
+    parser.add_argument('--quit-when-shown', action='store_true', help='exit as soon as the window has been shown (for benchmarking)')
+    args = parser.parse_args()
+    sys.exit(run_gui(args.startup_report, args.quit_when_shown))
@@ -1,26 +1,105 @@
 from typing import Tuple
 
-from matplotlib.path import Path
 import numpy as np
 
 from .class_labels import CLASS_COLOURS
+from .points import PointArray
+from .point_grid import PointGrid
 from .guess_label import guess_class
 
 
+def coco_annot(px, py, id_no, category_id: int, image_id=None) -> dict:
+    x1, x2, y1, y2 = np.min(px), np.max(px), np.min(py), np.max(py)
+    w, h = x2 - x1, y2 - y1
+    area = w*h
+    bbox = x1, y1, w, h
+    bbox = tuple([int(v) for v in bbox])
+    pjoined = np.zeros(2*len(px))
+    pjoined[::2] = px
+    pjoined[1::2] = py
+
+    if area < 1:
+        raise RuntimeError
+
+    return dict(
+        id=id_no,
+        image_id=image_id,
+        category_id=category_id,
+        bbox=bbox,
+        segmentation=[pjoined.astype(int).tolist()],
+        area=float(area),
+        iscrowd=0
+    )
+
+
 class Annotation:
 
+    GRID_CELL_SIZE = 16
+
     def __init__(self, image_size: Tuple[int, int], points=tuple(), class_label=1):
         self.image_width, self.image_height = self.image_size = image_size
-        self.points = list(points)
+        self._points = PointArray(points)
         self.id_no = None
         self.im_id = None
+        self._label_version = 0
         self.class_label = class_label
 
         self.is_editing = False
         self.is_selected = False
 
+        self._bounds = self._path = None
+        self._bounds_version = self._path_version = self._grid_version = None
+
+    def bounds(self) -> Tuple[float, float, float, float]:
+        """(x1, y1, x2, y2) bounding box of the points, cached until they change."""
+        if self._bounds_version != self.points.version:
+            arr = self.points.array
+            (x1, y1), (x2, y2) = arr.min(axis=0), arr.max(axis=0)
+            self._bounds = float(x1), float(y1), float(x2), float(y2)
+            self._bounds_version = self.points.version
+        return self._bounds
+
+    def point_grid(self) -> PointGrid:
+        """grid over the vertices, for finding those near a position; rebuilt when they change."""
+        if self._grid_version != self.points.version:
+            self._grid = PointGrid(self.points.array, self.GRID_CELL_SIZE)
+            self._grid_version = self.points.version
+        return self._grid
+
     def __contains__(self, pt):
-        return Path(self.points).contains_point(pt)
+        if len(self.points) < 3:
+            return False
+        x1, y1, x2, y2 = self.bounds()
+        if not (x1 <= pt[0] <= x2 and y1 <= pt[1] <= y2):
+            return False
+        if self._path_version != self.points.version:
+            # matplotlib is slow to import, and isn't needed until the first hit test
+            from matplotlib.path import Path
+            self._path = Path(self.points.array)
+            self._path_version = self.points.version
+        return self._path.contains_point(pt)
+
+    @property
+    def points(self) -> PointArray:
+        return self._points
+
+    @points.setter
+    def points(self, points):
+        self._points.set(points)
+
+    @property
+    def class_label(self) -> int:
+        return self._class_label
+
+    @class_label.setter
+    def class_label(self, label: int):
+        self._class_label = label
+        self._label_version += 1
+
+    @property
+    def version(self) -> int:
+        """increases whenever the points or the class of the annotation change."""
+        return self.points.version + self._label_version
 
     @property
     def colour(self):
@@ -31,30 +110,10 @@ class Annotation:
         self.class_label = label
 
     def as_coco_annot(self) -> dict:
-        points = np.array(self.points)
-        px = points[:, 0]
-        py = points[:, 1]
-        x1, x2, y1, y2 = min(px), max(px), min(py), max(py)
-        w, h = x2 - x1, y2 - y1
-        area = w*h
-        bbox = x1, y1, w, h
-        bbox = tuple([int(v) for v in bbox])
-        pjoined = np.zeros(2*len(px))
-        pjoined[::2] = px
-        pjoined[1::2] = py
-
-        if area < 1:
+        if len(self.points) < 3:
             raise RuntimeError
-
-        return dict(
-            id=self.id_no,
-            image_id=self.im_id,
-            category_id=self.class_label,
-            bbox=bbox,
-            segmentation=[[int(v) for v in pjoined]],
-            area=float(area),
-            iscrowd=0
-        )
+        points = self.points.array
+        return coco_annot(points[:, 0], points[:, 1], self.id_no, self.class_label, self.im_id)
 
     @classmethod
     def from_coco(cls, images_by_id, *, id, image_id: int, category_id: int, bbox, segmentation, area, iscrowd, **_) -> "Annotation":
@@ -72,6 +131,10 @@ class Annotation:
         rv.bbox = bbox
         return rv
 
+    @classmethod
+    def from_raw(cls, image_size: Tuple[int, int], segmentation, category_id: int) -> "Annotation":
+        return cls(image_size=image_size, points=np.reshape(segmentation, (-1, 2)), class_label=category_id)
+
     def cv_contour(self):
         pts_arr = np.array(self.points, dtype=int)
         return pts_arr[:, np.newaxis, :]
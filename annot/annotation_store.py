@@ -0,0 +1,190 @@
+from typing import Dict, List, Tuple, Iterator
+
+import numpy as np
+
+from .annotation import Annotation, coco_annot
+
+
+class RawAnnotations:
+    """
+    Compact, columnar storage of the annotations on one image as read from file: all
+    segmentation coordinates live in one float32 buffer, indexed by per-annotation offsets.
+    """
+
+    def __init__(self):
+        self.ids: List[int] = []
+        self.category_ids: List[int] = []
+        self.chunks: List[np.ndarray] = []
+        self.offsets = None
+        self.coords = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def append(self, id_no: int, category_id: int, segmentation: List[float]):
+        self.ids.append(id_no)
+        self.category_ids.append(category_id)
+        self.chunks.append(np.asarray(segmentation, dtype=np.float32))
+
+    def finalise(self):
+        if self.chunks:
+            lengths = [len(c) for c in self.chunks]
+            self.coords = np.concatenate(self.chunks)
+            self.chunks = []
+            self.offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=self.offsets[1:])
+        elif self.coords is None:
+            self.coords = np.zeros(0, dtype=np.float32)
+            self.offsets = np.zeros(1, dtype=np.int64)
+
+    def extend(self, other: "RawAnnotations"):
+        self.finalise()
+        other.finalise()
+        self.coords = np.concatenate([self.coords, other.coords])
+        self.offsets = np.concatenate([self.offsets, other.offsets[1:] + self.offsets[-1]])
+        self.ids.extend(other.ids)
+        self.category_ids.extend(other.category_ids)
+
+    def segmentation(self, i: int) -> np.ndarray:
+        return self.coords[self.offsets[i]:self.offsets[i+1]]
+
+    def as_coco_annots(self) -> Iterator[dict]:
+        for id_no, category_id, segmentation in self:
+            try:
+                yield coco_annot(segmentation[::2], segmentation[1::2], id_no, category_id)
+            except RuntimeError:
+                continue
+
+    def __iter__(self) -> Iterator[Tuple[int, int, np.ndarray]]:
+        self.finalise()
+        for i, (id_no, category_id) in enumerate(zip(self.ids, self.category_ids)):
+            yield id_no, category_id, self.segmentation(i)
+
+
+class ImageAnnotations:
+    """
+    Mapping of image id to the list of annotations on that image.
+
+    Annotations read from file are kept as `RawAnnotations` and only turned into `Annotation`
+    objects the first time an image's list is requested.
+    """
+
+    def __init__(self):
+        self.image_sizes: Dict[int, Tuple[int, int]] = {}
+        self.raw: Dict[int, RawAnnotations] = {}
+        self.annotations: Dict[int, List[Annotation]] = {}
+        self.next_id = 0
+
+    def new_id(self) -> int:
+        id_no = self.next_id
+        self.next_id += 1
+        return id_no
+
+    def add_image(self, im_id: int, size: Tuple[int, int]):
+        self.image_sizes[im_id] = size
+        if im_id not in self.raw and im_id not in self.annotations:
+            self.annotations[im_id] = []
+
+    def add_raw(self, im_id: int, id_no: int, category_id: int, segmentation: List[float]):
+        if im_id not in self.raw:
+            if self.annotations.get(im_id):
+                raise ValueError(f'Cannot add raw annotations to image {im_id}: already materialised.')
+            self.annotations.pop(im_id, None)
+            self.raw[im_id] = RawAnnotations()
+        self.raw[im_id].append(id_no, category_id, segmentation)
+        self.next_id = max(self.next_id, id_no + 1)
+
+    def finalise(self):
+        for raw in self.raw.values():
+            raw.finalise()
+
+    def is_materialised(self, im_id: int) -> bool:
+        return im_id not in self.raw
+
+    def materialise(self, im_id: int) -> List[Annotation]:
+        raw = self.raw.pop(im_id)
+        size = self.image_sizes[im_id]
+        annots = []
+        for id_no, category_id, segmentation in raw:
+            annot = Annotation.from_raw(size, segmentation, category_id)
+            annot.im_id = im_id
+            annot.id_no = annot.coco_id = id_no
+            annots.append(annot)
+        self.annotations[im_id] = annots
+        return annots
+
+    def as_raw(self, im_id: int) -> RawAnnotations:
+        """annotations on image `im_id` in packed form, without materialising them."""
+        if im_id in self.raw:
+            raw = self.raw[im_id]
+            raw.finalise()
+            return raw
+        raw = RawAnnotations()
+        for annot in self.annotations[im_id]:
+            raw.append(annot.id_no, annot.class_label, annot.points.array.reshape(-1))
+        raw.finalise()
+        return raw
+
+    def set_raw(self, im_id: int, raw: RawAnnotations):
+        """replace the annotations on image `im_id` with raw, to be materialised when next needed."""
+        self.annotations.pop(im_id, None)
+        self.raw[im_id] = raw
+
+    def count(self, im_id: int) -> int:
+        if im_id in self.raw:
+            return len(self.raw[im_id])
+        return len(self.annotations[im_id])
+
+    def __getitem__(self, im_id: int) -> List[Annotation]:
+        if im_id in self.raw:
+            return self.materialise(im_id)
+        return self.annotations[im_id]
+
+    def __setitem__(self, im_id: int, annots: List[Annotation]):
+        self.raw.pop(im_id, None)
+        self.annotations[im_id] = annots
+
+    def __contains__(self, im_id: int) -> bool:
+        return im_id in self.raw or im_id in self.annotations
+
+    def __len__(self):
+        return len(self.raw) + len(self.annotations)
+
+    def keys(self):
+        return [*self.raw.keys(), *self.annotations.keys()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def values(self):
+        for im_id in self.keys():
+            yield self[im_id]
+
+    def items(self):
+        for im_id in self.keys():
+            yield im_id, self[im_id]
+
+    def total(self) -> int:
+        return sum(self.count(im_id) for im_id in self.keys())
+
+    def merge_image(self, im_id: int, other: "ImageAnnotations", other_im_id: int):
+        """
+        add the annotations of `other_im_id` in `other` to those of image `im_id`, without materialising
+        where possible. Merged annotations are given new ids, unique in this store.
+        """
+        if other_im_id in other.raw:
+            raw = other.raw.pop(other_im_id)
+            raw.ids = [self.new_id() for _ in raw.ids]
+            if im_id in self.raw:
+                self.raw[im_id].extend(raw)
+                return
+            elif not self.annotations.get(im_id):
+                self.annotations.pop(im_id, None)
+                self.raw[im_id] = raw
+                return
+            other.raw[other_im_id] = raw
+        annots = other[other_im_id]
+        for annot in annots:
+            annot.im_id = im_id
+            annot.id_no = self.new_id()
+        self[im_id].extend(annots)
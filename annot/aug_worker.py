@@ -0,0 +1,78 @@
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+from PySide6.QtCore import QObject, Signal
+
+from .augmentations import Augmentation
+
+
+def apply_augmentations(image: np.ndarray, transform: Augmentation) -> np.ndarray:
+    f_array = image.astype(np.float32)
+    transform(f_array)
+    np.clip(f_array, 0.0, 255.0, out=f_array)
+    return f_array.astype(np.uint8)
+
+
+class AugmentationWorker(QObject):
+    """
+    Applies augmentations to images in a background thread. Only the latest request is kept:
+    one submitted while another is being worked on replaces any still waiting, and results of
+    requests which have been superseded are dropped rather than emitted.
+
+    `done(generation, image)` is emitted from the worker thread; connected slots on the GUI
+    thread are queued.
+    """
+
+    done = Signal(int, object)
+
+    def __init__(self):
+        super().__init__()
+        self.generation = 0
+        self.pending: Optional[Tuple[int, np.ndarray, Augmentation]] = None
+        self.busy = False
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def submit(self, image: np.ndarray, transform: Augmentation) -> int:
+        """queue image to be augmented; transform must not change while it is applied (see `Augmentation.frozen`)."""
+        with self.condition:
+            self.generation += 1
+            self.pending = self.generation, image, transform
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='augmentation', daemon=True)
+                self.thread.start()
+            self.condition.notify()
+            return self.generation
+
+    def cancel(self):
+        """drop any pending or in-progress request."""
+        with self.condition:
+            self.generation += 1
+            self.pending = None
+
+    def is_pending(self) -> bool:
+        with self.condition:
+            return self.busy or self.pending is not None
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None:
+                    self.condition.wait()
+                generation, image, transform = self.pending
+                self.pending = None
+                self.busy = True
+
+            try:
+                result = apply_augmentations(image, transform)
+            except Exception as e:
+                print(f'Augmentation failed: {e}')
+                result = None
+
+            with self.condition:
+                self.busy = False
+                if result is None or generation != self.generation:
+                    continue
+            self.done.emit(generation, result)
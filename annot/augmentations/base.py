@@ -1,11 +1,29 @@
+import copy
+from typing import Optional
+
 import numpy as np
 
 
 class Augmentation:
 
+    # whether each output pixel only depends on the same input pixel, so the augmentation can be
+    # folded into a lookup table
+    is_pointwise = False
+
     def __init__(self, name: str):
         self.name = name
 
+    def is_active(self) -> bool:
+        """False if the augmentation currently leaves the image unchanged."""
+        return True
+
+    def set_value(self, value):
+        self.value = value
+
+    def frozen(self) -> 'Augmentation':
+        """copy with the current parameters, which can be applied while the widgets change."""
+        return copy.copy(self)
+
     def __call__(self, image: np.ndarray):
         self.apply_to_image(image)
 
@@ -15,5 +33,9 @@ class Augmentation:
     def reset(self):
         raise NotImplementedError
 
+    def stats(self) -> Optional[str]:
+        """description of the last application, e.g. its timing, if there is one."""
+        return None
+
     def widget(self, update_f):
         raise NotImplementedError
@@ -8,19 +8,26 @@ from .base import Augmentation
 
 class BrightnessAdjust(Augmentation):
 
+    is_pointwise = True
+
     def __init__(self):
         super().__init__('Brightness')
         self.step = 0.05
+        self.value = 0
         self.w = None
 
+    def is_active(self) -> bool:
+        return self.value != 0
+
     def apply_to_image(self, image: np.ndarray):
-        image += self.w.value() * self.step
+        image += self.value * self.step
 
     def widget(self, update_f):
         self.w = QSlider(Qt.Orientation.Horizontal)
         self.w.setMinimum(int(-127 / self.step))
         self.w.setValue(0)
         self.w.setMaximum(int(127 / self.step))
+        self.w.valueChanged.connect(self.set_value)
         self.w.valueChanged.connect(update_f)
         return self.w
 
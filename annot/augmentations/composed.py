@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 
 import numpy as np
 
@@ -11,10 +11,34 @@ class ComposedAugmentations(Augmentation):
         super().__init__('')
         self.augs = augs
 
+    def active(self) -> List[Augmentation]:
+        return [aug for aug in self.augs if aug.is_active()]
+
+    def is_active(self) -> bool:
+        return bool(self.active())
+
     def apply_to_image(self, image: np.ndarray):
-        for aug in self.augs:
+        for aug in self.active():
             aug.apply_to_image(image)
 
+    def frozen(self) -> 'ComposedAugmentations':
+        return ComposedAugmentations([aug.frozen() for aug in self.active()])
+
+    def lookup_table(self) -> Optional[np.ndarray]:
+        """
+        uint8 lookup table equivalent to applying the augmentations to a uint8 image and clipping
+        the result, or None if any active augmentation isn't point-wise. Values are float32, as
+        images are when augmented (see `apply_augmentations`), so that they round the same way.
+        """
+        active = self.active()
+        if not all(aug.is_pointwise for aug in active):
+            return None
+        values = np.arange(256, dtype=np.float32)
+        for aug in active:
+            aug.apply_to_image(values)
+        np.clip(values, 0.0, 255.0, out=values)
+        return values.astype(np.uint8)
+
     def widget(self, update_f):
         return [(aug.name, aug.widget(update_f)) for aug in self.augs]
 
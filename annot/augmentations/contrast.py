@@ -8,13 +8,19 @@ from .base import Augmentation
 
 class ContrastAdjust(Augmentation):
 
+    is_pointwise = True
+
     def __init__(self):
         super().__init__('Contrast')
         self.step = 0.05
+        self.value = int(1.0 / self.step)
         self.w = None
 
+    def is_active(self) -> bool:
+        return self.value != int(1.0 / self.step)
+
     def apply_to_image(self, image: np.ndarray):
-        v = self.w.value() * self.step
+        v = self.value * self.step
         image *= v
 
     def widget(self, update_f):
@@ -22,6 +28,7 @@ class ContrastAdjust(Augmentation):
         self.w.setMinimum(int(0.1 / self.step))
         self.w.setValue(int(1.0 / self.step))
         self.w.setMaximum(int(5.0 / self.step))
+        self.w.valueChanged.connect(self.set_value)
         self.w.valueChanged.connect(update_f)
         return self.w
 
@@ -1,28 +1,70 @@
+from typing import Callable, Dict
+
 import numpy as np
-import scipy.ndimage
 
-from PySide6.QtWidgets import QCheckBox
+from PySide6.QtWidgets import QCheckBox, QSpinBox, QWidget, QHBoxLayout
 
 from .base import Augmentation
+from .filter_engine import FilterEngine
 
 
 class Filter2D_Aug(Augmentation):
 
-    def __init__(self, kernel, name):
+    MIN_SIZE = 3
+    MAX_SIZE = 51
+
+    def __init__(self, make_kernel: Callable[[int], np.ndarray], name, size=3):
         super().__init__(name)
-        self.kernel = kernel
+        self.make_kernel = make_kernel
+        self.default_size = size
+        self.size = size
+        self.engines: Dict[int, FilterEngine] = {}
+        self.value = False
         self.w = None
+        self.size_w = None
+
+    @property
+    def engine(self) -> FilterEngine:
+        engine = self.engines.get(self.size)
+        if engine is None:
+            engine = self.engines[self.size] = FilterEngine(self.make_kernel(self.size))
+        return engine
+
+    def is_active(self) -> bool:
+        return self.value
 
     def apply_to_image(self, image: np.ndarray):
-        if self.w.isChecked():
-            out = scipy.ndimage.convolve(image, self.kernel)
-            image[:] = out
+        if self.value:
+            image[:] = self.engine(image)
+
+    def stats(self) -> str:
+        return self.engine.stats()
+
+    def set_size(self, size: int):
+        self.size = size | 1
 
     def widget(self, update_f):
+        w = QWidget()
+        w.layout = QHBoxLayout(w)
+        w.layout.setContentsMargins(0, 0, 0, 0)
+
         self.w = QCheckBox('active?')
         self.w.setChecked(False)
+        self.w.toggled.connect(self.set_value)
         self.w.clicked.connect(update_f)
-        return self.w
+        w.layout.addWidget(self.w)
+
+        self.size_w = QSpinBox()
+        self.size_w.setRange(self.MIN_SIZE, self.MAX_SIZE)
+        self.size_w.setSingleStep(2)
+        self.size_w.setSuffix(' px')
+        self.size_w.setValue(self.size)
+        self.size_w.setToolTip('Kernel size')
+        self.size_w.valueChanged.connect(self.set_size)
+        self.size_w.valueChanged.connect(lambda _: self.value and update_f())
+        w.layout.addWidget(self.size_w)
+        return w
 
     def reset(self):
         self.w.setChecked(False)
+        self.size_w.setValue(self.default_size)
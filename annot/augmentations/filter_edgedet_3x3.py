@@ -3,11 +3,18 @@ import numpy as np
 from .filter_base import Filter2D_Aug
 
 
+def edge_kernel(k: int) -> np.ndarray:
+    """k = 3 gives
+        [-1, -1, -1],
+        [-1, 8, -1],
+        [-1, -1, -1]
+    """
+    kernel = -np.ones((k, k))
+    kernel[k // 2, k // 2] = k*k - 1
+    return kernel
+
+
 class EdgeDet(Filter2D_Aug):
 
     def __init__(self):
-        super().__init__(np.array([
-                [-1, -1, -1],
-                [-1, 8, -1],
-                [-1, -1, -1]
-            ]), 'Edge Detection')
+        super().__init__(edge_kernel, 'Edge Detection')
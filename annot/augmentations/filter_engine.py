@@ -0,0 +1,72 @@
+import time
+from typing import Optional
+
+import numpy as np
+import cv2
+
+
+class FilterEngine:
+    """
+    Convolution of float32 images with a fixed kernel, with the same result as
+    `scipy.ndimage.convolve(image, kernel)` (reflected borders), but picking the cheapest way
+    to compute it from the kernel's structure:
+
+    - box: a constant kernel, done with running sums, so the cost doesn't depend on its size
+    - centre+box: a box plus a different centre weight (e.g. edge detection): image*a + box*b
+    - separable: a rank one kernel, done as a row pass then a column pass
+    - dense: anything else, with cv2.filter2D
+
+    Kernels of even size are centred as scipy centres them, on element (kh // 2, kw // 2).
+    """
+
+    BORDER = cv2.BORDER_REFLECT
+
+    def __init__(self, kernel: np.ndarray):
+        self.kernel = np.asarray(kernel, dtype=np.float32)
+        kh, kw = self.kernel.shape
+        # of the flipped kernel, which cv2 correlates with
+        self.anchor = (kw - 1 - kw // 2, kh - 1 - kh // 2)
+        self.method = 'dense'
+        self.centre_weight = self.box_weight = 0.0
+        self.kx = self.ky = None
+        self.last_ms: Optional[float] = None
+        self.analyse()
+
+    def analyse(self):
+        k = self.kernel
+        kh, kw = k.shape
+        centre = k[kh // 2, kw // 2]
+        others = np.delete(k.reshape(-1), (kh // 2) * kw + kw // 2)
+        if others.size and np.allclose(others, others[0]):
+            self.box_weight = float(others[0]) * kh * kw
+            self.centre_weight = float(centre - others[0])
+            self.method = 'box' if np.isclose(centre, others[0]) else 'centre+box'
+            return
+
+        u, s, vt = np.linalg.svd(k.astype(float))
+        if s[0] > 0 and np.allclose(s[1:], 0, atol=1e-6 * s[0]):
+            # convolution flips the kernel, cv2 correlates
+            self.ky = (u[:, 0] * np.sqrt(s[0]))[::-1].astype(np.float32)
+            self.kx = (vt[0] * np.sqrt(s[0]))[::-1].astype(np.float32)
+            self.method = 'separable'
+
+    def __call__(self, image: np.ndarray) -> np.ndarray:
+        t = time.perf_counter()
+        image = np.asarray(image, dtype=np.float32)
+        kh, kw = self.kernel.shape
+        if self.method in ('box', 'centre+box'):
+            out = cv2.boxFilter(image, -1, (kw, kh), anchor=self.anchor, normalize=True, borderType=self.BORDER)
+            out *= self.box_weight
+            if self.centre_weight:
+                out += self.centre_weight * image
+        elif self.method == 'separable':
+            out = cv2.sepFilter2D(image, -1, self.kx, self.ky, anchor=self.anchor, borderType=self.BORDER)
+        else:
+            out = cv2.filter2D(image, -1, self.kernel[::-1, ::-1], anchor=self.anchor, borderType=self.BORDER)
+        self.last_ms = (time.perf_counter() - t) * 1000
+        return out
+
+    def stats(self) -> str:
+        kh, kw = self.kernel.shape
+        timing = f', {self.last_ms:.1f} ms' if self.last_ms is not None else ''
+        return f'{kw}x{kh} {self.method}{timing}'
@@ -6,10 +6,4 @@ from .filter_base import Filter2D_Aug
 class Smooth(Filter2D_Aug):
 
     def __init__(self):
-        super().__init__(np.array([
-                [1, 1, 1],
-                [1, 1, 1],
-                [1, 1, 1]
-            ])*(1./9.),
-            'Smoothing'
-        )
+        super().__init__(lambda k: np.ones((k, k)) * (1./(k*k)), 'Smoothing')
@@ -1,9 +1,10 @@
-try:
-    import torch
-    import torchvision
+from importlib.util import find_spec
+
+# torch is only imported when the features are first needed: check it's there without importing it
+if find_spec('torch') is not None and find_spec('torchvision') is not None:
 
     from .resnet_featdet import ResNetFeatDet
 
-except ImportError:
+else:
 
     ResNetFeatDet = None
@@ -1,6 +1,14 @@
+import os
+import glob
+import hashlib
+import tempfile
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
 import numpy as np
-import torch
-from torchvision.models import resnet18, ResNet18_Weights
 import cv2
 
 from PySide6.QtWidgets import QComboBox
@@ -9,53 +17,273 @@ from ..base import Augmentation
 
 
 class ResNetFeatDet(Augmentation):
+    """
+    Mean activation of resnet18's layer1 to layer4 (levels 1 to 4), resized to the image.
+
+    Features are of the image as read (see `set_source`), not as changed by the adjustments
+    before this one, so that they can be looked up by file. All the levels of an image are
+    computed together, in one forward pass, and cached: in memory for the most recently used
+    images, and on disk in CACHE_DIR, keyed on the image's path and modification time.
+    The disk cache is kept under MAX_CACHE_BYTES by deleting the files least recently used.
+
+    torch is imported, and the model loaded, when features are first computed.
+    """
+
+    N_LEVELS = 4
+    # images sent to the precompute process at a time
+    PRECOMPUTE_CHUNK_SIZE = 32
+    MEMORY_CACHE_SIZE = 32
+    CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'seganno', 'resnet18')
+    MAX_CACHE_BYTES = 2 << 30
+
+    # shared by copies (see `frozen`), so it's only loaded once
+    _model = None
+    _model_lock = threading.Lock()
+    # size of the disk cache, counted when first written to
+    _cache_bytes = None
+    _cache_lock = threading.Lock()
 
     def __init__(self):
         super().__init__('ResNet (ImageNet)')
-        self.model = resnet18(weights=ResNet18_Weights.DEFAULT)
-        self.model.eval()
+        self.features: Dict[str, List[np.ndarray]] = OrderedDict()
+        self.lock = threading.Lock()
+        # (key, image) of the image as read
+        self.source: Optional[Tuple[str, np.ndarray]] = None
+        self.value = 0
         self.w = None
 
+    @property
+    def model(self):
+        cls = type(self)
+        with cls._model_lock:
+            if cls._model is None:
+                from torchvision.models import resnet18, ResNet18_Weights
+                print('Loading resnet18')
+                model = resnet18(weights=ResNet18_Weights.DEFAULT)
+                model.eval()
+                cls._model = model
+        return cls._model
+
+    def is_active(self) -> bool:
+        return self.value > 0
+
+    def set_source(self, image_fn: Optional[str], image: np.ndarray):
+        """the image features are computed from, as read from image_fn (None if it isn't from a file)."""
+        try:
+            key = self.file_key(image_fn) if image_fn else self.key(image)
+        except OSError:
+            key = self.key(image)
+        self.source = key, image
+
     def apply_to_image(self, image: np.ndarray):
-        image[:] = self.inference(image, self.w.currentIndex())
+        if self.source is not None and self.source[1].shape == image.shape[:2]:
+            key, source = self.source
+        else:
+            # not told what the image is: features of it as it is now
+            key, source = self.key(image), image
+        image[:] = self.inference(key, source, self.value)
 
-    def inference(self, image: np.ndarray, level: int):
+    @staticmethod
+    def file_key(image_fn: str) -> str:
+        stat = os.stat(image_fn)
+        h = hashlib.blake2b(os.path.normcase(os.path.abspath(image_fn)).encode(), digest_size=16)
+        h.update(f':{stat.st_mtime_ns}:{stat.st_size}'.encode())
+        return h.hexdigest()
 
-        if not level:
-            return image
+    @staticmethod
+    def key(image: np.ndarray) -> str:
+        image = np.ascontiguousarray(image)
+        h = hashlib.blake2b(image.data, digest_size=16)
+        h.update(f'{image.dtype}{image.shape}'.encode())
+        return h.hexdigest()
+
+    def cache_path(self, key: str) -> str:
+        return os.path.join(self.CACHE_DIR, f'{key}.npz')
+
+    def remember(self, key: str, features: List[np.ndarray]):
+        with self.lock:
+            self.features[key] = features
+            self.features.move_to_end(key)
+            while len(self.features) > self.MEMORY_CACHE_SIZE:
+                self.features.popitem(last=False)
+
+    def cached_features(self, key: str) -> Optional[List[np.ndarray]]:
+        with self.lock:
+            features = self.features.get(key)
+            if features is not None:
+                self.features.move_to_end(key)
+                return features
 
-        h, w = image.shape
-        if len(image.shape) < 3:
-            image = np.stack([image, image, image], -1)
+        path = self.cache_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as f:
+                features = [f[f'level{i}'] for i in range(1, self.N_LEVELS + 1)]
+            # modification time is when last used, for eviction
+            os.utime(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f'Ignoring unreadable feature cache "{path}": {e}')
+            return None
+        self.remember(key, features)
+        return features
 
-        x = torch.tensor(image.astype(float) / 255.).permute(2, 0, 1).float().unsqueeze(0)
+    def store(self, key: str, features: List[np.ndarray]):
+        os.makedirs(self.CACHE_DIR, exist_ok=True)
+        path = self.cache_path(key)
+        # a name of its own: the same features may be being stored by another thread or process
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.CACHE_DIR)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **{f'level{i}': x for i, x in enumerate(features, 1)})
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self.added_to_cache(os.path.getsize(path))
+
+    @classmethod
+    def added_to_cache(cls, nbytes: int):
+        with cls._cache_lock:
+            if cls._cache_bytes is None:
+                cls._cache_bytes = cls.evict(cls.MAX_CACHE_BYTES)
+            else:
+                cls._cache_bytes += nbytes
+            if cls._cache_bytes > cls.MAX_CACHE_BYTES:
+                # to a little under the limit, so that it isn't gone through again on every store
+                cls._cache_bytes = cls.evict(cls.MAX_CACHE_BYTES * 9 // 10)
+
+    @classmethod
+    def evict(cls, max_bytes: int) -> int:
+        """delete least recently used files from the disk cache until it is no bigger than max_bytes; its size after."""
+        files = []
+        for path in glob.glob(os.path.join(cls.CACHE_DIR, '*.npz')):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        return total
+
+    def clear_cache(self):
+        """forget all features, in memory and on disk."""
+        with self.lock:
+            self.features.clear()
+        with self._cache_lock:
+            type(self)._cache_bytes = self.evict(0)
+
+    def forward(self, batch: np.ndarray) -> List[np.ndarray]:
+        """mean activations of a batch of (N, H, W) grayscale images: an (N, h, w) array per level."""
+        import torch
+        x = torch.from_numpy(np.ascontiguousarray(batch, dtype=np.float32) / 255.)
+        x = x.unsqueeze(1).expand(-1, 3, -1, -1)
+        levels = []
         with torch.no_grad():
             x = self.model.conv1(x)
             x = self.model.bn1(x)
             x = self.model.relu(x)
             x = self.model.maxpool(x)
 
-            x = self.model.layer1(x)
+            for layer in [self.model.layer1, self.model.layer2, self.model.layer3, self.model.layer4]:
+                x = layer(x)
+                levels.append(torch.mean(x, 1).numpy())
+        return levels
 
-            if level >= 2:
-                x = self.model.layer2(x)
+    def features_of(self, key: str, image: np.ndarray) -> List[np.ndarray]:
+        features = self.cached_features(key)
+        if features is None:
+            features = [level[0] for level in self.forward(image[None])]
+            self.remember(key, features)
+            self.store(key, features)
+        return features
 
-                if level >= 3:
-                    x = self.model.layer3(x)
+    def inference(self, key: str, image: np.ndarray, level: int):
 
-                    if level >= 4:
-                        x = self.model.layer4(x)
+        if not level:
+            return image
 
-            x = torch.mean(x, 1)
-            x = (np.array(x[0]) * 255.).astype(np.uint8)
+        h, w = image.shape[:2]
+        x = self.features_of(key, image)[level - 1]
+        x = (x * 255.).astype(np.uint8)
         return cv2.resize(x, (w, h))
 
+    def precompute(self, image_fns: List[str], n_threads: Optional[int] = None, batch_size: int = 4,
+                   progress: Callable[[int, int], None] = lambda i, n: None):
+        """
+        compute features of images which aren't cached yet, and store them on disk. This is done
+        in a process of its own, which torch is told to use n_threads in: the number of threads is
+        global to a process, and changing it here would change it for everything else using torch.
+        """
+        chunks = [image_fns[i:i + self.PRECOMPUTE_CHUNK_SIZE] for i in range(0, len(image_fns), self.PRECOMPUTE_CHUNK_SIZE)]
+        n, done = len(image_fns), 0
+        progress(0, n)
+        # spawned, not forked, as this process has Qt's threads running
+        with ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_set_num_threads, initargs=(n_threads,),
+        ) as pool:
+            futures = [pool.submit(_precompute_chunk, chunk, batch_size) for chunk in chunks]
+            for future in as_completed(futures):
+                done += future.result()
+                progress(done, n)
+
+    def compute_files(self, image_fns: List[str], batch_size: int) -> int:
+        """compute and store features of those of image_fns not cached yet; images of the same size are run through the network in batches."""
+        batches: Dict[Tuple[int, int], List[Tuple[str, np.ndarray]]] = {}
+        for fn in image_fns:
+            try:
+                key = self.file_key(fn)
+            except OSError as e:
+                print(f'Failed to read image {fn}: {e}')
+                continue
+            if os.path.exists(self.cache_path(key)):
+                continue
+            image = cv2.imread(fn, cv2.IMREAD_GRAYSCALE)
+            if image is None:
+                print(f'Failed to read image {fn}')
+            else:
+                batch = batches.setdefault(image.shape, [])
+                batch.append((key, image))
+                if len(batch) >= batch_size:
+                    self.compute_batch(batch)
+                    batch.clear()
+        for batch in batches.values():
+            if batch:
+                self.compute_batch(batch)
+        return len(image_fns)
+
+    def compute_batch(self, batch: List[Tuple[str, np.ndarray]]):
+        levels = self.forward(np.stack([image for _, image in batch]))
+        for j, (key, _) in enumerate(batch):
+            self.store(key, [level[j] for level in levels])
+
     def widget(self, update_f):
         self.w = QComboBox()
         self.w.addItems([str(i) for i in range(5)])
         self.w.setCurrentIndex(0)
+        self.w.currentIndexChanged.connect(self.set_value)
         self.w.currentIndexChanged.connect(update_f)
         return self.w
 
     def reset(self):
         self.w.setCurrentIndex(0)
+
+
+def _set_num_threads(n_threads: Optional[int]):
+    if n_threads:
+        import torch
+        torch.set_num_threads(n_threads)
+
+
+def _precompute_chunk(image_fns: List[str], batch_size: int) -> int:
+    return ResNetFeatDet().compute_files(image_fns, batch_size)
@@ -1,16 +1,21 @@
 import os
+import math
 from enum import Enum
+from weakref import WeakKeyDictionary
 from typing import Optional
 
 import numpy as np
 import cv2
 
 from PySide6.QtWidgets import QWidget
-from PySide6.QtGui import QPaintEvent, QPainter, QMouseEvent, QWheelEvent, QColor, QImage, QPainterPath, QPen
-from PySide6.QtCore import Qt
+from PySide6.QtGui import QPaintEvent, QPainter, QMouseEvent, QWheelEvent, QColor, QImage, QPainterPath, QPen, QPolygonF, QRegion
+from PySide6.QtCore import Qt, QPoint, QPointF, QRect, QRectF, QTimer, Signal
 
 from .annotation import Annotation
 from .wheel_state import WheelState
+from .tile_pyramid import TilePyramid
+from .aug_worker import AugmentationWorker
+from .simplify import merge_within_cells
 
 
 class InputState(Enum):
@@ -20,8 +25,37 @@ class InputState(Enum):
 
 
 class Canvas(QWidget):
+    """
+    Image and annotations, drawn in world coordinates: image pixel coordinates shifted by OFFSET.
+
+    In viewport mode the widget fills its container and a view transform (`view_offset` and
+    `scale`) maps world coordinates to the widget; only the part of the image in view, and
+    the annotations whose bounding boxes intersect it, are drawn, and panning and zooming just
+    change the transform. Otherwise the widget is resized to the scaled image and moved
+    around its container to pan.
+
+    When zoomed out, the image is drawn from the tiles of a downsampled level of a `TilePyramid`
+    (viewport mode only).
+
+    Repaints are scheduled rather than done straight away: the regions needing repainting are
+    collected and updated together at most once a frame (see `schedule_repaint`), and painting
+    skips whatever is outside them. Annotations other than the one being edited are drawn from a
+    cached overlay (see `static_overlay`), so a frame costs the same however many there are.
+    """
+
+    level_ready = Signal()
+    FRAME_MS = 16
+    # around annotations, for borders, vertex handles and tool widgets: in image pixels, and on screen
+    DAMAGE_MARGIN = 8
+    DAMAGE_MARGIN_PX = 4
+    # outline vertices closer than this on screen (px) are merged when drawing
+    LOD_PIXEL = 0.5
+    # largest overlay of static annotations to cache (pixels), and the margin around the image in it (px)
+    MAX_OVERLAY_PIXELS = 1 << 23
+    OVERLAY_MARGIN_PX = 8
 
     OFFSET = 500
+    VIEWPORT_MODE = True
 
     def __init__(self, app):
         super().__init__()
@@ -32,13 +66,35 @@ class Canvas(QWidget):
         self.mouse_screen_pos = (0, 0)
         self.pan_mouse_start_pos = (0, 0)
         self.pan_start_pos = None
+        self.view_offset = (0, 0)
 
         self.image_array: Optional[np.ndarray] = None
         self.image: Optional[QImage] = None
         self.image_size = (1000, 1000)
+        self.path_cache = WeakKeyDictionary()
+        self.overlay: Optional[QImage] = None
+        self.overlay_key = None
+        self.pyramid: Optional[TilePyramid] = None
+        self.level_ready.connect(self.update)
+
+        self.aug_worker = AugmentationWorker()
+        self.aug_worker.done.connect(self.augmented)
+        # the worker is sent at most one request a frame: any made meanwhile are sent when the frame is up
+        self.aug_pending = False
+        self.aug_timer = QTimer(self)
+        self.aug_timer.setSingleShot(True)
+        self.aug_timer.setInterval(self.FRAME_MS)
+        self.aug_timer.timeout.connect(self.flush_augmentation)
+
+        self.damage = QRegion()
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.setInterval(self.FRAME_MS)
+        self.frame_timer.timeout.connect(self.flush_repaint)
 
         self.setMouseTracking(True)
-        self.resize(1000 + 2*self.OFFSET, 1000 + 2*self.OFFSET)
+        if not self.VIEWPORT_MODE:
+            self.resize(1000 + 2*self.OFFSET, 1000 + 2*self.OFFSET)
         self.reset_position()
         self.setCursor(Qt.CursorShape.BlankCursor)
         self.wheel_state = WheelState()
@@ -49,17 +105,99 @@ class Canvas(QWidget):
     def scale(self):
         self.scale_i = max(min(self.scale_i, len(self.scales)-1), 0)
         return self.scales[self.scale_i]
+
+    @property
+    def origin(self):
+        """widget position of the world origin."""
+        return self.view_offset if self.VIEWPORT_MODE else (0, 0)
+
+    def to_world(self, x: float, y: float):
+        ox, oy = self.origin
+        return (x - ox)/self.scale, (y - oy)/self.scale
+
+    def visible_world_rect(self, rect: Optional[QRect] = None) -> QRectF:
+        rect = self.rect() if rect is None else rect
+        x1, y1 = self.to_world(rect.left(), rect.top())
+        x2, y2 = self.to_world(rect.right() + 1, rect.bottom() + 1)
+        return QRectF(x1, y1, x2 - x1, y2 - y1)
+
+    def widget_rect(self, x1: float, y1: float, x2: float, y2: float, margin: float = 0) -> QRect:
+        """widget area covering the image rect (x1, y1)-(x2, y2), widened by margin image pixels."""
+        ox, oy = self.origin
+        s = self.scale
+        m = self.DAMAGE_MARGIN_PX
+        left = math.floor(ox + (x1 + self.OFFSET - margin)*s - m)
+        top = math.floor(oy + (y1 + self.OFFSET - margin)*s - m)
+        right = math.ceil(ox + (x2 + self.OFFSET + margin)*s + m)
+        bottom = math.ceil(oy + (y2 + self.OFFSET + margin)*s + m)
+        return QRect(left, top, right - left + 1, bottom - top + 1)
+
+    def annotation_region(self, annot) -> QRegion:
+        if annot is None or not len(annot.points):
+            return QRegion()
+        return QRegion(self.widget_rect(*annot.bounds(), margin=self.DAMAGE_MARGIN))
+
+    def interaction_region(self) -> QRegion:
+        """parts of the widget showing the cursor, and the annotation being edited with the tool's widgets."""
+        region = QRegion()
+        if self.mouse_pos is None:
+            return region
+        tool = self.get_current_tool()
+        x, y = self.mouse_pos
+        r = tool.cursor_radius()
+        region += self.widget_rect(x - r, y - r, x + r, y + r)
+        wx, wy = self.mouse_widget_pos
+        region += self.widget_rect(wx - self.OFFSET, wy - self.OFFSET, wx - self.OFFSET, wy - self.OFFSET, margin=2)
+
+        current = self.app.particle_browser.current
+        if current is not None:
+            bounds = [current.bounds()] if len(current.points) else []
+            if tool.show_next_point:
+                bounds.append((x, y, x, y))
+            widget_bounds = tool.widget_bounds(x, y, current)
+            if widget_bounds is not None:
+                bounds.append(widget_bounds)
+            if bounds:
+                x1, y1, x2, y2 = np.array(bounds).T
+                region += self.widget_rect(x1.min(), y1.min(), x2.max(), y2.max(), margin=self.DAMAGE_MARGIN)
+        return region
+
+    def schedule_repaint(self, region: Optional[QRegion] = None):
+        """repaint region (default: everything) with the next frame."""
+        self.damage += QRegion(self.rect()) if region is None else region
+        if not self.frame_timer.isActive():
+            self.frame_timer.start()
+
+    def flush_repaint(self):
+        damage, self.damage = self.damage, QRegion()
+        if not damage.isEmpty():
+            self.update(damage)
+
+    def pan_position(self):
+        return self.view_offset if self.VIEWPORT_MODE else (self.pos().x(), self.pos().y())
+
+    def set_pan_position(self, x, y):
+        if self.VIEWPORT_MODE:
+            self.view_offset = x, y
+            self.schedule_repaint()
+        else:
+            self.move(x, y)
     
     def leaveEvent(self, ev):
+        damage = self.interaction_region()
+        # the other annotations are only dimmed while editing with the cursor over the canvas
+        full = self.get_current_annotation(False) is not None
         self.mouse_pos = None
-        self.repaint()
+        self.schedule_repaint(None if full else damage)
 
     def mouseMoveEvent(self, event: QMouseEvent):
-        x, y = (event.pos().x() - self.OFFSET)/self.scale, (event.pos().y() - self.OFFSET)/self.scale # pos on image
-        x = min(max(0, x), self.image_size[0])
-        y = min(max(0, y), self.image_size[1])
+        damage = self.interaction_region()
+        entered = self.mouse_pos is None
+        wx, wy = self.to_world(event.pos().x(), event.pos().y())
+        x = min(max(0, wx - self.OFFSET), self.image_size[0]) # pos on image
+        y = min(max(0, wy - self.OFFSET), self.image_size[1])
         self.mouse_pos = x, y
-        self.mouse_widget_pos = event.pos().x()/self.scale, event.pos().y()/self.scale # pos on widget
+        self.mouse_widget_pos = wx, wy # pos under the cursor, unclamped
         self.mouse_screen_pos = event.screenPos().x(), event.screenPos().y()
 
         if self.input_state == InputState.Idle:
@@ -74,19 +212,21 @@ class Canvas(QWidget):
             raise ValueError(f'Unhandled input state {self.input_state}')
 
         event.accept()
-        self.repaint()
+        if entered and self.get_current_annotation(False) is not None:
+            self.schedule_repaint()
+        else:
+            self.schedule_repaint(damage + self.interaction_region())
 
     def mousePressEvent(self, event: QMouseEvent):
         self.input_state = InputState.DraggingRight if event.button() == Qt.MouseButton.RightButton else InputState.DraggingLeft
         if (Qt.KeyboardModifier.ShiftModifier in event.modifiers()) or (event.button() == Qt.MouseButton.MiddleButton):
             self.pan_mouse_start_pos = self.mouse_screen_pos
-            self.pan_start_pos = self.pos().x(), self.pos().y()
+            self.pan_start_pos = self.pan_position()
         else:
             if self.app.particle_browser.current:
                 self.add_or_remove(event.button() == Qt.MouseButton.LeftButton)
             elif self.app.particle_browser.selected and (self.mouse_pos in self.app.particle_browser.selected):
                 self.app.particle_browser.edit_selected()
-                self.repaint()
 
     def mouseDoubleClickEvent(self, event: QMouseEvent):
         if event.button() == Qt.MouseButton.LeftButton:
@@ -123,20 +263,22 @@ class Canvas(QWidget):
     def add_or_remove(self, should_add: bool):
         tool = self.get_current_tool()
         annotation = self.get_current_annotation(False)
+        damage = self.interaction_region()
         if should_add and annotation:
             tool.add(*self.mouse_pos, annotation)
         elif annotation:
             tool.remove(*self.mouse_pos, annotation)
-        self.repaint()
+        self.schedule_repaint(damage + self.interaction_region())
 
     def add_or_remove_move(self, should_add: bool):
         tool = self.get_current_tool()
         annotation = self.get_current_annotation(False)
+        damage = self.interaction_region()
         if should_add and annotation:
             tool.add_move(*self.mouse_pos, annotation)
         elif annotation:
             tool.remove_move(*self.mouse_pos, annotation)
-        self.repaint()
+        self.schedule_repaint(damage + self.interaction_region())
 
     def get_current_tool(self):
         return self.app.toolbox.current_tool()
@@ -158,7 +300,7 @@ class Canvas(QWidget):
     def manual_pan(self, dx, dy):
         mx, my = self.mouse_pos
         self.pan_mouse_start_pos = (mx - dx, my + dy)
-        self.pan_start_pos = self.pos().x(), self.pos().y()
+        self.pan_start_pos = self.pan_position()
         self.pan()
 
     def pan(self):
@@ -167,31 +309,55 @@ class Canvas(QWidget):
         mx, my = self.mouse_screen_pos
         sx, sy = self.pan_mouse_start_pos
         ox, oy = self.pan_start_pos
-        self.move(ox + (mx - sx), oy + (my - sy))
+        self.set_pan_position(ox + (mx - sx), oy + (my - sy))
 
     def zoom_in(self):
         self.scale_i += 1
         self.scale_i = max(min(self.scale_i, len(self.scales)-1), 0)
-        self.repaint()
+        self.schedule_repaint()
 
     def zoom_out(self):
         self.scale_i -= 1
         self.scale_i = max(min(self.scale_i, len(self.scales)-1), 0)
-        self.repaint()
+        self.schedule_repaint()
     
     def reset_position(self):
-        self.move(-self.OFFSET + 4, -self.OFFSET + 4)
         self.scale_i = self.scales.index(1)
+        self.set_pan_position(-self.OFFSET + 4, -self.OFFSET + 4)
+
+    def request_augmentation(self):
+        """redo image adjustments: straight away if point-wise, otherwise no more than once a frame."""
+        if self.aug_timer.isActive() and self.app.aug_toolbox.get_transform().lookup_table() is None:
+            self.aug_pending = True
+        else:
+            self.set_image_from_array()
 
-    def set_image_from_array(self):
+    def flush_augmentation(self):
+        if self.aug_pending:
+            self.set_image_from_array()
+
+    def set_image_from_array(self, is_new_image=False):
+        self.aug_pending = False
         transform = self.app.aug_toolbox.get_transform()
 
-        f_array = self.image_array.astype(float)
-        transform(f_array)
-        f_array[f_array > 255.0] = 255.0
-        f_array[f_array < 0.0] = 0.0
-        i_array = f_array.astype(np.uint8)
-        
+        lut = transform.lookup_table()
+        if lut is not None:
+            # point-wise adjustments only: one pass over the image, done here
+            self.aug_worker.cancel()
+            self.show_array(cv2.LUT(self.image_array, lut))
+        else:
+            # the last image stays up until the worker is done, unless it's of another image
+            self.aug_worker.submit(self.image_array, transform.frozen())
+            self.aug_timer.start()
+            if is_new_image or self.image is None:
+                self.show_array(self.image_array)
+
+    def augmented(self, generation: int, i_array: np.ndarray):
+        if generation == self.aug_worker.generation:
+            self.show_array(i_array)
+            self.app.set_info('filters', self.app.aug_toolbox.stats())
+
+    def show_array(self, i_array: np.ndarray):
         h, w = i_array.shape
         self.image = QImage(
             i_array,
@@ -201,34 +367,62 @@ class Canvas(QWidget):
             QImage.Format.Format_Grayscale8
         )
         self.image_size = w, h = self.image.width(), self.image.height()
-        self.resize(w + 2*self.OFFSET, h + 2*self.OFFSET)
-        self.repaint()
+        if self.pyramid is not None:
+            self.pyramid.close()
+            self.pyramid = None
+        if self.VIEWPORT_MODE:
+            # emitted from the pyramid's worker thread, so the repaint is queued
+            self.pyramid = TilePyramid(i_array, self.level_ready.emit)
+        else:
+            self.resize(w + 2*self.OFFSET, h + 2*self.OFFSET)
+        self.schedule_repaint()
 
     def set_image(self, image_fn: str):
         image_fn = image_fn.replace('/', os.sep).replace('\\', os.sep)
         psize = (2000, 2000) if self.image_array is None else self.image_array.shape
-        self.image_array = cv2.imread(image_fn, cv2.IMREAD_GRAYSCALE)
+        self.image_array = self.app.image_cache.get(image_fn)
         if self.image_array is None:
             print( f'Failed to read image {image_fn}')
 
             self.image_array = np.zeros(psize, dtype=np.uint8)
-        self.set_image_from_array()
+            image_fn = None
+        self.app.aug_toolbox.set_source(image_fn, self.image_array)
+        self.set_image_from_array(is_new_image=True)
 
     def paintEvent(self, event: QPaintEvent):
-        if self.image is not None:
+        if self.image is not None and not self.VIEWPORT_MODE:
             im_w, im_h = self.image.size().width(), self.image.size().height()
             self.resize(int(im_w*self.scale) + 2*self.OFFSET, int(im_h*self.scale) + 2*self.OFFSET)
         
         p = QPainter()
         p.begin(self)
         p.setRenderHint(QPainter.Antialiasing)
+        p.translate(*self.origin)
         p.scale(self.scale, self.scale)
+        # only what's in the region being repainted needs drawing
+        visible = self.visible_world_rect(event.rect()) if self.VIEWPORT_MODE else None
         if self.image:
-            p.drawImage(self.OFFSET, self.OFFSET, self.image)
-
-        # Annotations
+            if visible is None:
+                p.drawImage(self.OFFSET, self.OFFSET, self.image)
+            else:
+                self.draw_visible_image(p, visible)
+
+        # Annotations: all but the one being edited drawn once into the overlay, while it can be cached
+        current = self.app.particle_browser.current
+        overlay = self.static_overlay() if self.image is not None else None
+        if overlay is not None:
+            ox, oy = self.origin
+            m = self.OVERLAY_MARGIN_PX
+            p.save()
+            p.resetTransform()
+            p.drawImage(QPoint(round(ox + self.OFFSET*self.scale) - m, round(oy + self.OFFSET*self.scale) - m), overlay)
+            p.restore()
         for annot in self.app.particle_browser.annotations:
-            self.draw_annotation(annot, p, annot == self.app.particle_browser.current)
+            if overlay is not None and annot is not current:
+                continue
+            if visible is not None and annot is not current and not self.intersects(annot, visible):
+                continue
+            self.draw_annotation(annot, p, annot == current)
 
         # cursor
         if self.mouse_pos is not None:
@@ -242,35 +436,134 @@ class Canvas(QWidget):
             p.setBrush(QColor(0, 0, 0, 255))
             p.drawEllipse(x-1, y-1, 3, 3)
         
-        w, h = int(self.width()*self.scale), int(self.height()*self.scale)
         pen = QPen()
         pen.setColor('black')
         pen.setWidth(2)
         p.setPen(pen)
         p.setBrush(QColor(0, 0, 0, 0))
-        p.drawRect(2, 2, w-2, h-2)
-        p.drawRect(self.OFFSET - 2, self.OFFSET - 2, w+4 - self.OFFSET*2, h+4 - self.OFFSET*2)
+        if visible is None:
+            w, h = int(self.width()*self.scale), int(self.height()*self.scale)
+            p.drawRect(2, 2, w-2, h-2)
+            p.drawRect(self.OFFSET - 2, self.OFFSET - 2, w+4 - self.OFFSET*2, h+4 - self.OFFSET*2)
+        else:
+            im_w, im_h = self.image_size
+            p.drawRect(QRectF(self.OFFSET - 2, self.OFFSET - 2, im_w + 4, im_h + 4))
         p.end()
 
+    def invalidate_overlay(self):
+        """redraw the overlay of static annotations before it's next used: one of them has changed."""
+        self.overlay_key = None
+
+    def static_overlay(self) -> Optional[QImage]:
+        """
+        every annotation but the one being edited, drawn over the image at the current zoom; or None
+        if that would be too big to keep (when zoomed in on a large image, and few are visible anyway).
+        Redrawn when the zoom, image, annotations or any of their outlines or classes, selection, or
+        whether any is being edited change.
+        """
+        m = self.OVERLAY_MARGIN_PX
+        im_w, im_h = self.image_size
+        # at the resolution of the screen, which on high-DPI displays is more than one pixel per point
+        dpr = self.devicePixelRatioF()
+        w, h = math.ceil((im_w*self.scale + 2*m) * dpr), math.ceil((im_h*self.scale + 2*m) * dpr)
+        if w*h > self.MAX_OVERLAY_PIXELS:
+            self.overlay = self.overlay_key = None
+            return None
+
+        browser = self.app.particle_browser
+        key = (
+            self.scale, dpr, self.image_size, browser.generation, tuple(a.version for a in browser.annotations),
+            browser.current, browser.selected, self.get_current_annotation(False) is not None,
+        )
+        if key != self.overlay_key:
+            overlay = QImage(w, h, QImage.Format.Format_ARGB32_Premultiplied)
+            overlay.setDevicePixelRatio(dpr)
+            overlay.fill(Qt.GlobalColor.transparent)
+            p = QPainter(overlay)
+            p.setRenderHint(QPainter.Antialiasing)
+            p.translate(m - self.OFFSET*self.scale, m - self.OFFSET*self.scale)
+            p.scale(self.scale, self.scale)
+            for annot in browser.annotations:
+                if annot is not browser.current:
+                    self.draw_annotation(annot, p, False)
+            p.end()
+            self.overlay, self.overlay_key = overlay, key
+        return self.overlay
+
+    def draw_visible_image(self, p: QPainter, visible: QRectF):
+        """draw the part of the image inside the visible world rect, at a resolution matching the scale."""
+        im_w, im_h = self.image.width(), self.image.height()
+        x1 = max(int(np.floor(visible.left())) - self.OFFSET, 0)
+        y1 = max(int(np.floor(visible.top())) - self.OFFSET, 0)
+        x2 = min(int(np.ceil(visible.right())) - self.OFFSET, im_w)
+        y2 = min(int(np.ceil(visible.bottom())) - self.OFFSET, im_h)
+        if x2 <= x1 or y2 <= y1:
+            return
+
+        level = self.pyramid.level_for_scale(self.scale) if self.pyramid is not None else 0
+        if level > 0 and self.pyramid.level(level) is not None:
+            # adjacent tiles have fractional extents; antialiased edges would show seams
+            p.setRenderHint(QPainter.Antialiasing, False)
+            for (tx, ty, tw, th), tile in self.pyramid.visible_tiles(level, x1, y1, x2, y2):
+                p.drawImage(QRectF(tx + self.OFFSET, ty + self.OFFSET, tw, th), tile)
+            p.setRenderHint(QPainter.Antialiasing, True)
+            return
+
+        # full resolution, until the level needed has been built
+        source = QRectF(x1, y1, x2 - x1, y2 - y1)
+        p.drawImage(source.translated(self.OFFSET, self.OFFSET), self.image, source)
+
+    def intersects(self, annot: Annotation, visible: QRectF) -> bool:
+        if not len(annot.points):
+            return False
+        x1, y1, x2, y2 = annot.bounds()
+        # widened by a pixel, so that degenerate (zero width or height) bounds still intersect
+        return QRectF(x1 + self.OFFSET - 1, y1 + self.OFFSET - 1, x2 - x1 + 2, y2 - y1 + 2).intersects(visible)
+
+    @staticmethod
+    def make_path(polyg) -> QPainterPath:
+        path = QPainterPath()
+        path.addPolygon(QPolygonF([QPointF(x, y) for x, y in polyg]))
+        path.closeSubpath()
+        return path
+
+    def lod_level(self) -> int:
+        """
+        level of detail to draw outlines at: level k merges vertices within 2**k image pixels of
+        each other, the coarsest for which that is under LOD_PIXEL on screen.
+        """
+        return math.floor(math.log2(self.LOD_PIXEL / self.scale))
+
+    def annotation_path(self, annot: Annotation, level: Optional[int] = None) -> QPainterPath:
+        """
+        path of annotation outline, at a level of detail (see `lod_level`) or with every vertex,
+        rebuilt only when its points have changed.
+        """
+        cached = self.path_cache.get(annot)
+        if cached is None or cached[0] != annot.points.version:
+            annot.points.clamp(*self.image_size)
+            self.path_cache[annot] = cached = annot.points.version, {}
+        paths = cached[1]
+        if level not in paths:
+            points = annot.points.array
+            if level is not None:
+                points = merge_within_cells(points, 2.0 ** level)
+            paths[level] = self.make_path((points + self.OFFSET).tolist())
+        return paths[level]
+
     @staticmethod
     def draw_polyg(
             p: QPainter,
-            polyg,
+            path: QPainterPath,
             filled: bool,
             bordered: bool,
             dashed_border: bool,
             colour,
             fill_opacity: int,
             bright_border: bool,
-            draw_points: bool,
+            points=None,
             scale=1.0,
     ):
-        assert polyg
-        path = QPainterPath()
-        path.moveTo(*polyg[0])
-        for pt in polyg[1:]:
-            path.lineTo(*pt)
-        path.lineTo(*polyg[0])
         if filled:
             c = QColor(colour)
             c.setAlpha(fill_opacity)
@@ -290,43 +583,42 @@ class Canvas(QWidget):
             p.setPen(pen)
             p.drawPath(path)
 
-        if draw_points:
-            p.setBrush(QColor('black'))
-            for (x, y) in polyg:
-                w = 6 / scale
-                hw = w * 0.5
-                p.drawEllipse(x - hw, y - hw, w, w)
+        if points is not None:
+            # vertex handles, as round points: no more than one per handle width along the outline,
+            # as those closer would only be drawn on top of each other
+            w = 6 / scale
+            pen = QPen(QColor('black'))
+            pen.setWidthF(w)
+            pen.setCapStyle(Qt.PenCapStyle.RoundCap)
+            p.setPen(pen)
+            p.drawPoints(QPolygonF([QPointF(x, y) for x, y in merge_within_cells(points, w).tolist()]))
 
     def draw_annotation(self, annot: Annotation, p: QPainter, is_editing: bool):
         if annot.points:
-            w, h = self.image_size
-            for i, (x, y) in enumerate(annot.points):
-                x = min(max(x, 0), w)
-                y = min(max(y, 0), h)
-                annot.points[i] = (x, y)
+            path = self.annotation_path(annot, self.lod_level())
 
             tool = self.get_current_tool()
 
-            if is_editing and tool.show_next_point and self.mouse_pos is not None:
-                polyg = [*annot.points, self.mouse_pos]
-            else:
-                polyg = annot.points
+            points = None
+            if is_editing:
+                points = annot.points.array + self.OFFSET
+                if tool.show_next_point and self.mouse_pos is not None:
+                    # outline follows the cursor: rebuilt every frame, for the annotation under edit only
+                    path = self.make_path([*points.tolist(), [v + self.OFFSET for v in self.mouse_pos]])
 
-            if self.mouse_pos is not None:
+            if self.mouse_pos is not None and is_editing:
                 tool.draw_widgets([v + self.OFFSET for v in self.mouse_pos], annot, p, self.OFFSET)
 
             is_generally_annotating = self.get_current_annotation(False)
 
-            polyg = [(x+self.OFFSET, y+self.OFFSET) for x, y in polyg]
-
             self.draw_polyg(
-                p, polyg,
+                p, path,
                 filled=True,
                 bright_border=annot.is_selected and not annot.is_editing,
                 bordered=(annot.is_selected and not is_generally_annotating) or annot.is_editing,
                 dashed_border=not annot.is_editing, 
                 colour=annot.colour,
                 fill_opacity=60 if annot.is_editing else (10 if is_generally_annotating else 150),
-                draw_points=annot.is_editing,
+                points=points if annot.is_editing else None,
                 scale=self.scale,
             )
@@ -0,0 +1,237 @@
+"""
+Headless dataset operations: `python -m annot <command> ...`, for scripts and batch pipelines.
+
+Nothing here imports Qt. Per-image work is farmed out to a pool of processes, in chunks of
+images, with each image's annotations sent in the packed form they are read from file in.
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+from typing import List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from tqdm import tqdm
+
+from .annotation_store import RawAnnotations, ImageAnnotations
+from .class_labels import CLASSES
+from .shape_features import FEATURES, image_shape_features, polygon_areas_perimeters, guess_classes, write_table
+from .simplify import METHODS, simplify_raw
+from .journal import EditJournal, replay
+from . import dataset_io
+
+
+def load_dataset(path: str):
+    """load a dataset json, with any edits journalled since it was last written applied."""
+    info, licenses, images, n_annots, image_annotations, categories = dataset_io.load_coco_json(path)
+    n_edits = replay(os.path.splitext(path)[0], image_annotations)
+    print(f'Loaded DS with {len(images)} images and {n_annots} annotations ({n_edits} journalled edits).', file=sys.stderr)
+    return info, licenses, images, image_annotations, categories
+
+
+def save_dataset(path: str, info, licenses, images, image_annotations, categories):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    dataset_io.save_json(path, dataset_io.as_coco_dict(info, licenses, images, image_annotations, categories))
+    # any journal of what was at path is stale: if path was read from, its edits are now in the json,
+    # and replaying them again would undo later changes; if not, they were of a dataset that's gone
+    dname = os.path.splitext(path)[0]
+    for suffix in (EditJournal.SUFFIX, EditJournal.COMPACTING_SUFFIX):
+        if os.path.exists(dname + suffix):
+            os.remove(dname + suffix)
+
+
+def map_images(fn, items: list, jobs: int, chunksize: int) -> list:
+    """fn applied to each of items, across `jobs` processes (in this one if 1), in order."""
+    if jobs == 1:
+        return [fn(item) for item in tqdm(items, unit='image', file=sys.stderr)]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(tqdm(pool.map(fn, items, chunksize=chunksize), total=len(items), unit='image', file=sys.stderr))
+
+
+def image_stats(raw: RawAnnotations) -> Tuple[np.ndarray, np.ndarray]:
+    """count of annotations in each category, and area of each annotation."""
+    categories = np.clip(np.asarray(raw.category_ids, dtype=np.int64), 0, len(CLASSES))
+    counts = np.bincount(categories, minlength=len(CLASSES) + 1)
+    raw.finalise()
+    areas, _ = polygon_areas_perimeters(np.trunc(raw.coords.astype(np.float64)).reshape(-1, 2), raw.offsets // 2)
+    return counts, areas
+
+
+def set_image_classes(image_annotations: ImageAnnotations, im_id: int, labels: List[int]):
+    if not image_annotations.is_materialised(im_id):
+        image_annotations.raw[im_id].category_ids = list(labels)
+    else:
+        for annot, label in zip(image_annotations[im_id], labels):
+            annot.class_label = label
+
+
+def simplify_image(job: Tuple[RawAnnotations, float, str]) -> RawAnnotations:
+    return simplify_raw(*job)
+
+
+def copy_image(paths: Tuple[str, str]):
+    src, dst = paths
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    shutil.copy(src, dst)
+
+
+def cmd_stats(args):
+    _, _, images, image_annotations, _ = load_dataset(args.dataset)
+    results = map_images(image_stats, [image_annotations.as_raw(im.id) for im in images], args.jobs, args.chunksize)
+    counts = sum((c for c, _ in results), np.zeros(len(CLASSES) + 1, dtype=np.int64))
+    areas = np.concatenate([a for _, a in results] or [np.zeros(0)])
+    stats = dict(
+        images=len(images),
+        unannotated_images=sum(1 for c, _ in results if not c.sum()),
+        annotations=int(counts.sum()),
+        classes={name: int(n) for name, n in zip(['unlabelled', *CLASSES], counts) if n},
+        area=dict(
+            mean=float(areas.mean()) if len(areas) else None,
+            median=float(np.median(areas)) if len(areas) else None,
+            min=float(areas.min()) if len(areas) else None,
+            max=float(areas.max()) if len(areas) else None,
+        ),
+    )
+    if args.json:
+        print(json.dumps(stats, indent=2))
+    else:
+        print(f'{stats["images"]} images ({stats["unannotated_images"]} without annotations), {stats["annotations"]} annotations')
+        for name, n in stats['classes'].items():
+            print(f'  {name:<14} {n:8d}')
+        if len(areas):
+            print('area: ' + ', '.join(f'{k} {v:.1f}' for k, v in stats['area'].items()))
+
+
+def cmd_merge(args):
+    info, licenses, images, image_annotations, categories = load_dataset(args.datasets[0])
+    for path in args.datasets[1:]:
+        _, _, other_images, other_annotations, _ = load_dataset(path)
+        dataset_io.merge_datasets(images, image_annotations, other_images, other_annotations)
+    print(f'DS now has {len(images)} images and {image_annotations.total()} annotations.', file=sys.stderr)
+    save_dataset(args.output, info, licenses, images, image_annotations, categories)
+
+
+def dataset_shape_features(images, image_annotations: ImageAnnotations, args):
+    """per-image shape descriptors of every annotation, and the packed annotations they're of."""
+    raws = [image_annotations.as_raw(im.id) for im in images]
+    return raws, map_images(image_shape_features, raws, args.jobs, args.chunksize)
+
+
+def feature_table(images, raws: List[RawAnnotations], features: List[dict], labels: List[np.ndarray]) -> dict:
+    counts = [len(raw) for raw in raws]
+    table = dict(
+        image_id=np.repeat([im.id for im in images], counts).astype(np.int64),
+        file_name=np.repeat([im.file_name for im in images], counts).astype(str),
+        annotation_id=np.array([i for raw in raws for i in raw.ids], dtype=np.int64),
+        category_id=np.concatenate(labels or [np.zeros(0, dtype=np.int64)]),
+    )
+    for name in FEATURES:
+        table[name] = np.concatenate([f[name] for f in features] or [np.zeros(0)])
+    return table
+
+
+def cmd_guess(args):
+    info, licenses, images, image_annotations, categories = load_dataset(args.dataset)
+    raws, features = dataset_shape_features(images, image_annotations, args)
+    labels = [guess_classes(f, raw.category_ids, args.all) for raw, f in zip(raws, features)]
+    n_changed = 0
+    for im, raw, image_labels in zip(images, raws, labels):
+        n_changed += int((image_labels != raw.category_ids).sum())
+        set_image_classes(image_annotations, im.id, image_labels.tolist())
+    print(f'Changed class of {n_changed} annotations.', file=sys.stderr)
+    save_dataset(args.output or args.dataset, info, licenses, images, image_annotations, categories)
+    if args.features:
+        write_table(args.features, feature_table(images, raws, features, labels))
+
+
+def cmd_features(args):
+    _, _, images, image_annotations, _ = load_dataset(args.dataset)
+    raws, features = dataset_shape_features(images, image_annotations, args)
+    labels = [np.asarray(raw.category_ids, dtype=np.int64) for raw in raws]
+    write_table(args.table, feature_table(images, raws, features, labels))
+    print(f'Wrote shape features of {sum(len(raw) for raw in raws)} annotations to "{args.table}".', file=sys.stderr)
+
+
+def cmd_simplify(args):
+    info, licenses, images, image_annotations, categories = load_dataset(args.dataset)
+    jobs = [(image_annotations.as_raw(im.id), args.tolerance, args.method) for im in images]
+    n_before = n_after = 0
+    for im, (raw, _, _), simplified in zip(images, jobs, map_images(simplify_image, jobs, args.jobs, args.chunksize)):
+        n_before += len(raw.coords) // 2
+        n_after += len(simplified.coords) // 2
+        image_annotations.set_raw(im.id, simplified)
+    size_before = os.path.getsize(args.dataset)
+    output = args.output or args.dataset
+    save_dataset(output, info, licenses, images, image_annotations, categories)
+    size_after = os.path.getsize(output)
+    print(f'Simplified outlines from {n_before} to {n_after} vertices ({1 - n_after/max(n_before, 1):.0%} fewer); '
+          f'json from {size_before/1e3:,.0f} kB to {size_after/1e3:,.0f} kB.', file=sys.stderr)
+
+
+def cmd_export(args):
+    info, licenses, images, image_annotations, categories = load_dataset(args.dataset)
+    if args.classes:
+        keep = {CLASSES.index(c) + 1 if c in CLASSES else int(c) for c in args.classes}
+        for im in images:
+            image_annotations[im.id] = [a for a in image_annotations[im.id] if a.class_label in keep]
+    if args.drop_empty:
+        images = [im for im in images if image_annotations.count(im.id)]
+    save_dataset(args.output, info, licenses, images, image_annotations, categories)
+    if args.copy_images:
+        src_root, dst_root = os.path.dirname(os.path.abspath(args.dataset)), os.path.dirname(os.path.abspath(args.output))
+        if src_root != dst_root:
+            paths = [(os.path.join(src_root, im.file_name), os.path.join(dst_root, im.file_name)) for im in images]
+            map_images(copy_image, paths, args.jobs, args.chunksize)
+
+
+def main(argv: List[str]) -> int:
+    pool_args = argparse.ArgumentParser(add_help=False)
+    pool_args.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='worker processes for per-image work (default: one per core)')
+    pool_args.add_argument('--chunksize', type=int, default=16, help='images sent to a worker at a time')
+
+    parser = argparse.ArgumentParser(prog='python -m annot', description='Dataset operations, without the GUI.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('stats', parents=[pool_args], help='count images, annotations and classes')
+    p.add_argument('dataset')
+    p.add_argument('--json', action='store_true', help='print stats as json')
+    p.set_defaults(fn=cmd_stats)
+
+    p = commands.add_parser('merge', parents=[pool_args], help='merge datasets: images are matched by file name, annotations are added')
+    p.add_argument('output')
+    p.add_argument('datasets', nargs='+')
+    p.set_defaults(fn=cmd_merge)
+
+    p = commands.add_parser('guess', parents=[pool_args], help='guess the class of unlabelled annotations from their shape')
+    p.add_argument('dataset')
+    p.add_argument('-o', '--output', help='write here instead of back to the dataset')
+    p.add_argument('--all', action='store_true', help='re-guess every annotation, not just unlabelled ones')
+    p.add_argument('--features', help='also write the shape features the guesses are made from to this table (.csv or .npz)')
+    p.set_defaults(fn=cmd_guess)
+
+    p = commands.add_parser('features', parents=[pool_args], help='write a table of the shape features of every annotation')
+    p.add_argument('dataset')
+    p.add_argument('table', help='output table: .csv, or .npz for numpy')
+    p.set_defaults(fn=cmd_features)
+
+    p = commands.add_parser('simplify', parents=[pool_args], help='drop vertices that make little difference to the outlines of annotations')
+    p.add_argument('dataset')
+    p.add_argument('-o', '--output', help='write here instead of back to the dataset')
+    p.add_argument('-t', '--tolerance', type=float, default=1.0, help='how far (px) outlines may move (default: 1)')
+    p.add_argument('--method', choices=list(METHODS), default='dp', help='Douglas-Peucker (dp, default) or Visvalingam-Whyatt (vw)')
+    p.set_defaults(fn=cmd_simplify)
+
+    p = commands.add_parser('export', parents=[pool_args], help='write a copy of a dataset, with journalled edits folded in')
+    p.add_argument('dataset')
+    p.add_argument('output')
+    p.add_argument('--classes', nargs='+', help='keep only annotations of these classes (names or ids)')
+    p.add_argument('--drop-empty', action='store_true', help='leave out images without annotations')
+    p.add_argument('--copy-images', action='store_true', help='copy image files alongside the output')
+    p.set_defaults(fn=cmd_export)
+
+    args = parser.parse_args(argv)
+    args.jobs = max(args.jobs or 1, 1)
+    args.fn(args)
+    return 0
@@ -1,27 +1,29 @@
 import os
-from typing import List, Optional, Dict
-import json
+from typing import List, Optional
 from datetime import datetime
 import shutil
 
-from tqdm import tqdm
 
 from PySide6.QtWidgets import (
-    QWidget, QGroupBox, QTableWidget, QTableWidgetItem, QScrollArea,
+    QWidget, QGroupBox, QTableView, QScrollArea,
     QFileDialog, QPushButton, QHBoxLayout, QVBoxLayout, QHeaderView,
     QMessageBox, QCheckBox, QProgressBar,
 )
-from PySide6.QtGui import QImage
-from PySide6.QtCore import Qt
 
 from .coco import COCO_Category, COCO_Info, COCO_Image, COCO_License
-from .annotation import Annotation
+from .annotation_store import ImageAnnotations
+from .dataset_model import DatasetTableModel
 from .class_labels import CLASSES
+from .image_probe import probe_image_sizes
+from .journal import EditJournal, Compactor, replay
+from . import dataset_io
 
 
 class DatasetBrowser(QGroupBox):
 
     IMAGE_EXTENSIONS = {'.bmp', '.jpg', '.jpeg', '.tif', '.tiff', '.png'}
+    PREFETCH_NEXT = 3
+    PREFETCH_PREVIOUS = 1
 
     def __init__(self, app):
         super().__init__('Dataset')
@@ -30,9 +32,12 @@ class DatasetBrowser(QGroupBox):
         self.info = self.default_info()
         self.licenses: List[COCO_License] = []
         self.images: List[COCO_Image] = []
-        self.image_annotations: Dict[int, List[Annotation]] = []
+        self.image_annotations = ImageAnnotations()
         self.categories: List[COCO_Category] = self.default_categories()
         self.dname: Optional[str] = None
+        self.journal: Optional[EditJournal] = None
+        self.compactor: Optional[Compactor] = None
+        self.needs_full_save = False
 
         self.layout = QVBoxLayout(self)
         self.layout.setContentsMargins(0, 0, 0, 0)
@@ -68,27 +73,34 @@ class DatasetBrowser(QGroupBox):
         self.btn_save_marked.setToolTip('Save selected images as new dataset.')
         self.btn_save_marked.clicked.connect(self.save_marked)
         self.btn_save_marked.setEnabled(False)
+        self.btn_revert = QPushButton('Revert')
+        self.btn_revert.setToolTip('Discard changes made since the dataset was last saved.')
+        self.btn_revert.clicked.connect(self.revert)
+        self.btn_revert.setEnabled(False)
         save_button_box.layout.addWidget(self.btn_save)
         save_button_box.layout.addWidget(self.btn_save_marked)
+        save_button_box.layout.addWidget(self.btn_revert)
 
         self.chk_review_mode = QCheckBox('Review mode?')
         self.chk_review_mode.setToolTip('Select to filter list of images down to those that have annotations already.')
-        self.chk_review_mode.clicked.connect(self.refresh_list)
+        self.chk_review_mode.clicked.connect(self.review_mode_toggled)
         self.layout.addWidget(self.chk_review_mode)
 
         scroll = QScrollArea()
         self.layout.addWidget(scroll)
         scroll.layout = QVBoxLayout(scroll)
-        self.dataset_table = QTableWidget()
-        cols = ['Mark', '#Ann', 'Filename']
-        self.dataset_table.setColumnCount(len(cols))
-        self.dataset_table.setHorizontalHeaderLabels(cols)
+        self.dataset_model = DatasetTableModel(self)
+        self.dataset_table = QTableView()
+        self.dataset_table.setModel(self.dataset_model)
         header = self.dataset_table.horizontalHeader()
         header.setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        header.setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        # fixed row heights: the view need not measure every row
+        self.dataset_table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
         scroll.layout.addWidget(self.dataset_table)
-        self.dataset_table.itemSelectionChanged.connect(self.selected_image_changed)
-        self.dataset_table.cellClicked.connect(self.datatable_row_clicked)
-        self.dataset_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.dataset_table.selectionModel().selectionChanged.connect(self.selected_image_changed)
+        self.dataset_table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.dataset_table.setSelectionMode(QTableView.SelectionMode.SingleSelection)
         self.progress = QProgressBar()
         self.progress.setValue(0)
         self.progress.setMaximum(100)
@@ -124,91 +136,91 @@ class DatasetBrowser(QGroupBox):
         self.dname = os.path.splitext(fn)[0]
         self.droot = os.path.dirname(fn)
         self.previous_dir = self.droot
-        self.info, self.licenses, self.images, annots, self.image_annotations, self.categories = \
+        self.info, self.licenses, self.images, n_annots, self.image_annotations, self.categories = \
             self.load_coco_json(fn)
-        print(f'Loaded DS with {len(self.images)} images and {len(annots)} annotations.')
+        print(f'Loaded DS with {len(self.images)} images and {n_annots} annotations.')
+        self.recover_journal()
         self.refresh_list()
         self.app.set_info('dataset', os.path.basename(self.dname))
         self.btn_open_and_merge.setEnabled(True)
+        self.btn_revert.setEnabled(True)
 
     def open_folder(self, dn: str):
         self.dname = dn
         self.droot = os.path.dirname(dn)
         self.previous_dir = self.droot
         if os.path.exists(dn+'.json'):
-            self.info, self.licenses, self.images, annots, self.image_annotations, self.categories = \
+            self.info, self.licenses, self.images, n_annots, self.image_annotations, self.categories = \
                 self.load_coco_json(dn+'.json')
-            print(f'Loaded DS with {len(self.images)} images and {len(annots)} annotations.')
+            print(f'Loaded DS with {len(self.images)} images and {n_annots} annotations.')
+            self.recover_journal()
         else:
             self.info, self.licenses, self.images, self.image_annotations, self.categories = \
                 self.load_dir(dn, self.droot)
             print(f'Created new DS from {len(self.images)} images.')
+            self.close_journal()
+            self.needs_full_save = True
         self.refresh_list()
         self.app.set_info('dataset', os.path.basename(self.dname))
         self.btn_open_and_merge.setEnabled(True)
+        self.btn_revert.setEnabled(True)
 
     def merge_json(self, json_path: str):
         self.previous_dir = self.droot
-        _, _, images, annots, image_annotations, categories = \
+        _, _, images, n_new_annots, image_annotations, categories = \
             self.load_coco_json(json_path)
-        n_new_annots = len(annots)
         
         # assert categories == self.categories, \
         #     f'Cannot merge datasets with disparate categories "{categories}" (new) vs "{self.categories}" (current)'
         
-        current_images_by_fn = {im.file_name: im for im in self.images}
-
-        images_by_id = {im.id: im for im in images}
-        image_annotations_by_fn = {
-            images_by_id[im_id].file_name: a
-            for im_id, a in image_annotations.items()
-        }
-        new_images = []
-        for im in images:
-            if im.file_name in current_images_by_fn:
-                cim = current_images_by_fn[im.file_name]
-                im.id = cim.id
-            else:
-                im.id = len(self.images) + len(new_images)
-                new_images.append(im)
-        
-        for image in new_images:
-            self.images.append(image)
-        
-        images_by_fn = {im.file_name: im for im in self.images}
-        image_annotations = {
-            images_by_fn[fn].id: a
-            for fn, a in image_annotations_by_fn.items()
-        }
-        
-        for im_id, annots in image_annotations.items():
-            if im_id not in self.image_annotations:
-                self.image_annotations[im_id] = []
-            self.image_annotations[im_id].extend(annots)
-        
-        total_annots_count = sum(len(a) for a in self.image_annotations.values())
+        dataset_io.merge_datasets(self.images, self.image_annotations, images, image_annotations)
+
+        total_annots_count = self.image_annotations.total()
         print(f'Merged DS with {len(images)} images and {n_new_annots} annotations.')
         print(f'DS now has {len(self.images)} images and {total_annots_count} annotations.')
+        # merged annotations are not journalled: the next save must write the whole dataset
+        self.needs_full_save = True
         self.refresh_list()
         self.app.set_info('dataset', os.path.basename(self.dname))
 
+    def recover_journal(self):
+        """apply edits journalled since the json was last written, then continue journalling."""
+        self.close_journal()
+        n_edits = replay(self.dname, self.image_annotations)
+        if n_edits:
+            print(f'Recovered {n_edits} journalled edits.')
+        self.journal = EditJournal(self.dname)
+        self.compactor = Compactor(self.dname, self.journal)
+        self.needs_full_save = False
+
+    def revert(self):
+        """discard journalled edits, and reload the dataset as it was last saved."""
+        answer = QMessageBox.question(self, 'Revert', 'Discard all changes made since the dataset was last saved?')
+        if answer != QMessageBox.StandardButton.Yes:
+            return
+        self.close_journal()
+        journal_path = self.dname + EditJournal.SUFFIX
+        if os.path.exists(journal_path):
+            os.remove(journal_path)
+        self.open_folder(self.dname)
+
+    def close_journal(self):
+        if self.compactor is not None:
+            self.compactor.wait()
+            self.compactor = None
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def record_edit(self, op: str, annot):
+        if op in ('create', 'delete'):
+            self.dataset_model.annotation_count_changed(annot.im_id)
+        if self.journal is not None and not self.needs_full_save:
+            self.journal.record(op, annot)
+
     @staticmethod
     def load_coco_json(path: str):
-        with open(path) as f:
-            data = json.load(f)
-        info = COCO_Info(**data['info'])
-        licenses = [COCO_License(**lkw) for lkw in data['licenses']]
-        images = [COCO_Image(**imkw) for imkw in data['images']]
-        for coco_image in images:
-            coco_image.file_name = coco_image.file_name.replace('\\', '/')
-        images_by_id = {im.id: im for im in images}
-        image_annotations = {im.id: list() for im in images}
-        annots = [Annotation.from_coco(images_by_id, **ankw) for ankw in data['annotations']]
-        for annot in annots:
-            im = images_by_id[annot.im_id]
-            image_annotations[im.id].append(annot)
-        categories = [COCO_Category(**ckw) for ckw in data['categories']]
-        return info, licenses, images, annots, image_annotations, categories
+        return dataset_io.load_coco_json(path)
     
     @staticmethod
     def default_info():
@@ -228,7 +240,7 @@ class DatasetBrowser(QGroupBox):
     @classmethod
     def load_dir(cls, path: str, droot: str):
         images = []
-        image_annotations = {}
+        image_annotations = ImageAnnotations()
         image_fns = []
         for root, _, files in os.walk(path):
             for file in sorted(files):
@@ -237,47 +249,38 @@ class DatasetBrowser(QGroupBox):
                     image_fn = os.path.join(root, file)
                     image_fns.append(image_fn)
 
-        for image_fn in tqdm(image_fns):
-            image = QImage(image_fn)
-            if image.isNull():
+        for image_fn, size in zip(image_fns, probe_image_sizes(image_fns)):
+            if size is None:
                 continue
+            width, height = size
             image_fn = os.path.relpath(image_fn, droot)
-            coco_image = COCO_Image(len(images), image_fn, width=image.width(), height=image.height())
+            coco_image = COCO_Image(len(images), image_fn, width=width, height=height)
             coco_image.file_name = coco_image.file_name.replace('\\', '/')
             images.append(coco_image)
-            image_annotations[coco_image.id] = []
+            image_annotations.add_image(coco_image.id, (coco_image.width, coco_image.height))
         
         return cls.default_info(), [], images, image_annotations, cls.default_categories()
 
 
     def as_coco_dict(self, include_unmarked=True):
-        images = []
-        annots = []
-        for im in self.images:
-            if include_unmarked or im.marked:
-                im_dict = {k: v for k, v in im.__dict__.items() if k not in {'marked'}}
-                images.append(im_dict)
-                for annot in self.image_annotations[im.id]:
-                    try:
-                        adict = annot.as_coco_annot()
-                        adict['id'] = len(annots)
-                        adict['image_id'] = im.id
-                        annots.append(adict)
-                    except RuntimeError:
-                        continue
-        print(f'saved ds of {len(images)} images and {len(annots)} annotations.')
-        return dict(
-            info=self.info.__dict__,
-            images=images,
-            annotations=annots,
-            licenses=[lic.__dict__ for lic in self.licenses],
-            categories=[cat.__dict__ for cat in self.categories]
+        return dataset_io.as_coco_dict(
+            self.info, self.licenses, self.images, self.image_annotations, self.categories,
+            include_unmarked=include_unmarked
         )
 
     def save(self):
         output_path = self.dname + '.json'
-        data = self.as_coco_dict()
-        self.save_dataset(output_path, data)
+        if self.needs_full_save or self.journal is None:
+            data = self.as_coco_dict()
+            if self.journal is None:
+                self.journal = EditJournal(self.dname)
+                self.compactor = Compactor(self.dname, self.journal)
+            self.compactor.full_save(lambda: self.save_dataset(output_path, data))
+            self.needs_full_save = False
+        else:
+            # edits are already on disk in the journal: make sure they're flushed, and fold them into the json in the background
+            self.journal.sync()
+            self.compactor.request()
         mb = QMessageBox(self)
         mb.setText(f'Dataset saved:<br/>"{output_path}"')
         mb.show()
@@ -309,58 +312,43 @@ class DatasetBrowser(QGroupBox):
 
     @staticmethod
     def save_dataset(filename, dataset):
-        with open(filename, 'w') as f:
-            json.dump(dataset, f, indent=2)
+        dataset_io.save_json(filename, dataset)
     
-    def datatable_row_clicked(self, r, c):
-        if c != 0:
-            return
-        
-        twi = self.dataset_table.item(r, c)
-        im = self.images[r]
-        im.marked = twi.checkState() == Qt.CheckState.Checked
-
-        self.btn_save_marked.setEnabled(any(im.marked for im in self.images))
-
+    def marked_changed(self):
+        self.btn_save_marked.setEnabled(self.dataset_model.n_marked > 0)
 
     def refresh_list(self):
-        if self.chk_review_mode.isChecked():
-            images = [
-                im for im in self.images if self.image_annotations[im.id]
-            ]
-        else:
-            images = self.images
-        self.dataset_table.setRowCount(0)
-        self.dataset_table.setRowCount(len(images))
-        for r, image in enumerate(tqdm(images)):
-            twi = QTableWidgetItem()
-            twi.setCheckState(Qt.CheckState.Checked if image.marked else Qt.CheckState.Unchecked)
-            self.dataset_table.setItem(r, 0, twi)
-            n_annots = len(self.image_annotations[image.id])
-            self.dataset_table.setItem(r, 1, QTableWidgetItem(f'{n_annots}'))
-            fit_filename = image.file_name
-            if len(fit_filename) > 10:
-                fit_filename = '…'+fit_filename[-10:]
-            self.dataset_table.setItem(r, 2, QTableWidgetItem(fit_filename))
+        self.dataset_model.rebuild(self.chk_review_mode.isChecked())
+        self.marked_changed()
         self.dataset_table.selectRow(0)
 
-    def selected_image_changed(self):
-        if self.chk_review_mode.isChecked():
-            images = [
-                im for im in self.images if self.image_annotations[im.id]
-            ]
-        else:
-            images = self.images
+    def review_mode_toggled(self):
+        self.dataset_model.set_review_mode(self.chk_review_mode.isChecked())
+        self.dataset_table.selectRow(0)
 
-        index = self.dataset_table.selectedRanges()[0].topRow()
+    def selected_image_changed(self):
+        rows = self.dataset_table.selectionModel().selectedRows()
+        if not rows:
+            return
+        index = rows[0].row()
+        n_rows = self.dataset_model.rowCount()
 
         # update progress
-        prog = (index + 1) * 100 / self.dataset_table.rowCount()
+        prog = (index + 1) * 100 / n_rows
         self.progress.setValue(prog)
 
-        self.dataset_table
-        imname = os.path.join(self.droot, images[index].file_name)
-        im = images[index]
+        im = self.dataset_model.image_at(index)
+        imname = os.path.join(self.droot, im.file_name)
         self.app.set_image(imname, im.id, self.image_annotations[im.id])
         self.app.set_info('image', f'{im.file_name}')
+
+        neighbours = [
+            *range(index + 1, min(index + 1 + self.PREFETCH_NEXT, n_rows)),
+            *range(index - 1, max(index - 1 - self.PREFETCH_PREVIOUS, -1), -1),
+        ]
+        self.app.image_cache.prefetch([
+            os.path.join(self.droot, self.dataset_model.image_at(r).file_name)
+            for r in neighbours
+        ])
+        self.app.set_info('cache', self.app.image_cache.stats())
         self.app.particle_browser.refresh_table()
@@ -0,0 +1,107 @@
+import os
+import json
+from typing import List, Tuple
+
+from .coco import COCO_Category, COCO_Info, COCO_Image, COCO_License
+from .annotation_store import ImageAnnotations
+from .json_stream import JSONStreamReader
+
+
+def load_coco_json(path: str) -> Tuple[COCO_Info, List[COCO_License], List[COCO_Image], int, ImageAnnotations, List[COCO_Category]]:
+    """
+    Stream a COCO dataset from json. Annotations are indexed by image id as they are read and kept
+    in compact raw form; `Annotation` objects are only created when an image's annotations are accessed.
+    """
+    info = COCO_Info()
+    licenses, images, categories = [], [], []
+    image_annotations = ImageAnnotations()
+    n_annots = 0
+    with open(path) as f:
+        reader = JSONStreamReader(f)
+        for key, value in reader.object({'images', 'annotations'}):
+            if key == 'info':
+                info = COCO_Info(**value)
+            elif key == 'licenses':
+                licenses = [COCO_License(**lkw) for lkw in value]
+            elif key == 'categories':
+                categories = [COCO_Category(**ckw) for ckw in value]
+            elif key == 'images':
+                for imkw in value:
+                    coco_image = COCO_Image(**imkw)
+                    coco_image.file_name = coco_image.file_name.replace('\\', '/')
+                    images.append(coco_image)
+                    image_annotations.add_image(coco_image.id, (coco_image.width, coco_image.height))
+            elif key == 'annotations':
+                for ankw in value:
+                    image_annotations.add_raw(ankw['image_id'], ankw['id'], ankw['category_id'], ankw['segmentation'][0])
+                    n_annots += 1
+    image_annotations.finalise()
+    return info, licenses, images, n_annots, image_annotations, categories
+
+
+def as_coco_dict(info: COCO_Info, licenses: List[COCO_License], images: List[COCO_Image],
+                 image_annotations: ImageAnnotations, categories: List[COCO_Category], include_unmarked=True) -> dict:
+    im_dicts = []
+    annots = []
+    for im in images:
+        if include_unmarked or im.marked:
+            im_dict = {k: v for k, v in im.__dict__.items() if k not in {'marked'}}
+            im_dicts.append(im_dict)
+            if not image_annotations.is_materialised(im.id):
+                for adict in image_annotations.raw[im.id].as_coco_annots():
+                    adict['image_id'] = im.id
+                    annots.append(adict)
+                continue
+            for annot in image_annotations[im.id]:
+                try:
+                    adict = annot.as_coco_annot()
+                    if adict['id'] is None:
+                        adict['id'] = annot.id_no = image_annotations.new_id()
+                    adict['image_id'] = im.id
+                    annots.append(adict)
+                except RuntimeError:
+                    continue
+    print(f'saved ds of {len(im_dicts)} images and {len(annots)} annotations.')
+    return dict(
+        info=info.__dict__,
+        images=im_dicts,
+        annotations=annots,
+        licenses=[lic.__dict__ for lic in licenses],
+        categories=[cat.__dict__ for cat in categories]
+    )
+
+
+def merge_datasets(images: List[COCO_Image], image_annotations: ImageAnnotations,
+                   other_images: List[COCO_Image], other_annotations: ImageAnnotations):
+    """
+    merge another dataset into this one (in place). Images are matched by file name: those not
+    already present are added, and annotations on each image are added to, not replacing, its own.
+    """
+    current_images_by_fn = {im.file_name: im for im in images}
+
+    new_ids = {}
+    new_images = []
+    for im in other_images:
+        old_id = im.id
+        if im.file_name in current_images_by_fn:
+            cim = current_images_by_fn[im.file_name]
+            im.id = cim.id
+        else:
+            im.id = len(images) + len(new_images)
+            new_images.append(im)
+        new_ids[old_id] = im.id
+
+    for image in new_images:
+        images.append(image)
+        image_annotations.add_image(image.id, (image.width, image.height))
+
+    for old_id in other_annotations.keys():
+        image_annotations.merge_image(new_ids[old_id], other_annotations, old_id)
+
+
+def save_json(filename: str, dataset: dict):
+    """write dataset to a temporary file first, so that the existing file is replaced atomically."""
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'w') as f:
+        json.dump(dataset, f, indent=2)
+    os.replace(tmp_filename, filename)
@@ -0,0 +1,130 @@
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional
+
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+from .coco import COCO_Image
+
+
+class DatasetTableModel(QAbstractTableModel):
+    """
+    Table of the images in a dataset, read directly from `DatasetBrowser.images`: cells are only
+    produced for rows the view actually shows.
+
+    An index of the images which have annotations is maintained as annotations are added and
+    removed, so filtering down to them (review mode) doesn't need a pass over the dataset.
+    """
+
+    COLUMNS = ['Mark', '#Ann', 'Filename']
+
+    def __init__(self, browser):
+        super().__init__()
+        self.browser = browser
+        self.annotated: List[int] = []
+        self.index_of_id: Dict[int, int] = {}
+        self.rows: Optional[List[int]] = None
+        self.n_marked = 0
+
+    @property
+    def images(self) -> List[COCO_Image]:
+        return self.browser.images
+
+    def rebuild(self, review_mode: bool):
+        """re-index the dataset; needed when images are added or replaced."""
+        self.beginResetModel()
+        image_annotations = self.browser.image_annotations
+        self.index_of_id = {im.id: i for i, im in enumerate(self.images)}
+        self.annotated = [i for i, im in enumerate(self.images) if image_annotations.count(im.id)]
+        self.n_marked = sum(im.marked for im in self.images)
+        self.rows = list(self.annotated) if review_mode else None
+        self.endResetModel()
+
+    def set_review_mode(self, review_mode: bool):
+        self.beginResetModel()
+        self.rows = list(self.annotated) if review_mode else None
+        self.endResetModel()
+
+    def image_index(self, row: int) -> int:
+        return row if self.rows is None else self.rows[row]
+
+    def image_at(self, row: int) -> COCO_Image:
+        return self.images[self.image_index(row)]
+
+    def row_of_image(self, i: int) -> Optional[int]:
+        if self.rows is None:
+            return i
+        r = bisect_left(self.rows, i)
+        if r < len(self.rows) and self.rows[r] == i:
+            return r
+        return None
+
+    def annotation_count_changed(self, im_id: int):
+        i = self.index_of_id.get(im_id)
+        if i is None:
+            return
+        has_annotations = self.browser.image_annotations.count(im_id) > 0
+        r = bisect_left(self.annotated, i)
+        is_indexed = r < len(self.annotated) and self.annotated[r] == i
+        if has_annotations and not is_indexed:
+            insort(self.annotated, i)
+        elif is_indexed and not has_annotations:
+            del self.annotated[r]
+
+        # rows shown in review mode are left as they are until it is next toggled
+        row = self.row_of_image(i)
+        if row is not None:
+            index = self.index(row, 1)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DisplayRole])
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.images) if self.rows is None else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole:
+            if orientation == Qt.Orientation.Horizontal:
+                return self.COLUMNS[section]
+            return str(section + 1)
+        return None
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        image = self.image_at(index.row())
+        c = index.column()
+        if c == 0 and role == Qt.ItemDataRole.CheckStateRole:
+            return Qt.CheckState.Checked if image.marked else Qt.CheckState.Unchecked
+        elif c == 1 and role == Qt.ItemDataRole.DisplayRole:
+            return f'{self.browser.image_annotations.count(image.id)}'
+        elif c == 2 and role == Qt.ItemDataRole.DisplayRole:
+            fit_filename = image.file_name
+            if len(fit_filename) > 10:
+                fit_filename = '…'+fit_filename[-10:]
+            return fit_filename
+        elif c == 2 and role == Qt.ItemDataRole.ToolTipRole:
+            return image.file_name
+        return None
+
+    def flags(self, index: QModelIndex):
+        flags = Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+        if index.column() == 0:
+            flags |= Qt.ItemFlag.ItemIsUserCheckable
+        return flags
+
+    def setData(self, index: QModelIndex, value, role=Qt.ItemDataRole.EditRole) -> bool:
+        if index.column() != 0 or role != Qt.ItemDataRole.CheckStateRole:
+            return False
+        image = self.image_at(index.row())
+        marked = Qt.CheckState(value) == Qt.CheckState.Checked
+        if marked != image.marked:
+            image.marked = marked
+            self.n_marked += 1 if marked else -1
+        self.dataChanged.emit(index, index, [Qt.ItemDataRole.CheckStateRole])
+        self.browser.marked_changed()
+        return True
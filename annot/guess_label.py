@@ -4,6 +4,29 @@ import numpy as np
 from .class_labels import CLASSES
 
 
+# shape thresholds, shared with the batch engine in shape_features
+SPHERICAL_CIRCULARITY = 0.85
+ELONGATED_ASPECT_RATIO = 0.5
+AGGLOMERATED_CONVEXITY = 0.9
+
+
+def classify(circularity, aspect_ratio, convexity):
+    """class label(s) from shape descriptors: scalars, or arrays of them."""
+    return np.select(
+        [
+            circularity > SPHERICAL_CIRCULARITY,
+            aspect_ratio < ELONGATED_ASPECT_RATIO,
+            convexity < AGGLOMERATED_CONVEXITY,
+        ],
+        [
+            CLASSES.index('Spherical') + 1,
+            CLASSES.index('Elongated') + 1,
+            CLASSES.index('Agglomerated') + 1,
+        ],
+        CLASSES.index('Regular') + 1
+    )
+
+
 def guess_class(contour) -> int:
     perimeter = cv2.arcLength(contour, True)
     area = cv2.contourArea(contour)
@@ -21,13 +44,4 @@ def guess_class(contour) -> int:
     ch_area = cv2.contourArea(ch)
     convexity = area / ch_area
 
-    if circularity > 0.85:
-        class_label = CLASSES.index('Spherical') + 1
-    elif ar < 0.5:
-        class_label = CLASSES.index('Elongated') + 1
-    elif convexity < 0.9:
-        class_label = CLASSES.index('Agglomerated') + 1
-    else:
-        class_label = CLASSES.index('Regular') + 1
-
-    return class_label
+    return int(classify(circularity, ar, convexity))
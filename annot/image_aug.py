@@ -1,17 +1,23 @@
-from PySide6.QtWidgets import QGroupBox, QFormLayout, QCheckBox, QPushButton
+import os
+import threading
 
-from .augmentations import Augmentation, ComposedAugmentations, get_augs
+from PySide6.QtWidgets import QGroupBox, QFormLayout, QCheckBox, QPushButton, QSpinBox, QWidget, QHBoxLayout
+from PySide6.QtCore import Signal
+
+from .augmentations import Augmentation, ComposedAugmentations, ResNetFeatDet, get_augs
 
 
 class AugmentationToolbox(QGroupBox):
 
+    precompute_progress = Signal(int, int)
+
     def __init__(self, app):
         super().__init__('Image Adjustments')
         self.app = app
         self.layout = QFormLayout(self)
 
         self.augmentations = get_augs()
-        update_f = self.app.canvas.set_image_from_array
+        update_f = self.app.canvas.request_augmentation
         for name, w in self.augmentations.widget(update_f):
             self.layout.addRow(name, w)
 
@@ -20,8 +26,67 @@ class AugmentationToolbox(QGroupBox):
         self.layout.addRow('Disable all', self.disable_chk)
         btn_reset = QPushButton('Reset')
         btn_reset.clicked.connect(self.augmentations.reset)
+        btn_reset.clicked.connect(update_f)
         self.layout.addRow(' ', btn_reset)
+
+        self.feature_aug = None
+        if ResNetFeatDet is not None:
+            self.feature_aug = next((aug for aug in self.augmentations.augs if isinstance(aug, ResNetFeatDet)), None)
+        if self.feature_aug is not None:
+            precompute_box = QWidget()
+            precompute_box.layout = QHBoxLayout(precompute_box)
+            precompute_box.layout.setContentsMargins(0, 0, 0, 0)
+            self.btn_precompute = QPushButton('Precompute')
+            self.btn_precompute.setToolTip('Compute ResNet features of every image in the dataset, so they are ready when shown.')
+            self.btn_precompute.clicked.connect(self.precompute_features)
+            self.spin_threads = QSpinBox()
+            self.spin_threads.setRange(1, os.cpu_count() or 1)
+            self.spin_threads.setValue(os.cpu_count() or 1)
+            self.spin_threads.setToolTip('Number of threads to run the network with.')
+            btn_clear = QPushButton('Clear cache')
+            btn_clear.setToolTip('Delete the ResNet features stored on disk.')
+            btn_clear.clicked.connect(self.clear_features)
+            precompute_box.layout.addWidget(self.btn_precompute)
+            precompute_box.layout.addWidget(self.spin_threads)
+            precompute_box.layout.addWidget(btn_clear)
+            self.layout.addRow('Features', precompute_box)
+            self.precompute_progress.connect(self.precompute_progressed)
     
+    def stats(self) -> str:
+        return ', '.join(f'{aug.name} {aug.stats()}' for aug in self.augmentations.active() if aug.stats())
+
+    def precompute_features(self):
+        browser = self.app.dataset_browser
+        image_fns = [os.path.join(browser.droot, im.file_name) for im in browser.images]
+        if not image_fns:
+            return
+        self.btn_precompute.setEnabled(False)
+        threading.Thread(
+            target=self.run_precompute, args=(image_fns, self.spin_threads.value()),
+            name='precompute', daemon=True,
+        ).start()
+
+    def run_precompute(self, image_fns, n_threads):
+        # progress is signalled from this (worker) thread
+        try:
+            self.feature_aug.precompute(image_fns, n_threads, progress=self.precompute_progress.emit)
+        except Exception as e:
+            print(f'Failed to precompute features: {e}')
+            self.precompute_progress.emit(len(image_fns), len(image_fns))
+
+    def precompute_progressed(self, i: int, n: int):
+        self.app.set_info('features', f'{i}/{n}')
+        if i == n:
+            self.btn_precompute.setEnabled(True)
+
+    def set_source(self, image_fn, image):
+        if self.feature_aug is not None:
+            self.feature_aug.set_source(image_fn, image)
+
+    def clear_features(self):
+        self.feature_aug.clear_cache()
+        self.app.set_info('features', 'cache cleared')
+
     def get_transform(self) -> Augmentation:
         if self.disable_chk.isChecked():
             return ComposedAugmentations([])
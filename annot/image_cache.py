@@ -0,0 +1,97 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, List, Optional
+
+import numpy as np
+import cv2
+
+
+class ImageCache:
+    """
+    Least-recently-used cache of decoded (grayscale) images, bounded by size in bytes. Images
+    can be prefetched by worker threads, so that they are ready by the time they are shown.
+
+    Cached arrays are shared: they are marked read-only and must not be modified.
+    """
+
+    def __init__(self, max_bytes: int = 1 << 30, n_workers: int = 2):
+        self.max_bytes = max_bytes
+        self.images: Dict[str, np.ndarray] = OrderedDict()
+        self.pending: Dict[str, Future] = {}
+        self.nbytes = 0
+        self.hits = self.misses = 0
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix='prefetch')
+
+    @staticmethod
+    def key(image_fn: str) -> str:
+        return os.path.normpath(image_fn.replace('\\', '/'))
+
+    @staticmethod
+    def read(image_fn: str) -> Optional[np.ndarray]:
+        image = cv2.imread(image_fn, cv2.IMREAD_GRAYSCALE)
+        if image is not None:
+            image.flags.writeable = False
+        return image
+
+    def put(self, key: str, image: Optional[np.ndarray]):
+        if image is None or image.nbytes > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.images:
+                return
+            self.images[key] = image
+            self.nbytes += image.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self.images.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def get(self, image_fn: str) -> Optional[np.ndarray]:
+        """return decoded image, from cache if possible; None if it can't be read."""
+        key = self.key(image_fn)
+        with self.lock:
+            image = self.images.get(key)
+            if image is not None:
+                self.images.move_to_end(key)
+                self.hits += 1
+                return image
+            future = self.pending.get(key)
+            if future is not None and not future.cancelled():
+                self.hits += 1
+            else:
+                future = None
+                self.misses += 1
+
+        if future is not None:
+            return future.result()
+
+        image = self.read(key)
+        self.put(key, image)
+        return image
+
+    def _load(self, key: str) -> Optional[np.ndarray]:
+        try:
+            image = self.read(key)
+            self.put(key, image)
+            return image
+        finally:
+            with self.lock:
+                self.pending.pop(key, None)
+
+    def prefetch(self, image_fns: List[str]):
+        """load images in the background; prefetches no longer wanted are cancelled if not yet started."""
+        keys = [self.key(fn) for fn in image_fns]
+        with self.lock:
+            for key, future in list(self.pending.items()):
+                if key not in keys and future.cancel():
+                    del self.pending[key]
+            for key in keys:
+                if key not in self.images and key not in self.pending:
+                    self.pending[key] = self.pool.submit(self._load, key)
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        rate = 100.0 * self.hits / total if total else 0.0
+        return f'{self.hits}/{total} hits ({rate:.0f}%), {len(self.images)} images, {self.nbytes / 1e6:.0f} MB'
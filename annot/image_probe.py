@@ -0,0 +1,116 @@
+"""
+Read image dimensions from file headers, without decoding the pixel data.
+"""
+import struct
+from typing import Optional, Tuple, List
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+from tqdm import tqdm
+
+
+def _png_size(f) -> Optional[Tuple[int, int]]:
+    head = f.read(24)
+    if len(head) < 24 or head[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', head[16:24])
+
+
+def _bmp_size(f) -> Optional[Tuple[int, int]]:
+    head = f.read(26)
+    if len(head) < 26:
+        return None
+    header_size, = struct.unpack('<I', head[14:18])
+    if header_size == 12:
+        w, h = struct.unpack('<HH', head[18:22])
+    else:
+        w, h = struct.unpack('<ii', head[18:26])
+    return abs(w), abs(h)
+
+
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _jpeg_size(f) -> Optional[Tuple[int, int]]:
+    f.seek(2)
+    while True:
+        b = f.read(1)
+        while b and b != b'\xff':
+            b = f.read(1)
+        while b == b'\xff':
+            b = f.read(1)
+        if not b:
+            return None
+        marker = b[0]
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            continue
+        seg = f.read(2)
+        if len(seg) < 2:
+            return None
+        length, = struct.unpack('>H', seg)
+        if marker in JPEG_SOF_MARKERS:
+            sof = f.read(5)
+            if len(sof) < 5:
+                return None
+            h, w = struct.unpack('>HH', sof[1:5])
+            return w, h
+        f.seek(length - 2, 1)
+
+
+TIFF_TYPE_FORMATS = {3: 'H', 4: 'I'}
+
+
+def _tiff_size(f) -> Optional[Tuple[int, int]]:
+    head = f.read(8)
+    bo = '<' if head[:2] == b'II' else '>'
+    magic, ifd_offset = struct.unpack(bo + 'HI', head[2:8])
+    if magic != 42:
+        # BigTIFF (43) and anything else: leave to the decoder
+        return None
+    f.seek(ifd_offset)
+    n_entries, = struct.unpack(bo + 'H', f.read(2))
+    entries = f.read(12*n_entries)
+    size = {}
+    for i in range(n_entries):
+        tag, typ, _count = struct.unpack(bo + 'HHI', entries[i*12:i*12+8])
+        if tag in (256, 257) and typ in TIFF_TYPE_FORMATS:
+            size[tag], = struct.unpack_from(bo + TIFF_TYPE_FORMATS[typ], entries, i*12 + 8)
+    if 256 in size and 257 in size:
+        return size[256], size[257]
+    return None
+
+
+def probe_image_size_from_header(path: str) -> Optional[Tuple[int, int]]:
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+        f.seek(0)
+        if magic.startswith(b'\x89PNG'):
+            return _png_size(f)
+        elif magic.startswith(b'BM'):
+            return _bmp_size(f)
+        elif magic.startswith(b'\xff\xd8'):
+            return _jpeg_size(f)
+        elif magic in (b'II*\x00', b'MM\x00*'):
+            return _tiff_size(f)
+    return None
+
+
+def probe_image_size(path: str) -> Optional[Tuple[int, int]]:
+    """(width, height) of image at `path`, or None if it cannot be read."""
+    try:
+        size = probe_image_size_from_header(path)
+    except (OSError, struct.error):
+        size = None
+    if size is not None and size[0] > 0 and size[1] > 0:
+        return size
+
+    image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        return None
+    h, w = image.shape[:2]
+    return w, h
+
+
+def probe_image_sizes(paths: List[str], max_workers: Optional[int] = None) -> List[Optional[Tuple[int, int]]]:
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(tqdm(pool.map(probe_image_size, paths), total=len(paths)))
@@ -0,0 +1,216 @@
+"""
+Append-only journal of annotation edits, kept next to the dataset json as "<dname>.journal".
+
+Each line is one operation on one annotation, identified by image id and annotation id:
+    create, modify: set the class and points of the annotation (adding it if missing)
+    relabel: set the class of the annotation
+    delete: remove the annotation
+All operations are idempotent, so replaying a journal onto a dataset which already contains
+some of its edits is harmless. The journal is folded into the json by `Compactor`.
+"""
+import os
+import json
+import threading
+from typing import Callable, Dict, Iterable, Iterator, Optional, Set
+
+import numpy as np
+
+from .annotation import Annotation
+from .annotation_store import ImageAnnotations
+from . import dataset_io
+
+
+class EditJournal:
+
+    SUFFIX = '.journal'
+    COMPACTING_SUFFIX = '.journal.compacting'
+
+    def __init__(self, dname: str):
+        self.path = dname + self.SUFFIX
+        self.compacting_path = dname + self.COMPACTING_SUFFIX
+        self.lock = threading.Lock()
+        self.f = open(self.path, 'a')
+
+    def record(self, op: str, a: Annotation):
+        entry = dict(op=op, image_id=a.im_id, id=a.id_no)
+        if op in ('create', 'modify', 'relabel'):
+            entry['category_id'] = a.class_label
+        if op in ('create', 'modify'):
+            entry['points'] = np.round(np.asarray(a.points, dtype=float).reshape(-1), 2).tolist()
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+        with self.lock:
+            self.f.write(line)
+            self.f.flush()
+
+    def sync(self):
+        with self.lock:
+            self.f.flush()
+            os.fsync(self.f.fileno())
+
+    def reset(self):
+        """discard journalled edits: the json has been written in full."""
+        with self.lock:
+            self.f.close()
+            self.f = open(self.path, 'w')
+            if os.path.exists(self.compacting_path):
+                os.remove(self.compacting_path)
+
+    def rotate(self) -> str:
+        """move journalled edits aside for compaction; new edits go to a fresh journal."""
+        with self.lock:
+            self.f.close()
+            if os.path.exists(self.compacting_path):
+                # left over from an interrupted compaction: append to it, so it stays in order.
+                with open(self.path) as src, open(self.compacting_path, 'a') as dst:
+                    dst.write(src.read())
+                os.remove(self.path)
+            else:
+                os.replace(self.path, self.compacting_path)
+            self.f = open(self.path, 'a')
+        return self.compacting_path
+
+    def close(self):
+        with self.lock:
+            self.f.close()
+
+
+def read_ops(path: str) -> Iterator[dict]:
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # partially written final line, from a crash mid-write
+                return
+
+
+def apply_op(image_annotations: ImageAnnotations, op: dict, by_id: Dict[int, Dict[int, Annotation]],
+             deleted: Dict[int, Set[Annotation]]):
+    """
+    apply one operation. by_id holds the annotations of each image operated on so far, by id, and
+    deleted those taken out of it, still to be removed from the image's list (see `apply_ops`).
+    """
+    im_id = op['image_id']
+    if im_id not in image_annotations:
+        return
+    annots = by_id.get(im_id)
+    if annots is None:
+        # reversed, so that of annotations sharing an id the first is found, as a search would find it
+        annots = by_id[im_id] = {a.id_no: a for a in reversed(image_annotations[im_id])}
+    annot = annots.get(op['id'])
+
+    if op['op'] == 'delete':
+        if annot is not None:
+            del annots[op['id']]
+            deleted.setdefault(im_id, set()).add(annot)
+    elif op['op'] == 'relabel':
+        if annot is not None:
+            annot.set_label(op['category_id'])
+    elif op['op'] in ('create', 'modify'):
+        points = np.reshape(op['points'], (-1, 2)).tolist()
+        if annot is None:
+            annot = Annotation(image_annotations.image_sizes[im_id], points, op['category_id'])
+            annot.im_id = im_id
+            annot.id_no = op['id']
+            image_annotations[im_id].append(annot)
+            annots[annot.id_no] = annot
+        else:
+            annot.points = points
+            annot.class_label = op['category_id']
+        image_annotations.next_id = max(image_annotations.next_id, op['id'] + 1)
+    else:
+        raise ValueError(f'Unknown journal operation "{op["op"]}"')
+
+
+def apply_ops(image_annotations: ImageAnnotations, ops: Iterable[dict]) -> int:
+    """
+    apply operations in order; return how many there were. Each image's annotations are indexed
+    by id when first operated on, and those deleted taken out of its list at the end, so that
+    the cost is in proportion to the number of operations, not to that times annotations per image.
+    """
+    by_id: Dict[int, Dict[int, Annotation]] = {}
+    deleted: Dict[int, Set[Annotation]] = {}
+    n = 0
+    for op in ops:
+        apply_op(image_annotations, op, by_id, deleted)
+        n += 1
+    for im_id, annots in deleted.items():
+        image_annotations[im_id][:] = [a for a in image_annotations[im_id] if a not in annots]
+    return n
+
+
+def replay(dname: str, image_annotations: ImageAnnotations) -> int:
+    """apply journalled edits for dataset `dname` (compacting first, then current); return number of edits."""
+    return apply_ops(image_annotations, (
+        op for path in (dname + EditJournal.COMPACTING_SUFFIX, dname + EditJournal.SUFFIX) for op in read_ops(path)
+    ))
+
+
+class Compactor:
+    """
+    Folds the journal into the dataset json on a background thread. The json is only ever written
+    whole through `full_save`, which waits for any compaction under way and stops more starting
+    until it is done.
+    """
+
+    def __init__(self, dname: str, journal: EditJournal):
+        self.dname = dname
+        self.journal = journal
+        self.lock = threading.Lock()
+        # held while the json is being written, by compaction or a full save
+        self.write_lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.pending = False
+        self.saving = False
+
+    def request(self):
+        with self.lock:
+            self.pending = True
+            self._start()
+
+    def _start(self):
+        if self.thread is None and not self.saving:
+            self.thread = threading.Thread(target=self.run, daemon=False)
+            self.thread.start()
+
+    def run(self):
+        while True:
+            with self.lock:
+                if not self.pending or self.saving:
+                    self.thread = None
+                    return
+                self.pending = False
+            with self.write_lock:
+                self.compact()
+
+    def full_save(self, save: Callable[[], None]):
+        """write the whole json with save() in place of compacting: the journalled edits are in it, and are discarded."""
+        with self.lock:
+            self.saving = True
+            self.pending = False
+        try:
+            with self.write_lock:
+                save()
+                self.journal.reset()
+        finally:
+            with self.lock:
+                self.saving = False
+                if self.pending:
+                    self._start()
+
+    def compact(self):
+        json_path = self.dname + '.json'
+        compacting_path = self.journal.rotate()
+        info, licenses, images, _, image_annotations, categories = dataset_io.load_coco_json(json_path)
+        n = apply_ops(image_annotations, read_ops(compacting_path))
+        data = dataset_io.as_coco_dict(info, licenses, images, image_annotations, categories)
+        dataset_io.save_json(json_path, data)
+        os.remove(compacting_path)
+        print(f'Compacted {n} journalled edits into "{json_path}".')
+
+    def wait(self):
+        thread = self.thread
+        if thread is not None:
+            thread.join()
@@ -0,0 +1,102 @@
+import json
+from typing import Iterator, Tuple, Any, Set
+
+
+class JSONStreamReader:
+    """
+    Incremental reader for a JSON document whose top level is an object.
+
+    Only one value (or one array element) is decoded at a time, so a large file
+    never has to be held in memory as a whole.
+    """
+
+    CHUNK_SIZE = 1 << 20
+    WHITESPACE = ' \t\n\r'
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(self.CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in self.WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                raise ValueError('Unexpected end of JSON stream')
+
+    def expect(self, c: str):
+        if self.peek() != c:
+            raise ValueError(f'Expected "{c}" at JSON stream position {self.pos}, got "{self.buf[self.pos]}"')
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                v, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # a value running up to the end of the buffer (e.g. a number) may continue in the next chunk,
+            # as may a number cut off before a fraction or exponent that's only partly read ("3." or "3e")
+            if end == len(self.buf) or (self.buf[end] in '.eE' and isinstance(v, (int, float))):
+                if self.fill():
+                    continue
+            self.pos = end
+            return v
+
+    def separator(self, close: str) -> bool:
+        """consume "," between items; return False when the closing bracket is reached instead."""
+        c = self.peek()
+        self.pos += 1
+        if c == ',':
+            return True
+        if c == close:
+            return False
+        raise ValueError(f'Expected "," or "{close}" in JSON stream, got "{c}"')
+
+    def items(self) -> Iterator[Any]:
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if not self.separator(']'):
+                return
+
+    def object(self, streamed_keys: Set[str]) -> Iterator[Tuple[str, Any]]:
+        """
+        Iterate over the keys of the top level object. Values of keys in `streamed_keys` are
+        yielded as iterators over the array elements, and must be consumed before continuing.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            if key in streamed_keys:
+                yield key, self.items()
+            else:
+                yield key, self.value()
+            if not self.separator('}'):
+                return
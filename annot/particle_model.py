@@ -0,0 +1,148 @@
+from typing import List, Callable
+
+from PySide6.QtWidgets import QStyledItemDelegate, QStyleOptionButton, QStyle, QApplication, QComboBox
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QEvent, QSize, QTimer
+
+from .annotation import Annotation
+from .class_labels import CLASSES
+
+
+class ParticleTableModel(QAbstractTableModel):
+    """
+    Table of the annotations on the current image, read directly from `ParticleBrowser.annotations`.
+    Rows are inserted, removed and updated individually as annotations change.
+    """
+
+    COLUMNS = ['ID', 'Class', '', '']
+    CLASS_COLUMN = 1
+    EDIT_COLUMN = 2
+    DELETE_COLUMN = 3
+
+    def __init__(self, browser):
+        super().__init__()
+        self.browser = browser
+
+    @property
+    def annotations(self) -> List[Annotation]:
+        return self.browser.annotations
+
+    def reset(self):
+        self.beginResetModel()
+        self.endResetModel()
+
+    def append_annotation(self, a: Annotation):
+        r = len(self.annotations)
+        self.beginInsertRows(QModelIndex(), r, r)
+        self.annotations.append(a)
+        self.endInsertRows()
+
+    def remove_annotation(self, a: Annotation):
+        r = self.annotations.index(a)
+        self.beginRemoveRows(QModelIndex(), r, r)
+        del self.annotations[r]
+        self.endRemoveRows()
+        if r < len(self.annotations):
+            # IDs of following rows have shifted
+            self.dataChanged.emit(self.index(r, 0), self.index(len(self.annotations) - 1, 0))
+
+    def annotation_changed(self, a: Annotation):
+        try:
+            r = self.annotations.index(a)
+        except ValueError:
+            return
+        self.dataChanged.emit(self.index(r, 0), self.index(r, len(self.COLUMNS) - 1))
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.annotations)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole:
+            if orientation == Qt.Orientation.Horizontal:
+                return self.COLUMNS[section]
+            return str(section + 1)
+        return None
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        r, c = index.row(), index.column()
+        annot = self.annotations[r]
+        if c == 0 and role == Qt.ItemDataRole.DisplayRole:
+            return f'{self.browser.im_id}-{r+1}'
+        elif c == self.CLASS_COLUMN:
+            if role == Qt.ItemDataRole.DisplayRole:
+                return CLASSES[annot.class_label - 1] if annot.class_label > 0 else 'GUESS!'
+            elif role == Qt.ItemDataRole.EditRole:
+                return annot.class_label - 1
+        return None
+
+    def flags(self, index: QModelIndex):
+        flags = Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+        if index.column() == self.CLASS_COLUMN:
+            flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
+
+    def setData(self, index: QModelIndex, value, role=Qt.ItemDataRole.EditRole) -> bool:
+        if index.column() != self.CLASS_COLUMN or role != Qt.ItemDataRole.EditRole or value < 0:
+            return False
+        annot = self.annotations[index.row()]
+        if annot.class_label != value + 1:
+            self.browser.update_annot_label(value, annot)
+        return True
+
+
+class ClassDelegate(QStyledItemDelegate):
+    """Edit an annotation's class with a combo box, which only exists while editing."""
+
+    def createEditor(self, parent, option, index):
+        editor = QComboBox(parent)
+        editor.addItems(CLASSES)
+        editor.activated.connect(lambda _, e=editor: self.commit_and_close(e))
+        return editor
+
+    def commit_and_close(self, editor):
+        self.commitData.emit(editor)
+        self.closeEditor.emit(editor)
+
+    def setEditorData(self, editor: QComboBox, index: QModelIndex):
+        editor.setCurrentIndex(index.data(Qt.ItemDataRole.EditRole))
+        QTimer.singleShot(0, editor.showPopup)
+
+    def setModelData(self, editor: QComboBox, model, index: QModelIndex):
+        model.setData(index, editor.currentIndex(), Qt.ItemDataRole.EditRole)
+
+
+class ButtonDelegate(QStyledItemDelegate):
+    """Paint a push button in each cell, calling `callback(row)` when it is clicked."""
+
+    def __init__(self, text: str, callback: Callable[[int], None], parent=None):
+        super().__init__(parent)
+        self.text = text
+        self.callback = callback
+
+    def button_option(self, option) -> QStyleOptionButton:
+        opt = QStyleOptionButton()
+        opt.rect = option.rect.adjusted(1, 1, -1, -1)
+        opt.text = self.text
+        opt.state = QStyle.StateFlag.State_Enabled | QStyle.StateFlag.State_Raised
+        return opt
+
+    def paint(self, painter, option, index):
+        style = option.widget.style() if option.widget is not None else QApplication.style()
+        style.drawControl(QStyle.ControlElement.CE_PushButton, self.button_option(option), painter, option.widget)
+
+    def sizeHint(self, option, index) -> QSize:
+        return QSize(option.fontMetrics.horizontalAdvance(self.text) + 20, option.fontMetrics.height() + 10)
+
+    def editorEvent(self, event, model, option, index) -> bool:
+        if event.type() == QEvent.Type.MouseButtonRelease and option.rect.contains(event.position().toPoint()):
+            self.callback(index.row())
+            return True
+        return False
@@ -1,9 +1,12 @@
 from typing import List
 
-from PySide6.QtWidgets import QGroupBox, QVBoxLayout, QScrollArea, QTableWidget, QTableWidgetItem, QComboBox, QPushButton, QHeaderView
+from PySide6.QtWidgets import QGroupBox, QVBoxLayout, QScrollArea, QTableView, QHeaderView
 
 from .annotation import Annotation
-from .class_labels import CLASSES
+from .annotation_store import RawAnnotations
+from .simplify import simplify_raw
+from .particle_model import ParticleTableModel, ClassDelegate, ButtonDelegate
+from .spatial_index import AnnotationIndex
 
 
 class ParticleBrowser(QGroupBox):
@@ -12,67 +15,79 @@ class ParticleBrowser(QGroupBox):
         super().__init__('Particles')
         self.app = app
         self.annotations: List[Annotation] = []
+        # increased whenever annotations is replaced, added to or removed from
+        self.generation = 0
         self.current = None
         self.selected = None
         self.im_id = -1
+        self.spatial_index = AnnotationIndex()
 
         self.layout = QVBoxLayout(self)
         scroll = QScrollArea()
         self.layout.addWidget(scroll)
         scroll.layout = QVBoxLayout(scroll)
-        self.table_particles = QTableWidget()
-        self.table_particles.itemSelectionChanged.connect(self.selection_changed)
+        self.table_model = ParticleTableModel(self)
+        self.table_particles = QTableView()
+        self.table_particles.setModel(self.table_model)
+        self.table_particles.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.table_particles.setSelectionMode(QTableView.SelectionMode.SingleSelection)
+        self.table_particles.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)
+        self.table_particles.clicked.connect(self.table_clicked)
+        self.table_particles.selectionModel().selectionChanged.connect(self.selection_changed)
         scroll.layout.addWidget(self.table_particles)
 
-        self.table_particles.setColumnCount(4)
-        self.table_particles.setHorizontalHeaderLabels(['ID', 'Class', '', ''])
+        self.class_delegate = ClassDelegate(self.table_particles)
+        self.edit_delegate = ButtonDelegate('Edit', lambda r: self.toggle_editing(self.annotations[r]), self.table_particles)
+        self.delete_delegate = ButtonDelegate('Delete', lambda r: self.delete_annot(self.annotations[r]), self.table_particles)
+        self.table_particles.setItemDelegateForColumn(ParticleTableModel.CLASS_COLUMN, self.class_delegate)
+        self.table_particles.setItemDelegateForColumn(ParticleTableModel.EDIT_COLUMN, self.edit_delegate)
+        self.table_particles.setItemDelegateForColumn(ParticleTableModel.DELETE_COLUMN, self.delete_delegate)
+
         header = self.table_particles.horizontalHeader()
         header.setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents)
         header.setSectionResizeMode(1, QHeaderView.ResizeMode.ResizeToContents)
         header.setSectionResizeMode(2, QHeaderView.ResizeMode.ResizeToContents)
         header.setSectionResizeMode(3, QHeaderView.ResizeMode.ResizeToContents)
+        self.table_particles.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
 
         self.setMinimumHeight(300)
     
     def selection_changed(self, *args):
+        canvas = self.app.canvas
+        damage = canvas.annotation_region(self.selected)
+        if self.selected is not None:
+            self.selected.is_selected = False
         self.selected = None
-        try:
-            selected_index = self.table_particles.selectedIndexes()[0].row()
-            self.selected = self.annotations[selected_index]
-        except IndexError:
-            selected_index = None
-        for i, a in enumerate(self.annotations):
-            a.is_selected = i == selected_index
-        self.app.canvas.repaint()
+        rows = self.table_particles.selectionModel().selectedRows()
+        if rows:
+            self.selected = self.annotations[rows[0].row()]
+            self.selected.is_selected = True
+        canvas.schedule_repaint(damage + canvas.annotation_region(self.selected))
     
+    def table_clicked(self, index):
+        if index.column() == ParticleTableModel.CLASS_COLUMN:
+            self.table_particles.edit(index)
+
     def try_select_at_position(self, xy):
-        for i, annot in enumerate(self.annotations):
-            if xy in annot:
-                self.table_particles.selectRow(i)
-                break
+        annot = self.spatial_index.find(xy)
+        if annot is not None:
+            self.table_particles.selectRow(self.annotations.index(annot))
 
     def refresh_table(self):
-        self.table_particles.setRowCount(len(self.annotations))
-        for r, annot in enumerate(self.annotations):
-            self.table_particles.setItem(r, 0, QTableWidgetItem(f'{self.im_id}-{r+1}'))
-            # self.table_particles.setItem(r, 1, QTableWidgetItem(CLASSES[annot.class_label-1]))
-            class_sel = QComboBox()
-            class_sel.addItems(CLASSES)
-            class_sel.setCurrentIndex(annot.class_label - 1)
-            class_sel.currentIndexChanged.connect(lambda i, a=annot: self.update_annot_label(i, a))
-            self.table_particles.setCellWidget(r, 1, class_sel)
-
-            edit_button = QPushButton('Edit')
-            edit_button.clicked.connect(lambda checked=False, a=annot: self.toggle_editing(a))
-            self.table_particles.setCellWidget(r, 2, edit_button)
-
-            del_button = QPushButton('Delete')
-            del_button.clicked.connect(lambda checked=False, a=annot: self.delete_annot(a))
-            self.table_particles.setCellWidget(r, 3, del_button)
+        if self.selected is not None:
+            self.selected.is_selected = False
+            self.selected = None
+        self.table_model.reset()
+
+    def annotation_changed(self, a: Annotation):
+        self.table_model.annotation_changed(a)
+        self.app.canvas.invalidate_overlay()
 
     def update_annot_label(self, i, a):
         a.set_label(i+1)
-        self.app.canvas.repaint()
+        self.annotation_changed(a)
+        self.app.dataset_browser.record_edit('relabel', a)
+        self.app.canvas.schedule_repaint()
     
     def toggle_editing(self, a: Annotation):
         if self.current == a:
@@ -82,12 +97,16 @@ class ParticleBrowser(QGroupBox):
     
     def stop_editing(self):
         if self.current is not None:
+            a = self.current
             if len(self.current.points) < 3:
-                self.annotations.remove(self.current)
-                self.refresh_table()
-            self.current.stop_editing(self.refresh_table)
+                self.remove_annot(self.current)
+                self.app.dataset_browser.record_edit('delete', self.current)
+            self.current.stop_editing(lambda: self.annotation_changed(a))
+            if len(self.current.points) >= 3:
+                self.spatial_index.update(self.current)
+                self.app.dataset_browser.record_edit('modify', self.current)
             self.current = None
-            self.app.canvas.repaint()
+            self.app.canvas.schedule_repaint()
         self.app.toolbox.stop_editing_button.setEnabled(False)
         self.app.toolbox.current_tool().reset()
     
@@ -97,24 +116,59 @@ class ParticleBrowser(QGroupBox):
 
     def edit_annot(self, a: Annotation):
         if self.current is not None:
-            self.current.stop_editing(self.refresh_table)
+            previous = self.current
+            self.current.stop_editing(lambda: self.annotation_changed(previous))
+            self.spatial_index.update(self.current)
+            self.app.dataset_browser.record_edit('modify', self.current)
         self.current = a
         a.is_editing = True
-        self.refresh_table()
-        self.app.canvas.repaint()
+        self.app.canvas.schedule_repaint()
         self.app.toolbox.stop_editing_button.setEnabled(True)
 
+    def simplify(self, tolerance: float, method: str):
+        """simplify the outline of the annotation being edited or, if none is, of every annotation on the image."""
+        annots = [self.current] if self.current is not None else self.annotations
+        raw = RawAnnotations()
+        for a in annots:
+            raw.append(a.id_no, a.class_label, a.points.array.reshape(-1))
+        simplified = simplify_raw(raw, tolerance, method)
+        n_before, n_after = len(raw.coords) // 2, len(simplified.coords) // 2
+        for i, a in enumerate(annots):
+            points = simplified.segmentation(i).reshape(-1, 2)
+            if len(points) < len(a.points):
+                a.points = points
+                self.spatial_index.update(a)
+                self.app.dataset_browser.record_edit('modify', a)
+        self.app.set_info('simplified', f'{n_before} to {n_after} vertices')
+        self.app.canvas.invalidate_overlay()
+        self.app.canvas.schedule_repaint()
+
+    def remove_annot(self, a: Annotation):
+        if a is self.selected:
+            self.selected = None
+        self.spatial_index.remove(a)
+        self.table_model.remove_annotation(a)
+        self.generation += 1
+
     def delete_annot(self, a):
-        self.annotations.remove(a)
-        self.refresh_table()
-        self.app.canvas.repaint()
+        if a is self.current:
+            self.current = None
+            self.app.toolbox.stop_editing_button.setEnabled(False)
+        self.remove_annot(a)
+        self.app.dataset_browser.record_edit('delete', a)
+        self.app.canvas.schedule_repaint()
 
     def set_annotations(self, annotations: List[Annotation], im_id: int):
-        self.annotations = annotations
         if self.current is not None:
-            self.current.stop_editing(self.refresh_table)
+            self.current.stop_editing(lambda: None)
+            self.app.dataset_browser.record_edit('modify', self.current)
+        self.annotations = annotations
+        self.generation += 1
         self.current = None
         self.im_id = im_id
+        self.spatial_index.rebuild(annotations)
+        self.app.canvas.invalidate_overlay()
+        self.refresh_table()
 
     def get_current_annotation(self, x, y) -> Annotation:
         """
@@ -132,8 +186,12 @@ class ParticleBrowser(QGroupBox):
         return self.current
 
     def add_annotation(self, annotation: Annotation, is_current=True):
-        self.annotations.append(annotation)
+        self.table_model.append_annotation(annotation)
+        self.generation += 1
+        self.spatial_index.update(annotation)
         annotation.im_id = self.im_id
+        annotation.id_no = self.app.dataset_browser.image_annotations.new_id()
+        self.app.dataset_browser.record_edit('create', annotation)
         self.edit_annot(annotation)
 
     def finish_with_current(self):
@@ -0,0 +1,78 @@
+from typing import Optional
+
+import numpy as np
+
+
+class PointGrid:
+    """
+    Uniform grid over a fixed set of points (e.g. an annotation's vertices), for finding the
+    points near a position without measuring the distance to all of them.
+
+    Points are bucketed by cell, with the cells numbered column by column, and kept sorted by
+    cell number: the points of a column of cells in a box are then one contiguous run, found by
+    binary search.
+    """
+
+    def __init__(self, points: np.ndarray, cell_size: float):
+        self.points = np.array(points, dtype=np.float32).reshape(-1, 2)
+        self.cell_size = cell_size
+        if len(self.points):
+            cells = np.floor(self.points / cell_size).astype(np.int64)
+            self.origin = cells.min(axis=0)
+            cells -= self.origin
+            self.shape = cells.max(axis=0) + 1
+        else:
+            cells = np.zeros((0, 2), dtype=np.int64)
+            self.origin = np.zeros(2, dtype=np.int64)
+            self.shape = np.zeros(2, dtype=np.int64)
+        keys = cells[:, 0] * self.shape[1] + cells[:, 1]
+        self.order = np.argsort(keys, kind='stable')
+        self.keys = keys[self.order]
+
+    def __len__(self):
+        return len(self.points)
+
+    def in_box(self, x1: float, y1: float, x2: float, y2: float) -> np.ndarray:
+        """indices of points in the cells overlapping the box: a superset of the points inside it."""
+        c1 = np.maximum(np.floor(np.array([x1, y1]) / self.cell_size).astype(np.int64) - self.origin, 0)
+        c2 = np.minimum(np.floor(np.array([x2, y2]) / self.cell_size).astype(np.int64) - self.origin, self.shape - 1)
+        if (c2 < c1).any():
+            return np.zeros(0, dtype=np.int64)
+        columns = np.arange(c1[0], c2[0] + 1) * self.shape[1]
+        lo = np.searchsorted(self.keys, columns + c1[1], side='left')
+        hi = np.searchsorted(self.keys, columns + c2[1], side='right')
+        if len(columns) == 1:
+            return self.order[lo[0]:hi[0]]
+        return np.concatenate([self.order[l:h] for l, h in zip(lo, hi) if h > l] or [self.order[:0]])
+
+    def within(self, x: float, y: float, r: float) -> np.ndarray:
+        """indices of points closer than r to (x, y)."""
+        idx = self.in_box(x - r, y - r, x + r, y + r)
+        d = self.points[idx] - np.array((x, y))
+        return idx[np.einsum('ij,ij->i', d, d) < r*r]
+
+    def nearest(self, x: float, y: float) -> Optional[int]:
+        """index of the point closest to (x, y); None if there are none."""
+        n = len(self.points)
+        if not n:
+            return None
+        xy = np.array((x, y))
+        h = self.cell_size
+        widened = False
+        while (2*h / self.cell_size + 1) ** 2 <= n:
+            # nearest in a box of half-width h is the nearest overall if it's no further than h away
+            idx = self.in_box(x - h, y - h, x + h, y + h)
+            if len(idx):
+                d = self.points[idx] - xy
+                d2 = np.einsum('ij,ij->i', d, d)
+                i = np.argmin(d2)
+                if widened or d2[i] <= h*h:
+                    return int(idx[i])
+                # widen the box to take in every point as close as this one
+                h = float(np.sqrt(d2[i])) * (1 + 1e-6) + 1e-6
+                widened = True
+            else:
+                h *= 2
+        # box would cover more cells than there are points
+        d = self.points - xy
+        return int(np.argmin(np.einsum('ij,ij->i', d, d)))
@@ -0,0 +1,109 @@
+from typing import Tuple, Iterator
+
+import numpy as np
+
+
+class PointArray:
+    """
+    Polygon vertices stored in a contiguous (N, 2) float32 array, behaving like a list of (x, y)
+    tuples for existing callers. Use `array` for vectorised access; call `touch()` after editing
+    it in place, so that anything cached on the points (see `version`) is refreshed.
+    """
+
+    MIN_CAPACITY = 8
+
+    def __init__(self, points=()):
+        self._data = np.zeros((0, 2), dtype=np.float32)
+        self._n = 0
+        self.version = 0
+        self.set(points)
+
+    @property
+    def array(self) -> np.ndarray:
+        return self._data[:self._n]
+
+    def touch(self):
+        self.version += 1
+
+    def set(self, points):
+        arr = np.array(points, dtype=np.float32).reshape(-1, 2)
+        self._data = arr
+        self._n = len(arr)
+        self.touch()
+
+    def _reserve(self, n: int):
+        if n > len(self._data):
+            data = np.zeros((max(n, 2*len(self._data), self.MIN_CAPACITY), 2), dtype=np.float32)
+            data[:self._n] = self.array
+            self._data = data
+
+    def __len__(self):
+        return self._n
+
+    def __array__(self, dtype=None, copy=None):
+        arr = self.array
+        if dtype is not None:
+            return arr.astype(dtype)
+        return arr.copy()
+
+    def _index(self, i: int) -> int:
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError('point index out of range')
+        return i
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [tuple(pt) for pt in self.array[i].tolist()]
+        x, y = self._data[self._index(i)].tolist()
+        return x, y
+
+    def __setitem__(self, i: int, pt: Tuple[float, float]):
+        self._data[self._index(i)] = pt
+        self.touch()
+
+    def __delitem__(self, i: int):
+        self.pop(i)
+
+    def __iter__(self) -> Iterator[Tuple[float, float]]:
+        return (tuple(pt) for pt in self.array.tolist())
+
+    def __repr__(self):
+        return f'PointArray({self[:]})'
+
+    def append(self, pt: Tuple[float, float]):
+        self._reserve(self._n + 1)
+        self._data[self._n] = pt
+        self._n += 1
+        self.touch()
+
+    def insert(self, i: int, pt: Tuple[float, float]):
+        i = min(max(i + self._n if i < 0 else i, 0), self._n)
+        self._reserve(self._n + 1)
+        self._data[i+1:self._n+1] = self._data[i:self._n].copy()
+        self._data[i] = pt
+        self._n += 1
+        self.touch()
+
+    def pop(self, i: int = -1) -> Tuple[float, float]:
+        i = self._index(i)
+        pt = self[i]
+        self._data[i:self._n-1] = self._data[i+1:self._n].copy()
+        self._n -= 1
+        self.touch()
+        return pt
+
+    def clear(self):
+        self._n = 0
+        self.touch()
+
+    def clamp(self, w: float, h: float) -> bool:
+        """clip points to lie in [0, w] x [0, h]; return True if any were moved."""
+        arr = self.array
+        clipped = np.clip(arr, 0, (w, h))
+        if np.array_equal(clipped, arr):
+            return False
+        arr[:] = clipped
+        self.touch()
+        return True
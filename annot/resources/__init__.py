@@ -1,5 +1,6 @@
 import os
-from typing import Dict
+from typing import Dict, Iterator
+from collections.abc import Mapping
 from glob import glob
 
 from PySide6.QtGui import QImage
@@ -7,13 +8,27 @@ from PySide6.QtGui import QImage
 """Icons from Google material icon pack https://fonts.google.com/icons"""
 
 
-def _get_icons() -> Dict[str, QImage]:
-    rv = {}
-    for fn in glob(os.path.dirname(__file__) + os.sep + '*.png'):
-        icon = QImage(fn)
-        name, _ = os.path.splitext(os.path.basename(fn))
-        rv[name] = icon
-    return rv
+class _Icons(Mapping):
+    """icons by name, each read from disk the first time it is used."""
 
+    def __init__(self):
+        self.paths = {
+            os.path.splitext(os.path.basename(fn))[0]: fn
+            for fn in glob(os.path.dirname(__file__) + os.sep + '*.png')
+        }
+        self.icons: Dict[str, QImage] = {}
 
-ICONS = _get_icons()
+    def __getitem__(self, name: str) -> QImage:
+        icon = self.icons.get(name)
+        if icon is None:
+            icon = self.icons[name] = QImage(self.paths[name])
+        return icon
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.paths)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+
+ICONS = _Icons()
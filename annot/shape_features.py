@@ -0,0 +1,99 @@
+"""
+Shape descriptors of every annotation on an image, from the packed coordinates they are stored
+in (see `RawAnnotations`): area and perimeter for all outlines at once, the rest from OpenCV.
+
+Coordinates are truncated to whole pixels first, as `Annotation.cv_contour` does, so that
+descriptors and guessed classes agree with those of `guess_class`.
+"""
+import csv
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+from .annotation_store import RawAnnotations
+from .guess_label import classify
+
+
+FEATURES = (
+    'area', 'perimeter', 'equivalent_diameter', 'circularity',
+    'min_rect_width', 'min_rect_length', 'aspect_ratio', 'convex_area', 'convexity',
+)
+
+
+def polygon_areas_perimeters(xy: np.ndarray, starts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    areas (shoelace formula) and perimeters of closed polygons packed in xy, polygon i being
+    vertices starts[i] to starts[i+1].
+    """
+    n = len(starts) - 1
+    areas, perimeters = np.zeros(n), np.zeros(n)
+    nonempty = np.diff(starts) > 0
+    if not nonempty.any():
+        return areas, perimeters
+    # index of the vertex after each one, wrapping around each polygon
+    following = np.arange(1, len(xy) + 1)
+    following[starts[1:][nonempty] - 1] = starts[:-1][nonempty]
+    x, y = xy[:, 0], xy[:, 1]
+    xn, yn = x[following], y[following]
+    segments = starts[:-1][nonempty]
+    areas[nonempty] = 0.5 * np.abs(np.add.reduceat(x*yn - xn*y, segments))
+    perimeters[nonempty] = np.add.reduceat(np.hypot(xn - x, yn - y), segments)
+    return areas, perimeters
+
+
+def image_shape_features(raw: RawAnnotations) -> Dict[str, np.ndarray]:
+    """descriptors (see FEATURES) of each annotation in raw; NaN where an outline is degenerate."""
+    raw.finalise()
+    xy = np.trunc(raw.coords.astype(np.float64)).reshape(-1, 2)
+    starts = raw.offsets // 2
+    area, perimeter = polygon_areas_perimeters(xy, starts)
+
+    n = len(raw)
+    rect_w, rect_h, convex_area = np.zeros(n), np.zeros(n), np.zeros(n)
+    contour_points = xy.astype(np.int32)
+    for i in range(n):
+        contour = contour_points[starts[i]:starts[i+1]]
+        if len(contour):
+            _, (rect_w[i], rect_h[i]), _ = cv2.minAreaRect(contour)
+            convex_area[i] = cv2.contourArea(cv2.convexHull(contour))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        min_rect_width, min_rect_length = np.minimum(rect_w, rect_h), np.maximum(rect_w, rect_h)
+        features = dict(
+            area=area,
+            perimeter=perimeter,
+            equivalent_diameter=np.sqrt(4 * area / np.pi),
+            circularity=4 * np.pi * area / (perimeter * perimeter),
+            min_rect_width=min_rect_width,
+            min_rect_length=min_rect_length,
+            aspect_ratio=min_rect_width / min_rect_length,
+            convex_area=convex_area,
+            convexity=area / convex_area,
+        )
+    for values in features.values():
+        # divisions by zero, from outlines that are lines or points
+        values[~np.isfinite(values)] = np.nan
+    return features
+
+
+def guess_classes(features: Dict[str, np.ndarray], labels: np.ndarray, relabel_all=False) -> np.ndarray:
+    """labels with the unlabelled ones (all, if relabel_all) guessed from their shape, where it can be."""
+    labels = np.asarray(labels, dtype=np.int64)
+    guessable = np.isfinite(features['circularity']) & np.isfinite(features['aspect_ratio']) & np.isfinite(features['convexity'])
+    relabel = guessable & (relabel_all | (labels < 1))
+    guessed = classify(features['circularity'], features['aspect_ratio'], features['convexity'])
+    return np.where(relabel, guessed, labels)
+
+
+def write_table(path: str, columns: Dict[str, np.ndarray]):
+    """write a table of per-annotation columns, to csv or (if path ends .npz) numpy's npz."""
+    if path.lower().endswith('.npz'):
+        np.savez_compressed(path, **columns)
+        return
+    names: List[str] = list(columns)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(names)
+        for row in zip(*(columns[name].tolist() for name in names)):
+            writer.writerow([f'{v:.6g}' if isinstance(v, float) else v for v in row])
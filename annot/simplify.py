@@ -0,0 +1,173 @@
+"""
+Simplification of closed polygon outlines, dropping vertices that make little difference to the
+shape, for dense machine-generated annotations.
+
+Works on many polygons at once, packed into one (N, 2) array of vertices with polygon i being
+vertices starts[i] to starts[i+1] (as in `RawAnnotations`). Each round of either method is one
+set of array operations over every polygon still being simplified. Polygons are never reduced
+below three vertices.
+"""
+from typing import Tuple
+
+import numpy as np
+
+from .annotation_store import RawAnnotations
+
+
+def _ranges(firsts: np.ndarray, lengths: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """positions firsts[i] .. firsts[i] + lengths[i] - 1 for each i, with the i each is from and where each i begins."""
+    offsets = np.cumsum(lengths) - lengths
+    ids = np.repeat(np.arange(len(lengths)), lengths)
+    positions = np.arange(int(lengths.sum())) - offsets[ids] + firsts[ids]
+    return positions, ids, offsets
+
+
+def _first_argmax(values: np.ndarray, ids: np.ndarray, offsets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """maximum of values in each (non-empty, contiguous) group, and the index of the first value equal to it."""
+    maxima = np.maximum.reduceat(values, offsets)
+    at_max = np.flatnonzero(values == maxima[ids])
+    group = ids[at_max]
+    first = np.ones(len(at_max), dtype=bool)
+    first[1:] = group[1:] != group[:-1]
+    return maxima, at_max[first]
+
+
+def _segment_distances(p: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """distance of each point p from the line segment a-b."""
+    ab, ap = b - a, p - a
+    length2 = np.einsum('ij,ij->i', ab, ab)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.clip(np.einsum('ij,ij->i', ap, ab) / length2, 0, 1)
+    t[length2 == 0] = 0
+    d = ap - ab * t[:, None]
+    return np.hypot(d[:, 0], d[:, 1])
+
+
+def douglas_peucker(xy: np.ndarray, starts: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    mask of the vertices to keep so that no vertex dropped is further than tolerance from the
+    simplified outline. Each ring is split at its first vertex and the vertex furthest from it.
+    """
+    counts = np.diff(starts)
+    keep = np.ones(len(xy), dtype=bool)
+    polys = np.flatnonzero(counts > 3)
+    if not len(polys):
+        return keep
+    keep[_ranges(starts[polys], counts[polys])[0]] = False
+
+    # each ring as a closed path, its first vertex repeated at the end
+    ring_counts = counts[polys] + 1
+    ring, ring_ids, ring_starts = _ranges(starts[polys], ring_counts)
+    ring_ends = ring_starts + ring_counts - 1
+    ring[ring_ends] = starts[polys]
+    pts = xy[ring].astype(np.float64)
+
+    d = pts - pts[ring_starts][ring_ids]
+    _, anchors = _first_argmax(np.hypot(d[:, 0], d[:, 1]), ring_ids, ring_starts)
+    kept = np.zeros(len(ring), dtype=bool)
+    kept[ring_starts] = kept[anchors] = True
+    a, b = np.concatenate([ring_starts, anchors]), np.concatenate([anchors, ring_ends])
+
+    while True:
+        open_segments = b - a > 1
+        a, b = a[open_segments], b[open_segments]
+        if not len(a):
+            break
+        inside, ids, offsets = _ranges(a + 1, b - a - 1)
+        distance = _segment_distances(pts[inside], pts[a][ids], pts[b][ids])
+        furthest, at = _first_argmax(distance, ids, offsets)
+        split = furthest > tolerance
+        m = inside[at[split]]
+        kept[m] = True
+        a, b = np.concatenate([a[split], m]), np.concatenate([m, b[split]])
+
+    keep[ring[kept]] = True
+    # rings simplified to a line are left as they were
+    n_kept = np.bincount(np.repeat(np.arange(len(counts)), counts), weights=keep, minlength=len(counts))
+    collapsed = np.flatnonzero(n_kept < np.minimum(counts, 3))
+    keep[_ranges(starts[collapsed], counts[collapsed])[0]] = True
+    return keep
+
+
+def visvalingam(xy: np.ndarray, starts: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    mask of the vertices to keep, dropping those which make a triangle of area less than
+    tolerance squared with their neighbours, smallest first. Each round drops every vertex whose
+    triangle is no bigger than those of its neighbours (but never two neighbours at once).
+    """
+    min_area = tolerance * tolerance
+    index = np.arange(len(xy))
+    counts = np.diff(starts)
+    while True:
+        poly = np.repeat(np.arange(len(counts)), counts)
+        firsts = np.cumsum(counts) - counts
+        is_first = np.zeros(len(index), dtype=bool)
+        is_first[firsts[counts > 0]] = True
+        is_last = np.zeros(len(index), dtype=bool)
+        is_last[(firsts + counts - 1)[counts > 0]] = True
+        position = np.arange(len(index))
+        following = np.where(is_last, firsts[poly], position + 1)
+        preceding = np.where(is_first, (firsts + counts - 1)[poly], position - 1)
+
+        p = xy[index].astype(np.float64)
+        u, v = p[preceding] - p, p[following] - p
+        area = 0.5 * np.abs(u[:, 0]*v[:, 1] - u[:, 1]*v[:, 0])
+        candidate = (area < min_area) & (area <= area[preceding]) & (area <= area[following]) & (counts[poly] > 3)
+        # of a run of neighbouring candidates (equal areas), take every other one
+        run_start = candidate & (~candidate[preceding] | is_first)
+        in_run = position - np.maximum.accumulate(np.where(run_start, position, 0))
+        drop = candidate & (in_run % 2 == 0)
+        drop[is_last & drop[following]] = False
+        # leave at least three vertices, taking just the first of those chosen if need be
+        n_drop = np.bincount(poly, weights=drop, minlength=len(counts))
+        too_many = (counts - n_drop < 3)[poly]
+        before = np.cumsum(drop) - drop
+        drop &= ~too_many | (before == before[firsts[poly]])
+        if not drop.any():
+            break
+        index = index[~drop]
+        counts = counts - np.bincount(poly, weights=drop, minlength=len(counts)).astype(counts.dtype)
+
+    keep = np.zeros(len(xy), dtype=bool)
+    keep[index] = True
+    return keep
+
+
+METHODS = {
+    'dp': douglas_peucker,
+    'vw': visvalingam,
+}
+
+
+def simplify_raw(raw: RawAnnotations, tolerance: float, method='dp') -> RawAnnotations:
+    """a copy of the annotations in raw, with their outlines simplified."""
+    raw.finalise()
+    xy = raw.coords.reshape(-1, 2)
+    starts = raw.offsets // 2
+    keep = METHODS[method](xy, starts, tolerance)
+
+    simplified = RawAnnotations()
+    simplified.ids = list(raw.ids)
+    simplified.category_ids = list(raw.category_ids)
+    simplified.coords = xy[keep].reshape(-1)
+    poly = np.repeat(np.arange(len(raw)), np.diff(starts))
+    simplified.offsets = np.zeros(len(raw) + 1, dtype=np.int64)
+    np.cumsum(2 * np.bincount(poly, weights=keep, minlength=len(raw)).astype(np.int64), out=simplified.offsets[1:])
+    return simplified
+
+
+def simplify_points(points: np.ndarray, tolerance: float, method='dp') -> np.ndarray:
+    """the vertices of one outline that are kept by simplification."""
+    points = np.asarray(points).reshape(-1, 2)
+    return points[METHODS[method](points, np.array([0, len(points)]), tolerance)]
+
+
+def merge_within_cells(points: np.ndarray, cell_size: float) -> np.ndarray:
+    """
+    the vertices of one outline, with each run of consecutive vertices in the same cell of a grid
+    merged into its first: a rough but quick simplification, for drawing at low zoom.
+    """
+    cells = np.floor(points / cell_size).astype(np.int64)
+    keep = np.any(cells != np.roll(cells, 1, axis=0), axis=1)
+    keep[0] |= not keep.any()
+    return points[keep]
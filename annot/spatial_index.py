@@ -0,0 +1,79 @@
+from typing import Dict, List, Optional, Tuple, Iterable
+
+from .annotation import Annotation
+
+
+class AnnotationIndex:
+    """
+    Uniform grid over the bounding boxes of the annotations on an image, to find the annotation
+    under a point by testing only the few whose bounding box contains it.
+
+    The index is kept up to date by calling `update` when an annotation is edited; entries whose
+    points have changed since they were indexed are also refreshed when they come up in a query.
+    """
+
+    CELL_SIZE = 64
+
+    def __init__(self):
+        self.cells: Dict[Tuple[int, int], List[Annotation]] = {}
+        self.entries: Dict[Annotation, Tuple[int, int, list]] = {}
+        self.order = 0
+
+    def cell_range(self, x1, y1, x2, y2):
+        s = self.CELL_SIZE
+        for i in range(int(x1 // s), int(x2 // s) + 1):
+            for j in range(int(y1 // s), int(y2 // s) + 1):
+                yield i, j
+
+    def rebuild(self, annotations: Iterable[Annotation]):
+        self.cells = {}
+        self.entries = {}
+        self.order = 0
+        for a in annotations:
+            self.update(a)
+
+    def remove(self, a: Annotation):
+        entry = self.entries.get(a)
+        if entry is None:
+            return None
+        order, _, cells = entry
+        for cell in cells:
+            self.cells[cell].remove(a)
+            if not self.cells[cell]:
+                del self.cells[cell]
+        del self.entries[a]
+        return order
+
+    def update(self, a: Annotation):
+        order = self.remove(a)
+        if order is None:
+            order = self.order
+            self.order += 1
+        cells = []
+        if len(a.points):
+            cells = list(self.cell_range(*a.bounds()))
+            for cell in cells:
+                self.cells.setdefault(cell, []).append(a)
+        self.entries[a] = order, a.points.version, cells
+
+    def candidates(self, x: float, y: float) -> List[Annotation]:
+        """annotations whose bounding box contains (x, y), in the order they were added."""
+        s = self.CELL_SIZE
+        cell = int(x // s), int(y // s)
+        rv = []
+        for a in list(self.cells.get(cell, [])):
+            order, version, _ = self.entries[a]
+            if version != a.points.version:
+                self.update(a)
+                if a not in self.cells.get(cell, []):
+                    continue
+            x1, y1, x2, y2 = a.bounds()
+            if x1 <= x <= x2 and y1 <= y <= y2:
+                rv.append((order, a))
+        return [a for _, a in sorted(rv, key=lambda oa: oa[0])]
+
+    def find(self, xy) -> Optional[Annotation]:
+        for a in self.candidates(*xy):
+            if xy in a:
+                return a
+        return None
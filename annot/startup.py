@@ -0,0 +1,46 @@
+import time
+import importlib
+from typing import List, Tuple
+
+
+# imported in order, so each is timed without the dependencies already imported by those above it
+SUBSYSTEMS = [
+    ('Qt', 'PySide6.QtWidgets'),
+    ('numpy', 'numpy'),
+    ('OpenCV', 'cv2'),
+    ('annotations', 'annot.annotation_store'),
+    ('dataset io', 'annot.dataset_io'),
+    ('canvas', 'annot.canvas'),
+    ('tools', 'annot.tool_box'),
+    ('augmentations', 'annot.image_aug'),
+    ('particles', 'annot.particles'),
+    ('dataset browser', 'annot.dataset_browser'),
+    ('window', 'annot.window'),
+]
+
+
+class StartupTimer:
+    """Time taken by each step of starting up, since the timer was created."""
+
+    def __init__(self):
+        self.start = self.last = time.perf_counter()
+        self.steps: List[Tuple[str, float]] = []
+
+    def mark(self, step: str):
+        now = time.perf_counter()
+        self.steps.append((step, now - self.last))
+        self.last = now
+
+    def total(self) -> float:
+        return self.last - self.start
+
+    def import_subsystems(self):
+        for name, module in SUBSYSTEMS:
+            importlib.import_module(module)
+            self.mark(f'import {name}')
+
+    def report(self) -> str:
+        width = max(len(step) for step, _ in self.steps)
+        lines = [f'{step:<{width}}  {dt*1000:8.1f} ms' for step, dt in self.steps]
+        lines.append(f'{"total":<{width}}  {self.total()*1000:8.1f} ms')
+        return '\n'.join(lines)
@@ -0,0 +1,123 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import cv2
+
+from PySide6.QtGui import QImage
+
+
+class TilePyramid:
+    """
+    Downsampled copies of a (grayscale) image, halving in size at each level, cut into tiles for
+    drawing. Level 0 is the image itself; the other levels are built in a background thread the
+    first time they are asked for, and `on_level_ready` is called (from that thread) when one is
+    available.
+
+    Tiles are converted to QImages as they are drawn, and kept in a least-recently-used cache
+    bounded by size in bytes.
+    """
+
+    TILE_SIZE = 512
+    MIN_LEVEL_SIZE = 256
+
+    def __init__(self, image: np.ndarray, on_level_ready: Callable[[], None] = lambda: None, max_tile_bytes: int = 1 << 26):
+        self.levels: List[np.ndarray] = [image]
+        self.on_level_ready = on_level_ready
+        self.max_tile_bytes = max_tile_bytes
+        self.tiles: Dict[Tuple[int, int, int], Tuple[np.ndarray, QImage]] = OrderedDict()
+        self.tile_bytes = 0
+        self.wanted = 0
+        self.closed = False
+        self.thread = None
+        self.lock = threading.Lock()
+
+        h, w = image.shape[:2]
+        self.n_levels = 1
+        while max(w, h) >> self.n_levels >= self.MIN_LEVEL_SIZE:
+            self.n_levels += 1
+
+    def close(self):
+        """stop building levels; the pyramid is no longer needed."""
+        with self.lock:
+            self.closed = True
+            self.tiles.clear()
+            self.tile_bytes = 0
+
+    def level_for_scale(self, scale: float) -> int:
+        """coarsest level which still has at least one pixel per screen pixel at this scale."""
+        level = 0
+        while level + 1 < self.n_levels and scale <= 0.5 ** (level + 1):
+            level += 1
+        return level
+
+    def level(self, level: int) -> Optional[np.ndarray]:
+        """return the level if it has been built, otherwise start building it and return None."""
+        with self.lock:
+            if level < len(self.levels):
+                return self.levels[level]
+            self.wanted = max(self.wanted, level)
+            if self.thread is None and not self.closed:
+                self.thread = threading.Thread(target=self.build, name='pyramid', daemon=True)
+                self.thread.start()
+        return None
+
+    def build(self):
+        while True:
+            with self.lock:
+                if self.closed or len(self.levels) > self.wanted:
+                    self.thread = None
+                    return
+                src = self.levels[-1]
+            h, w = src.shape[:2]
+            level = cv2.resize(src, ((w + 1) // 2, (h + 1) // 2), interpolation=cv2.INTER_AREA)
+            level.flags.writeable = False
+            with self.lock:
+                if self.closed:
+                    continue
+                self.levels.append(level)
+            self.on_level_ready()
+
+    def tile(self, level: int, tx: int, ty: int) -> QImage:
+        key = level, tx, ty
+        with self.lock:
+            cached = self.tiles.get(key)
+            if cached is not None:
+                self.tiles.move_to_end(key)
+                return cached[1]
+
+        s = self.TILE_SIZE
+        array = np.ascontiguousarray(self.levels[level][ty*s:(ty+1)*s, tx*s:(tx+1)*s])
+        h, w = array.shape
+        image = QImage(array, w, h, w, QImage.Format.Format_Grayscale8)
+
+        with self.lock:
+            if key not in self.tiles:
+                # the QImage shares the array's memory, so both are kept
+                self.tiles[key] = array, image
+                self.tile_bytes += array.nbytes
+                while self.tile_bytes > self.max_tile_bytes and len(self.tiles) > 1:
+                    _, (evicted, _) = self.tiles.popitem(last=False)
+                    self.tile_bytes -= evicted.nbytes
+        return image
+
+    def visible_tiles(self, level: int, x1: float, y1: float, x2: float, y2: float) -> Iterator[Tuple[Tuple[float, float, float, float], QImage]]:
+        """
+        tiles of a built level covering the region (x1, y1)-(x2, y2) of the full resolution image,
+        each with its (x, y, w, h) extent in full resolution pixels.
+        """
+        h0, w0 = self.levels[0].shape[:2]
+        h, w = self.levels[level].shape[:2]
+        sx, sy = w0 / w, h0 / h
+        lx1, ly1 = max(int(x1 / sx), 0), max(int(y1 / sy), 0)
+        lx2, ly2 = min(int(np.ceil(x2 / sx)), w), min(int(np.ceil(y2 / sy)), h)
+        s = self.TILE_SIZE
+        for ty in range(ly1 // s, (ly2 - 1) // s + 1):
+            for tx in range(lx1 // s, (lx2 - 1) // s + 1):
+                px, py = tx*s, ty*s
+                pw, ph = min(s, w - px), min(s, h - py)
+                yield (px*sx, py*sy, pw*sx, ph*sy), self.tile(level, tx, ty)
+
+    def stats(self) -> str:
+        return f'{len(self.levels)}/{self.n_levels} levels, {len(self.tiles)} tiles, {self.tile_bytes / 1e6:.0f} MB'
@@ -1,4 +1,4 @@
-from PySide6.QtWidgets import QGroupBox, QVBoxLayout, QRadioButton, QPushButton
+from PySide6.QtWidgets import QGroupBox, QVBoxLayout, QHBoxLayout, QWidget, QRadioButton, QPushButton, QDoubleSpinBox, QComboBox
 from PySide6.QtGui import QPaintEvent, QPainter, QImage
 from PySide6.QtCore import Qt
 
@@ -40,23 +40,54 @@ class ToolBox(QGroupBox):
         self.selected_tool = None
 
         self.layout = QVBoxLayout(self)
+        self.options = {}
 
         for tool_name, tool in TOOLS.items():
             tool.name = tool_name
             chk = IconatedRadioButton(tool_name, icon=tool.icon)
             chk.toggled.connect(lambda v, tool=tool: self.selected_tool_changed(v, tool))
             self.layout.addWidget(chk)
+            options = tool.options_widget()
+            if options is not None:
+                options.setVisible(False)
+                self.layout.addWidget(options)
+                self.options[tool] = options
             if self.selected_tool is None:
                 chk.setChecked(True)
         
         self.stop_editing_button = QPushButton('Stop editing')
         self.layout.addWidget(self.stop_editing_button)
         self.stop_editing_button.clicked.connect(self.stop_editing)
+
+        simplify_box = QWidget()
+        simplify_box.layout = QHBoxLayout(simplify_box)
+        simplify_box.layout.setContentsMargins(0, 0, 0, 0)
+        self.simplify_button = QPushButton('Simplify')
+        self.simplify_button.setToolTip('Drop vertices that make little difference to the outline of the annotation being edited (or, if none is, to every annotation on the image).')
+        self.simplify_button.clicked.connect(self.simplify)
+        simplify_box.layout.addWidget(self.simplify_button)
+        self.simplify_tolerance = QDoubleSpinBox()
+        self.simplify_tolerance.setRange(0.1, 20.0)
+        self.simplify_tolerance.setSingleStep(0.5)
+        self.simplify_tolerance.setValue(1.0)
+        self.simplify_tolerance.setSuffix(' px')
+        self.simplify_tolerance.setToolTip('How far outlines may move')
+        simplify_box.layout.addWidget(self.simplify_tolerance)
+        self.simplify_method = QComboBox()
+        self.simplify_method.addItem('Douglas-Peucker', 'dp')
+        self.simplify_method.addItem('Visvalingam', 'vw')
+        simplify_box.layout.addWidget(self.simplify_method)
+        self.layout.addWidget(simplify_box)
     
+    def simplify(self):
+        self.app.particle_browser.simplify(self.simplify_tolerance.value(), self.simplify_method.currentData())
+
     def stop_editing(self):
         self.app.particle_browser.stop_editing()
 
     def selected_tool_changed(self, v, tool):
+        if tool in self.options:
+            self.options[tool].setVisible(v)
         if v:
             self.selected_tool = tool
             self.app.set_info('tool', tool.name)
@@ -1,21 +1,75 @@
+from weakref import WeakKeyDictionary
+
 import numpy as np
 
-from PySide6.QtGui import QPainter, QColor
+from PySide6.QtWidgets import QWidget, QFormLayout, QComboBox, QDoubleSpinBox
+from PySide6.QtGui import QPainter, QColor, QPen
+from PySide6.QtCore import Qt, QLineF
 
 from ..annotation import Annotation
 from .tool_base import Tool
 
 
+def signed_area(points: np.ndarray) -> float:
+    x, y = points[:, 0].astype(float), points[:, 1].astype(float)
+    return 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y))
+
+
+def edge_normals(points: np.ndarray) -> np.ndarray:
+    """unit outward normals of the edges of a polygon, edge i running from vertex i to i+1."""
+    points = points.astype(float)
+    edges = np.roll(points, -1, axis=0) - points
+    lengths = np.hypot(edges[:, 0], edges[:, 1])
+    lengths[lengths == 0] = 1
+    # (ey, -ex) points outwards for a polygon with positive signed area
+    normals = np.stack([edges[:, 1], -edges[:, 0]], axis=1) / lengths[:, None]
+    return -normals if signed_area(points) < 0 else normals
+
+
+def vertex_normals(points: np.ndarray) -> np.ndarray:
+    """unit outward normals at the vertices of a polygon: the mean of the normals of the edges either side."""
+    normals = edge_normals(points)
+    normals = normals + np.roll(normals, 1, axis=0)
+    mag = np.hypot(normals[:, 0], normals[:, 1])
+    mag[mag == 0] = 1
+    return normals / mag[:, None]
+
+
+def offset_vectors(points: np.ndarray, max_miter: float = 2.0) -> np.ndarray:
+    """
+    how far each vertex moves for the polygon's edges to move out by one unit: along the vertex
+    normal, lengthened at corners (miter), but by no more than max_miter at sharp ones.
+    """
+    normals = vertex_normals(points)
+    cos_half_angle = np.einsum('ij,ij->i', normals, edge_normals(points))
+    return normals / np.maximum(cos_half_angle, 1 / max_miter)[:, None]
+
+
 class BikePumpTool(Tool):
+    """
+    Inflates (left button) or deflates (right button) the annotation being edited, either
+    radially, away from its centroid, or along the vertex normals, which grows concave outlines
+    evenly rather than just scaling them.
+    """
 
     show_next_point = False
     icon = 'expand'
 
+    RADIAL = 'Radial'
+    NORMAL = 'Normal offset'
+
+    def __init__(self):
+        self.mode = self.RADIAL
+        self.step = 1.0
+        self.stroke_centroid = None
+        self.centroids = WeakKeyDictionary()
+
     def draw_cursor(self, x, y, p: QPainter):
         p.drawRect(x-2, y-2, 4, 4)
 
     def add(self, x, y, a: Annotation):
         _ = x, y
+        self.stroke_centroid = self.centroid(a)
         self.pump(a, True)
 
     def add_move(self, x, y, a: Annotation):
@@ -24,36 +78,74 @@ class BikePumpTool(Tool):
 
     def remove(self, x, y, a: Annotation):
         _ = x, y
+        self.stroke_centroid = self.centroid(a)
         self.pump(a, False)
 
     def remove_move(self, x, y, a: Annotation):
         _ = x, y
         self.pump(a, False)
 
-    @staticmethod
-    def pump(a: Annotation, should_inflate: bool):
+    def mouse_release(self, is_left: bool):
+        self.stroke_centroid = None
+
+    def centroid(self, a: Annotation) -> np.ndarray:
+        cached = self.centroids.get(a)
+        if cached is None or cached[0] != a.points.version:
+            cached = self.centroids[a] = a.points.version, a.points.array.mean(axis=0)
+        return cached[1]
+
+    def pump(self, a: Annotation, should_inflate: bool):
         if len(a.points) < 3:
             return
-        x = [p[0] for p in a.points]
-        y = [p[1] for p in a.points]
-        cx, cy = centroid = np.array([sum(x)/len(x), sum(y)/len(y)])
-        delta = 1 if should_inflate else -1
-        for i, (px, py) in enumerate(a.points):
-            dir = np.array([(px - cx), (py - cy)])
-            dir /= np.sqrt(np.dot(dir, dir))
-            a.points[i] = float(px + dir[0]*delta), float(py + dir[1]*delta)
-
-    def draw_widgets(self, mouse_pos, a: Annotation, p: QPainter, _):
-        x = [p[0] for p in a.points]
-        y = [p[1] for p in a.points]
-        cx, cy = centroid = np.array([sum(x)/len(x), sum(y)/len(y)])
-        # p.setBrush(QColor('black'))
-        # p.drawEllipse(cx-3, cy-3, 6, 6)
-        # p.setBrush(None)
-        for (px, py) in a.points:
-            pen = p.pen()
-            style = pen.style()
-            pen.setStyle(style.DashLine)
-            p.setPen(pen)
-            p.drawLine(cx, cy, px, py)
+        delta = self.step if should_inflate else -self.step
+        pts = a.points.array
+        if self.mode == self.NORMAL:
+            pts += (offset_vectors(pts) * delta).astype(np.float32)
+        else:
+            # the centre stays put for the whole stroke
+            centroid = self.stroke_centroid if self.stroke_centroid is not None else self.centroid(a)
+            d = pts - centroid
+            mag = np.hypot(d[:, 0], d[:, 1])
+            moved = mag > 0
+            pts[moved] += d[moved] / mag[moved, None] * delta
+        a.points.touch()
+
+    def draw_widgets(self, mouse_pos, a: Annotation, p: QPainter, o):
+        if len(a.points) < 3:
+            return
+        pts = a.points.array.astype(float) + o
+        pen = QPen(p.pen())
+        pen.setStyle(Qt.PenStyle.DashLine)
+        p.setPen(pen)
+        if self.mode == self.NORMAL:
+            ends = pts + vertex_normals(a.points.array) * 5
+            lines = np.concatenate([pts, ends], axis=1)
+        else:
+            cx, cy = self.centroid(a) + o
+            lines = np.concatenate([np.broadcast_to((cx, cy), pts.shape), pts], axis=1)
+        p.drawLines([QLineF(*line) for line in lines.tolist()])
+
+    def set_mode(self, mode: str):
+        self.mode = mode
+
+    def set_step(self, step: float):
+        self.step = step
 
+    def options_widget(self):
+        w = QWidget()
+        w.layout = QFormLayout(w)
+        w.layout.setContentsMargins(0, 0, 0, 0)
+        cmb_mode = QComboBox()
+        cmb_mode.addItems([self.RADIAL, self.NORMAL])
+        cmb_mode.setCurrentText(self.mode)
+        cmb_mode.setToolTip("Move vertices away from the centroid, or out along the outline's normals.")
+        cmb_mode.currentTextChanged.connect(self.set_mode)
+        w.layout.addRow('Mode', cmb_mode)
+        spin_step = QDoubleSpinBox()
+        spin_step.setRange(0.1, 20.0)
+        spin_step.setSingleStep(0.5)
+        spin_step.setValue(self.step)
+        spin_step.setSuffix(' px')
+        spin_step.valueChanged.connect(self.set_step)
+        w.layout.addRow('Step', spin_step)
+        return w
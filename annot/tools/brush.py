@@ -1,35 +1,94 @@
-import math
+import numpy as np
 
-from PySide6.QtGui import QPainter, QColor
+from PySide6.QtWidgets import QWidget, QFormLayout, QSpinBox, QCheckBox
+from PySide6.QtGui import QPainter, QColor, QPen
+from PySide6.QtCore import Qt, QRectF
 
 from ..annotation import Annotation
 from .tool_base import Tool
 
 
 class BrushTool(Tool):
+    """
+    Sweeps vertices out of the way of a circular brush. Vertices within the brush radius R are
+    pushed to its edge; with smooth falloff, those within 2R are pushed out by
+    R(1 - d/2R)^2, which tapers to nothing at 2R and keeps the vertices in order.
+    """
 
     HALF_BRUSH_SIZE = 20
+    MIN_RADIUS = 2
+    MAX_RADIUS = 200
 
     icon = 'sweep_brush'
 
+    def __init__(self):
+        self.radius = self.HALF_BRUSH_SIZE
+        self.smooth = False
+
     def draw_cursor(self, x, y, p: QPainter):
+        r = self.radius
         p.setPen(QColor(0, 255, 0, 255))
         p.setBrush(QColor(0, 0, 0, 0))
-        p.drawEllipse(x-self.HALF_BRUSH_SIZE, y-self.HALF_BRUSH_SIZE, self.HALF_BRUSH_SIZE*2, self.HALF_BRUSH_SIZE*2)
+        p.drawEllipse(QRectF(x - r, y - r, 2*r, 2*r))
+        if self.smooth:
+            pen = QPen(QColor(0, 255, 0, 128))
+            pen.setStyle(Qt.PenStyle.DotLine)
+            p.setPen(pen)
+            p.drawEllipse(QRectF(x - 2*r, y - 2*r, 4*r, 4*r))
+
+    def cursor_radius(self) -> float:
+        return (2 if self.smooth else 1) * self.radius + 2
 
     def add(self, x, y, a: Annotation):
         pass
 
     def add_move(self, x, y, a: Annotation):
-        for i, (px, py) in enumerate(a.points):
-            u = (px - x), (py - y)
-            mag = math.sqrt(u[0]*u[0] + u[1]*u[1])
-            if mag < self.HALF_BRUSH_SIZE:
-                u = u[0]/mag*self.HALF_BRUSH_SIZE, u[1]/mag*self.HALF_BRUSH_SIZE
-                a.points[i] = x+u[0], y+u[1]
+        r = self.radius
+        reach = 2*r if self.smooth else r
+        # every move changes the vertices, so a grid over them would be rebuilt each time: one pass is quicker
+        pts = a.points.array
+        d = pts - (x, y)
+        idx = np.flatnonzero(np.einsum('ij,ij->i', d, d) <= reach * reach)
+        if not len(idx):
+            return
+
+        u = d[idx]
+        mag = np.hypot(u[:, 0], u[:, 1])
+        # a vertex right under the cursor has no direction to be pushed in: it is left until the brush moves
+        keep = mag > 0
+        idx, u, mag = idx[keep], u[keep], mag[keep]
+        if self.smooth:
+            new_mag = mag + r * (1 - mag / (2*r)) ** 2
+        else:
+            new_mag = np.full_like(mag, r)
+        pts[idx] = (x, y) + u * (new_mag / mag)[:, None]
+        a.points.touch()
 
     def remove(self, x, y, a: Annotation):
         pass
 
     def remove_move(self, x, y, a: Annotation):
         pass
+
+    def set_radius(self, r: int):
+        self.radius = r
+
+    def set_smooth(self, smooth: bool):
+        self.smooth = smooth
+
+    def options_widget(self):
+        w = QWidget()
+        w.layout = QFormLayout(w)
+        w.layout.setContentsMargins(0, 0, 0, 0)
+        spin_radius = QSpinBox()
+        spin_radius.setRange(self.MIN_RADIUS, self.MAX_RADIUS)
+        spin_radius.setValue(self.radius)
+        spin_radius.setSuffix(' px')
+        spin_radius.valueChanged.connect(self.set_radius)
+        w.layout.addRow('Radius', spin_radius)
+        chk_smooth = QCheckBox()
+        chk_smooth.setChecked(self.smooth)
+        chk_smooth.setToolTip('Push vertices out gradually, up to twice the radius away, rather than to the edge of the brush.')
+        chk_smooth.toggled.connect(self.set_smooth)
+        w.layout.addRow('Smooth falloff', chk_smooth)
+        return w
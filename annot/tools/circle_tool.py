@@ -3,7 +3,6 @@ from typing import Tuple
 from PySide6.QtGui import QPainter, QColor
 
 import numpy as np
-from scipy.optimize import minimize
 
 from annot.annotation import Annotation
 
@@ -55,6 +54,13 @@ class CircleTool(Tool):
             p.setPen(QColor(0, 0, 255, 255))
             p.drawEllipse(cx-r+o, cy-r+o, d, d)
 
+    def widget_bounds(self, x, y, a: Annotation):
+        if not self.points:
+            return None
+        cx, cy, r = self.fit_circle(additional_point=(x, y))
+        xs, ys = np.array([*self.points, (x, y)]).T
+        return min(cx - r, xs.min()), min(cy - r, ys.min()), max(cx + r, xs.max()), max(cy + r, ys.max())
+
     def add(self, x, y, a: Annotation):
         self.points.append((x, y))
         a.points = self.interp_points(*self.fit_circle())
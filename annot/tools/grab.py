@@ -1,17 +1,29 @@
+import numpy as np
+
+from PySide6.QtWidgets import QWidget, QFormLayout, QSpinBox
 from PySide6.QtGui import QPainter, QColor
+from PySide6.QtCore import QRectF
 
 from ..annotation import Annotation
 from .tool_base import Tool
 
 
 class GrabTool(Tool):
+    """
+    Drags the vertex nearest the cursor; with a grab radius set, drags every vertex within that
+    radius of it together.
+    """
 
     show_next_point = False
     icon = 'pan_hand'
+    MAX_RADIUS = 200
 
     def __init__(self):
         self.selected = None
         self.point_index = None
+        self.radius = 0
+        self.grabbed = None
+        self.grab_start = None
 
     def draw_cursor(self, x, y, p: QPainter):
         p.setPen(QColor(0, 0, 255, 255))
@@ -20,15 +32,32 @@ class GrabTool(Tool):
 
     @staticmethod
     def get_nearest_point_index(x, y, a):
-        i, _ = sorted(list(enumerate(a.points)), key=lambda ip: ((ip[1][0] - x)**2.0 + (ip[1][1] - y)**2.0)**0.5)[0]
-        return i
+        return a.point_grid().nearest(x, y)
+
+    def get_grabbed_indices(self, x, y, a) -> np.ndarray:
+        idx = a.point_grid().within(x, y, self.radius) if self.radius > 0 else []
+        if not len(idx):
+            i = self.get_nearest_point_index(x, y, a)
+            idx = [] if i is None else [i]
+        return np.asarray(idx, dtype=np.int64)
 
     def add(self, x, y, a: Annotation):
+        if not len(a.points):
+            return
         self.selected = a
         self.point_index = self.get_nearest_point_index(x, y, a)
+        if self.radius > 0:
+            self.grabbed = self.get_grabbed_indices(x, y, a)
+            self.grab_start = x, y, a.points.array[self.grabbed].copy()
 
     def add_move(self, x, y, a: Annotation):
-        if self.selected is not None:
+        if self.selected is None:
+            return
+        if self.grab_start is not None:
+            x0, y0, start = self.grab_start
+            self.selected.points.array[self.grabbed] = start + (x - x0, y - y0)
+            self.selected.points.touch()
+        else:
             self.selected.points[self.point_index] = (x, y)
 
     def remove(self, x, y, a: Annotation):
@@ -37,17 +66,41 @@ class GrabTool(Tool):
     def remove_move(self, x, y, a: Annotation):
         pass
 
-    def draw_widgets(self, mouse_pos, a: Annotation, p: QPainter, _):
-        if mouse_pos is None:
+    def draw_widgets(self, mouse_pos, a: Annotation, p: QPainter, o):
+        if mouse_pos is None or not len(a.points):
             return
 
+        mx, my = mouse_pos[0] - o, mouse_pos[1] - o
         if self.selected is None:
-            x, y = a.points[self.get_nearest_point_index(*mouse_pos, a)]
+            idx = self.get_grabbed_indices(mx, my, a)
+            points = a.points.array[idx]
+        elif self.selected is a:
+            idx = self.grabbed if self.grab_start is not None else [self.point_index]
+            points = a.points.array[idx]
         else:
-            x, y = self.selected.points[self.point_index]
+            return
 
-        p.drawEllipse(x-5, y-5, 10, 10)
+        for x, y in (points + o).tolist():
+            p.drawEllipse(QRectF(x-5, y-5, 10, 10))
 
     def mouse_release(self, is_left: bool):
         if is_left:
             self.selected = self.point_index = None
+            self.grabbed = self.grab_start = None
+
+    def set_radius(self, r: int):
+        self.radius = r
+
+    def options_widget(self):
+        w = QWidget()
+        w.layout = QFormLayout(w)
+        w.layout.setContentsMargins(0, 0, 0, 0)
+        spin_radius = QSpinBox()
+        spin_radius.setRange(0, self.MAX_RADIUS)
+        spin_radius.setValue(self.radius)
+        spin_radius.setSuffix(' px')
+        spin_radius.setSpecialValueText('nearest')
+        spin_radius.setToolTip('Grab every vertex within this distance of the cursor, or just the nearest.')
+        spin_radius.valueChanged.connect(self.set_radius)
+        w.layout.addRow('Grab radius', spin_radius)
+        return w
@@ -7,6 +7,7 @@ class Tool:
 
     show_next_point = False
     icon = None
+    CURSOR_RADIUS = 12
 
     def reset(self):
         pass
@@ -31,3 +32,18 @@ class Tool:
 
     def draw_widgets(self, mouse_pos, a: Annotation, p: QPainter, o: int):
         pass
+
+    def cursor_radius(self) -> float:
+        """how far (in image pixels) the cursor drawn by `draw_cursor` extends from the mouse."""
+        return self.CURSOR_RADIUS
+
+    def widget_bounds(self, x, y, a: Annotation):
+        """
+        (x1, y1, x2, y2) bounds of what `draw_widgets` draws with the mouse at (x, y), if it goes
+        beyond the annotation's own bounds; None if it doesn't.
+        """
+        return None
+
+    def options_widget(self):
+        """widget with the tool's settings, shown in the tool box while it's selected; None if it has none."""
+        return None
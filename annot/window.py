@@ -19,6 +19,7 @@ from .palette import ClassPalette
 from .particles import ParticleBrowser
 from .dataset_browser import DatasetBrowser
 from .image_aug import AugmentationToolbox
+from .image_cache import ImageCache
 from .resources import ICONS
 
 
@@ -31,6 +32,7 @@ class MainWindow(QMainWindow):
         self.info_parts = {}
 
         self.setMouseTracking(True)
+        self.image_cache = ImageCache()
         self.canvas = Canvas(self)
         self.toolbox = ToolBox(self)
         self.class_palette = ClassPalette(self)
@@ -73,7 +75,12 @@ class MainWindow(QMainWindow):
         canvas_container.setStyleSheet('background-color: white;')
         centre.layout.addWidget(canvas_container)
 
-        self.canvas.setParent(canvas_container)
+        if self.canvas.VIEWPORT_MODE:
+            canvas_container.layout = QVBoxLayout(canvas_container)
+            canvas_container.layout.setContentsMargins(0, 0, 0, 0)
+            canvas_container.layout.addWidget(self.canvas)
+        else:
+            self.canvas.setParent(canvas_container)
 
         right = QWidget()
         right.setMaximumWidth(self.SIDE_PANEL_SIZE*2)
@@ -0,0 +1,81 @@
+"""
+Time to repaint the canvas at low zoom, for images with the same outlines drawn with more and
+more vertices: with level-of-detail drawing, frame time should hardly depend on vertex count.
+
+    python benchmarks/frame_time.py [--annotations 200] [--vertices 50 500 5000] [--frames 20] [--offscreen]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+import cv2
+import numpy as np
+
+
+def make_dataset(root: str, n_annotations: int, vertex_counts) -> str:
+    """one 2000 x 1500 image per vertex count, each with the same noisy circles outlined."""
+    rng = np.random.default_rng(0)
+    centres = rng.uniform((50, 50), (1950, 1450), (n_annotations, 2))
+    radii = rng.uniform(15, 45, n_annotations)
+    os.makedirs(os.path.join(root, 'frames'))
+    images, annotations = [], []
+    for im_id, n in enumerate(vertex_counts):
+        file_name = f'frames/im{n}.png'
+        cv2.imwrite(os.path.join(root, file_name), np.full((1500, 2000), 128, np.uint8))
+        images.append(dict(id=im_id, file_name=file_name, width=2000, height=1500))
+        t = np.linspace(0, 2*np.pi, n, endpoint=False)
+        for (cx, cy), r in zip(centres, radii):
+            ri = r * (1 + 0.05*np.sin(7*t))
+            segmentation = np.stack([cx + ri*np.cos(t), cy + ri*np.sin(t)], axis=1).round(2).reshape(-1)
+            annotations.append(dict(
+                id=len(annotations), image_id=im_id, category_id=2, bbox=[0, 0, 1, 1],
+                segmentation=[segmentation.tolist()], area=1.0, iscrowd=0,
+            ))
+    path = os.path.join(root, 'frames.json')
+    with open(path, 'w') as f:
+        json.dump(dict(images=images, annotations=annotations, categories=[], licenses=[], info={}), f)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--annotations', type=int, default=200)
+    parser.add_argument('--vertices', type=int, nargs='+', default=[50, 500, 5000], help='vertices per outline')
+    parser.add_argument('--frames', type=int, default=20)
+    parser.add_argument('--offscreen', action='store_true', help='use the offscreen Qt platform (e.g. on CI)')
+    args = parser.parse_args()
+
+    if args.offscreen:
+        os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from PySide6.QtWidgets import QApplication
+    from annot.window import MainWindow
+
+    app = QApplication(sys.argv[:1])
+    win = MainWindow()
+    win.show()
+    canvas, browser = win.canvas, win.dataset_browser
+    browser.open_dataset(make_dataset(tempfile.mkdtemp(), args.annotations, args.vertices))
+
+    for scale_i in (0, 1, 2):
+        canvas.scale_i = scale_i
+        for row, n in enumerate(args.vertices):
+            browser.dataset_table.selectRow(row)
+            app.processEvents()
+            # first frame builds the cached paths, and isn't counted
+            canvas.repaint()
+            times = []
+            for _ in range(args.frames):
+                t = time.perf_counter()
+                canvas.repaint()
+                times.append(time.perf_counter() - t)
+            print(f'scale {canvas.scale:.1f}, {args.annotations} outlines of {n:5d} vertices: '
+                  f'median frame {statistics.median(times)*1000:6.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Time from launching `python -m annot` to its window being shown, over several fresh processes.
+
+    python benchmarks/time_to_first_window.py [--runs 5] [--budget 3.0] [--offscreen]
+
+Exits with status 1 if the median is over budget (seconds), so it can be used to catch startup
+time regressions.
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+
+def time_startup(env) -> float:
+    t = time.perf_counter()
+    subprocess.run(
+        [sys.executable, '-m', 'annot', '--quit-when-shown'],
+        env=env, check=True, stdout=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - t
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=3.0, help='maximum median time to first window, in seconds')
+    parser.add_argument('--offscreen', action='store_true', help='use the offscreen Qt platform (e.g. on CI)')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join([root, *filter(None, [env.get('PYTHONPATH')])])
+    if args.offscreen:
+        env['QT_QPA_PLATFORM'] = 'offscreen'
+
+    # first run warms the disk cache, and isn't counted
+    time_startup(env)
+    times = [time_startup(env) for _ in range(args.runs)]
+    median = statistics.median(times)
+    print(f'time to first window: median {median:.2f} s, min {min(times):.2f} s, max {max(times):.2f} s ({args.runs} runs)')
+
+    if median > args.budget:
+        print(f'over budget of {args.budget:.2f} s')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+import cv2
+import numpy as np
+import pytest
+from scipy import ndimage
+
+from annot.aug_worker import apply_augmentations
+from annot.augmentations import ComposedAugmentations, BrightnessAdjust, ContrastAdjust, Smooth
+from annot.augmentations.filter_engine import FilterEngine
+from annot.augmentations.filter_edgedet_3x3 import edge_kernel
+
+
+def adjustments(brightness, contrast):
+    b, c = BrightnessAdjust(), ContrastAdjust()
+    b.set_value(brightness)
+    c.set_value(contrast)
+    return ComposedAugmentations([b, c])
+
+
+@pytest.mark.parametrize('brightness', [-2540, -731, -1, 0, 1, 97, 800, 2540])
+@pytest.mark.parametrize('contrast', [2, 13, 19, 20, 21, 37, 100])
+def test_lookup_table_matches_float_path(brightness, contrast):
+    transform = adjustments(brightness, contrast)
+    image = np.arange(256, dtype=np.uint8).reshape(16, 16)
+    lut = transform.lookup_table()
+    assert lut is not None
+    np.testing.assert_array_equal(lut[image], apply_augmentations(image, transform.frozen()))
+
+
+def test_no_lookup_table_with_spatial_filter():
+    transform = adjustments(100, 30)
+    smooth = Smooth()
+    smooth.set_value(True)
+    transform.augs.append(smooth)
+    assert transform.lookup_table() is None
+
+
+def kernels():
+    """(kernel, path FilterEngine should take) of each kind, odd, even and asymmetric in size."""
+    rng = np.random.default_rng(0)
+    for kh, kw in [(3, 3), (5, 5), (4, 4), (3, 6), (7, 2), (1, 5)]:
+        yield np.full((kh, kw), 1 / (kh * kw)), 'box'
+        centre = -np.ones((kh, kw))
+        centre[kh // 2, kw // 2] = 7.5
+        yield centre, 'centre+box'
+        # a kernel of one row or column is always rank one
+        yield np.outer(rng.standard_normal(kh), rng.standard_normal(kw)), 'separable'
+        yield rng.standard_normal((kh, kw)), 'dense' if kh > 1 and kw > 1 else 'separable'
+
+
+def dense_convolution(image, kernel):
+    kh, kw = kernel.shape
+    flipped = np.asarray(kernel, dtype=np.float32)[::-1, ::-1]
+    return cv2.filter2D(image, -1, flipped, anchor=(kw - 1 - kw // 2, kh - 1 - kh // 2), borderType=cv2.BORDER_REFLECT)
+
+
+@pytest.mark.parametrize('kernel, method', list(kernels()))
+def test_filter_engine_matches_dense_convolution(kernel, method):
+    image = (np.random.default_rng(1).random((61, 47)) * 255).astype(np.float32)
+    engine = FilterEngine(kernel)
+    assert engine.method == method
+    expected = dense_convolution(image, kernel)
+    np.testing.assert_allclose(engine(image), expected, atol=1e-3 * max(np.abs(expected).max(), 1))
+    np.testing.assert_allclose(engine(image), ndimage.convolve(image, kernel.astype(np.float32), mode='reflect'), rtol=1e-4, atol=1e-2)
+
+
+def test_filter_engine_analyse():
+    assert FilterEngine(np.ones((9, 9)) / 81).method == 'box'
+    engine = FilterEngine(edge_kernel(5))
+    assert engine.method == 'centre+box'
+    assert engine.box_weight == pytest.approx(-25)
+    assert engine.centre_weight == pytest.approx(25)
+    assert FilterEngine(np.outer([1, 2, 1], [1, 0, -1])).method == 'separable'
+    assert FilterEngine(np.array([[0, 1, 0], [1, -4, 1], [0, 1, 0]])).method == 'dense'
+    # the centre of an even kernel is at (kh // 2, kw // 2), so this one leaves the image as it is
+    identity = FilterEngine(np.array([[0, 0], [0, 1]]))
+    assert identity.method == 'centre+box'
+    image = np.arange(20, dtype=np.float32).reshape(4, 5)
+    np.testing.assert_array_equal(identity(image), image)
@@ -0,0 +1,146 @@
+import csv
+import json
+
+import cv2
+import numpy as np
+import pytest
+
+from annot import cli
+from annot.class_labels import CLASSES
+from annot.journal import EditJournal
+
+
+def write_dataset(path, file_names, first_id=0):
+    data = dict(
+        info={}, licenses=[], categories=[{'id': 1, 'name': 'a'}],
+        images=[{'id': i, 'file_name': fn, 'width': 100, 'height': 80} for i, fn in enumerate(file_names)],
+        annotations=[
+            {'id': first_id + i, 'image_id': i, 'category_id': 1, 'bbox': [0, 0, 20, 20],
+             'segmentation': [[0, 0, 20, 0, 20, 20, 0, 20]], 'area': 400.0, 'iscrowd': 0}
+            for i in range(len(file_names))
+        ],
+    )
+    with open(path, 'w') as f:
+        json.dump(data, f)
+
+
+def circle(cx, cy, r, n=48):
+    t = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    return np.stack([cx + r * np.cos(t), cy + r * np.sin(t)], axis=1).round(2).reshape(-1).tolist()
+
+
+def square(x, y, size):
+    return [x, y, x + size, y, x + size, y + size, x, y + size]
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    """three images on disk: two with unlabelled circles and a labelled square, one without annotations."""
+    root = tmp_path / 'src'
+    (root / 'frames').mkdir(parents=True)
+    images, annotations = [], []
+    for im_id in range(3):
+        file_name = f'frames/{im_id}.png'
+        cv2.imwrite(str(root / file_name), np.full((200, 300), 100 + im_id, np.uint8))
+        images.append(dict(id=im_id, file_name=file_name, width=300, height=200))
+        if im_id == 2:
+            continue
+        for segmentation, category_id in [(circle(60, 60, 40), 0), (circle(200, 100, 30), 0), (square(10, 150, 30), 2)]:
+            annotations.append(dict(
+                id=len(annotations), image_id=im_id, category_id=category_id, bbox=[0, 0, 1, 1],
+                segmentation=[segmentation], area=1.0, iscrowd=0,
+            ))
+    path = root / 'ds.json'
+    with open(path, 'w') as f:
+        json.dump(dict(info={}, licenses=[], categories=[], images=images, annotations=annotations), f)
+    return path
+
+
+def read(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_merge_over_an_input_drops_its_journal(tmp_path):
+    a, b = tmp_path / 'a.json', tmp_path / 'b.json'
+    write_dataset(a, ['1.png', '2.png'])
+    write_dataset(b, ['2.png', '3.png'], first_id=10)
+    # an edit to b, journalled but not yet compacted: deletes annotation 10
+    with open(tmp_path / ('b' + EditJournal.SUFFIX), 'w') as f:
+        f.write(json.dumps(dict(op='delete', image_id=0, id=10)) + '\n')
+
+    assert cli.main(['merge', '-j', '1', str(b), str(a), str(b)]) == 0
+
+    # merged annotations are given new ids, which the journal's edits would be applied to
+    assert not (tmp_path / ('b' + EditJournal.SUFFIX)).exists()
+    _, _, images, image_annotations, _ = cli.load_dataset(str(b))
+    assert sorted(im.file_name for im in images) == ['1.png', '2.png', '3.png']
+    assert image_annotations.total() == 3
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_stats(dataset, capsys, jobs):
+    assert cli.main(['stats', '-j', jobs, '--json', str(dataset)]) == 0
+    stats = json.loads(capsys.readouterr().out)
+    assert stats['images'] == 3
+    assert stats['unannotated_images'] == 1
+    assert stats['annotations'] == 6
+    assert stats['classes'] == {'unlabelled': 4, CLASSES[1]: 2}
+    assert stats['area']['max'] == pytest.approx(np.pi * 40 * 40, rel=0.01)
+    assert stats['area']['min'] == pytest.approx(30 * 30, rel=0.01)
+
+
+def test_guess(dataset, tmp_path):
+    output, table = tmp_path / 'out' / 'guessed.json', tmp_path / 'features.csv'
+    assert cli.main(['guess', '-j', '1', str(dataset), '-o', str(output), '--features', str(table)]) == 0
+
+    labels = {a['id']: a['category_id'] for a in read(output)['annotations']}
+    spherical = CLASSES.index('Spherical') + 1
+    # circles were unlabelled and are guessed; the square keeps its label
+    assert labels == {0: spherical, 1: spherical, 2: 2, 3: spherical, 4: spherical, 5: 2}
+    assert all(a['category_id'] == 0 for a in read(dataset)['annotations'] if a['id'] in (0, 1))
+    with open(table) as f:
+        rows = list(csv.DictReader(f))
+    assert [int(row['category_id']) for row in rows] == list(labels.values())
+
+
+def test_features(dataset, tmp_path):
+    table = tmp_path / 'features.npz'
+    assert cli.main(['features', '-j', '1', str(dataset), str(table)]) == 0
+    with np.load(table) as f:
+        assert f['annotation_id'].tolist() == [0, 1, 2, 3, 4, 5]
+        assert f['file_name'].tolist() == ['frames/0.png'] * 3 + ['frames/1.png'] * 3
+        assert f['area'][2] == pytest.approx(900)
+        assert f['perimeter'][2] == pytest.approx(120)
+        assert f['circularity'][0] == pytest.approx(1, abs=0.02)
+
+
+def test_simplify(dataset):
+    before = {a['id']: len(a['segmentation'][0]) for a in read(dataset)['annotations']}
+    assert cli.main(['simplify', '-j', '1', str(dataset), '-t', '0.5']) == 0
+    after = {a['id']: len(a['segmentation'][0]) for a in read(dataset)['annotations']}
+    assert after.keys() == before.keys()
+    assert all(after[i] < before[i] for i in (0, 1, 3, 4))
+    assert after[2] == before[2] == 8
+
+
+def test_export_folds_in_journal(dataset, tmp_path):
+    # journalled edits: annotation 0 relabelled as Platelet, 4 deleted
+    with open(str(dataset)[:-len('.json')] + EditJournal.SUFFIX, 'w') as f:
+        f.write(json.dumps(dict(op='relabel', image_id=0, id=0, category_id=5)) + '\n')
+        f.write(json.dumps(dict(op='delete', image_id=1, id=4)) + '\n')
+    output = tmp_path / 'export' / 'out.json'
+
+    assert cli.main([
+        'export', '-j', '1', str(dataset), str(output),
+        '--classes', 'Platelet', 'Regular', '--drop-empty', '--copy-images',
+    ]) == 0
+
+    data = read(output)
+    assert sorted((a['id'], a['category_id']) for a in data['annotations']) == [(0, 5), (2, 2), (5, 2)]
+    assert [im['file_name'] for im in data['images']] == ['frames/0.png', 'frames/1.png']
+    assert (tmp_path / 'export' / 'frames' / '0.png').exists()
+    assert not (tmp_path / 'export' / 'frames' / '2.png').exists()
+    # the source dataset and its journal are left as they were
+    assert len(read(dataset)['annotations']) == 6
+    assert (dataset.parent / ('ds' + EditJournal.SUFFIX)).exists()
@@ -0,0 +1,78 @@
+import struct
+
+import cv2
+import numpy as np
+import pytest
+
+from annot.image_probe import probe_image_size, probe_image_size_from_header, probe_image_sizes
+
+
+SIZES = [(1, 1), (37, 21), (640, 480), (301, 1999)]
+
+
+def write(path, w, h, params=(), channels=1):
+    image = np.random.default_rng(w * h).integers(0, 256, (h, w, channels) if channels > 1 else (h, w), dtype=np.uint8)
+    assert cv2.imwrite(str(path), image, list(params))
+    return str(path)
+
+
+@pytest.mark.parametrize('w, h', SIZES)
+@pytest.mark.parametrize('ext, params, channels', [
+    ('.png', (), 1),
+    ('.png', (), 3),
+    ('.bmp', (), 1),
+    ('.bmp', (), 3),
+    ('.jpg', (), 1),
+    ('.jpg', (cv2.IMWRITE_JPEG_PROGRESSIVE, 1), 3),
+    ('.tif', (), 1),
+    ('.tif', (cv2.IMWRITE_TIFF_COMPRESSION, 1), 3),
+])
+def test_header_size_matches_decoded(tmp_path, w, h, ext, params, channels):
+    path = write(tmp_path / f'im{ext}', w, h, params, channels)
+    h_read, w_read = cv2.imread(path, cv2.IMREAD_UNCHANGED).shape[:2]
+    assert probe_image_size_from_header(path) == (w_read, h_read) == (w, h)
+    assert probe_image_size(path) == (w, h)
+
+
+def big_endian_tiff(w, h):
+    """header and first directory only: width as a SHORT, height as a LONG."""
+    entries = struct.pack('>HHIHH', 256, 3, 1, w, 0) + struct.pack('>HHII', 257, 4, 1, h)
+    return b'MM\x00*' + struct.pack('>I', 8) + struct.pack('>H', 2) + entries + struct.pack('>I', 0)
+
+
+def test_big_endian_tiff(tmp_path):
+    path = tmp_path / 'be.tif'
+    path.write_bytes(big_endian_tiff(1234, 567))
+    assert probe_image_size_from_header(str(path)) == (1234, 567)
+
+
+def test_jpeg_size_after_other_segments(tmp_path):
+    # an APP segment (e.g. EXIF) before the frame header has to be skipped over
+    data = open(write(tmp_path / 'a.jpg', 50, 40), 'rb').read()
+    app1 = b'\xff\xe1' + struct.pack('>H', 2 + 100) + bytes(100)
+    path = tmp_path / 'b.jpg'
+    path.write_bytes(data[:2] + app1 + data[2:])
+    assert probe_image_size_from_header(str(path)) == (50, 40)
+
+
+@pytest.mark.parametrize('ext', ['.png', '.bmp', '.jpg', '.tif'])
+@pytest.mark.parametrize('keep', [0, 3, 10, 20])
+def test_truncated(tmp_path, ext, keep):
+    data = open(write(tmp_path / f'full{ext}', 64, 48), 'rb').read()
+    path = tmp_path / f'cut{ext}'
+    path.write_bytes(data[:keep])
+    assert probe_image_size(str(path)) is None
+
+
+def test_not_an_image(tmp_path):
+    path = tmp_path / 'x.png'
+    path.write_bytes(b'this is not an image at all' * 10)
+    assert probe_image_size_from_header(str(path)) is None
+    assert probe_image_size(str(path)) is None
+    assert probe_image_size(str(tmp_path / 'missing.png')) is None
+
+
+def test_probe_image_sizes_in_order(tmp_path):
+    paths = [write(tmp_path / f'{i}.png', w, h) for i, (w, h) in enumerate(SIZES)]
+    paths.insert(2, str(tmp_path / 'missing.png'))
+    assert probe_image_sizes(paths, max_workers=3) == [*SIZES[:2], None, *SIZES[2:]]
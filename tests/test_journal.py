@@ -0,0 +1,193 @@
+import os
+import json
+import threading
+
+import pytest
+
+from annot.annotation import Annotation
+from annot.journal import EditJournal, Compactor, replay
+from annot import dataset_io
+
+
+def square(x, y, size=20):
+    return [x, y, x + size, y, x + size, y + size, x, y + size]
+
+
+@pytest.fixture
+def dname(tmp_path):
+    data = dict(
+        info={}, licenses=[], categories=[{'id': 1, 'name': 'a'}],
+        images=[{'id': i, 'file_name': f'{i}.png', 'width': 100, 'height': 80} for i in range(3)],
+        annotations=[
+            {'id': k, 'image_id': k % 3, 'category_id': 1, 'bbox': [0, 0, 20, 20],
+             'segmentation': [square(k, k)], 'area': 400.0, 'iscrowd': 0}
+            for k in range(6)
+        ],
+    )
+    with open(tmp_path / 'ds.json', 'w') as f:
+        json.dump(data, f)
+    return str(tmp_path / 'ds')
+
+
+def load(dname):
+    _, _, _, _, image_annotations, _ = dataset_io.load_coco_json(dname + '.json')
+    return image_annotations
+
+
+def summary(image_annotations):
+    return {
+        im_id: sorted((a.id_no, a.class_label, tuple(map(tuple, a.points.array.tolist()))) for a in image_annotations[im_id])
+        for im_id in image_annotations.keys()
+    }
+
+
+def make_edits(image_annotations, journal):
+    """a create, modify, relabel and delete, recorded as the GUI records them."""
+    a = Annotation(image_annotations.image_sizes[1], [(10, 10), (40, 10), (40, 40)], 2)
+    a.im_id, a.id_no = 1, image_annotations.new_id()
+    image_annotations[1].append(a)
+    journal.record('create', a)
+
+    b = image_annotations[0][0]
+    b.points = [(1, 2), (30, 2), (30, 30), (1, 30)]
+    journal.record('modify', b)
+
+    c = image_annotations[2][0]
+    c.set_label(3)
+    journal.record('relabel', c)
+
+    d = image_annotations[2][1]
+    image_annotations[2].remove(d)
+    journal.record('delete', d)
+
+
+def test_replay_applies_journalled_edits(dname):
+    edited = load(dname)
+    journal = EditJournal(dname)
+    make_edits(edited, journal)
+    journal.close()
+
+    recovered = load(dname)
+    assert replay(dname, recovered) == 4
+    assert summary(recovered) == summary(edited)
+
+
+def test_replay_is_idempotent(dname):
+    edited = load(dname)
+    journal = EditJournal(dname)
+    make_edits(edited, journal)
+    journal.close()
+
+    recovered = load(dname)
+    replay(dname, recovered)
+    replay(dname, recovered)
+    assert summary(recovered) == summary(edited)
+
+
+def test_replay_ignores_partly_written_line(dname):
+    edited = load(dname)
+    journal = EditJournal(dname)
+    make_edits(edited, journal)
+    journal.close()
+    with open(dname + EditJournal.SUFFIX, 'a') as f:
+        f.write('{"op":"delete","image_id":0,')
+
+    recovered = load(dname)
+    assert replay(dname, recovered) == 4
+    assert summary(recovered) == summary(edited)
+
+
+def test_compaction_round_trip(dname):
+    edited = load(dname)
+    journal = EditJournal(dname)
+    compactor = Compactor(dname, journal)
+    make_edits(edited, journal)
+    journal.sync()
+    compactor.request()
+    compactor.wait()
+
+    assert not os.path.exists(dname + EditJournal.COMPACTING_SUFFIX)
+    assert os.path.getsize(dname + EditJournal.SUFFIX) == 0
+    assert summary(load(dname)) == summary(edited)
+
+    # edits after compaction are journalled on top of the compacted json
+    a = edited[1][0]
+    a.set_label(4)
+    journal.record('relabel', a)
+    journal.close()
+    recovered = load(dname)
+    assert replay(dname, recovered) == 1
+    assert summary(recovered) == summary(edited)
+
+
+def test_interrupted_compaction_is_replayed_first(dname):
+    edited = load(dname)
+    journal = EditJournal(dname)
+    make_edits(edited, journal)
+    journal.rotate()
+    a = edited[0][0]
+    a.points = [(5, 5), (25, 5), (25, 25)]
+    journal.record('modify', a)
+    journal.close()
+
+    recovered = load(dname)
+    assert replay(dname, recovered) == 5
+    assert summary(recovered) == summary(edited)
+
+
+def test_full_save_waits_for_compaction(dname, monkeypatch):
+    edited = load(dname)
+    journal = EditJournal(dname)
+    compactor = Compactor(dname, journal)
+    make_edits(edited, journal)
+
+    compacting, release = threading.Event(), threading.Event()
+    save_json = dataset_io.save_json
+
+    def slow_save_json(path, data):
+        compacting.set()
+        release.wait(5)
+        save_json(path, data)
+
+    monkeypatch.setattr(dataset_io, 'save_json', slow_save_json)
+    compactor.request()
+    assert compacting.wait(5)
+    monkeypatch.setattr(dataset_io, 'save_json', save_json)
+
+    # the full save has everything in it, so must not be overwritten by the compaction under way
+    b = edited[1][0]
+    b.set_label(4)
+    info, licenses, images, _, _, categories = dataset_io.load_coco_json(dname + '.json')
+    saver = threading.Thread(target=compactor.full_save, args=(lambda: dataset_io.save_json(
+        dname + '.json', dataset_io.as_coco_dict(info, licenses, images, edited, categories)
+    ),))
+    saver.start()
+    release.set()
+    saver.join(5)
+    compactor.wait()
+
+    assert not saver.is_alive()
+    assert os.path.getsize(dname + EditJournal.SUFFIX) == 0
+    assert summary(load(dname)) == summary(edited)
+
+
+def test_replay_delete_then_create_with_the_same_id(dname):
+    edited = load(dname)
+    journal = EditJournal(dname)
+    a = edited[0][0]
+    edited[0].remove(a)
+    journal.record('delete', a)
+    b = Annotation(edited.image_sizes[0], [(1, 1), (9, 1), (9, 9)], 4)
+    b.im_id, b.id_no = 0, a.id_no
+    edited[0].append(b)
+    journal.record('create', b)
+    c = edited[0][0]
+    c.set_label(2)
+    journal.record('relabel', c)
+    edited[0].remove(c)
+    journal.record('delete', c)
+    journal.close()
+
+    recovered = load(dname)
+    assert replay(dname, recovered) == 4
+    assert summary(recovered) == summary(edited)
@@ -0,0 +1,76 @@
+import io
+import json
+
+import pytest
+
+from annot.json_stream import JSONStreamReader
+from annot import dataset_io
+
+
+def read_all(text, chunk_size, streamed=('images', 'annotations')):
+    reader = JSONStreamReader(io.StringIO(text))
+    reader.CHUNK_SIZE = chunk_size
+    result = {}
+    for key, value in reader.object(set(streamed)):
+        result[key] = list(value) if key in streamed else value
+    return result
+
+
+DOCUMENT = dict(
+    info={'description': 'a "quoted" name, with \\ and unicode é', 'year': 2024},
+    images=[{'id': i, 'file_name': f'im/{i}.png', 'width': 1024, 'height': 768} for i in range(5)],
+    annotations=[{'id': 123456789 + i, 'segmentation': [[1.5, -2.25e3, 1e-7, 31415.9265]]} for i in range(7)],
+    empty=[],
+    nothing=None,
+    categories=[],
+)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64, 1 << 20])
+@pytest.mark.parametrize('indent', [None, 2])
+def test_matches_json_load(chunk_size, indent):
+    text = json.dumps(DOCUMENT, indent=indent)
+    assert read_all(text, chunk_size) == DOCUMENT
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 1 << 20])
+def test_empty_arrays_and_object(chunk_size):
+    assert read_all('{"images": [], "annotations": [ ]}', chunk_size) == dict(images=[], annotations=[])
+    assert read_all(' { } ', chunk_size) == {}
+
+
+def test_number_split_across_chunks():
+    # a chunk ending in the middle of a number must not cut it short
+    text = '{"a": 1234567890, "b": [3.25, 100000]}'
+    for chunk_size in range(1, len(text) + 1):
+        assert read_all(text, chunk_size, streamed=('b',)) == dict(a=1234567890, b=[3.25, 100000])
+
+
+@pytest.mark.parametrize('text', ['{"a": 1', '{"a" 1}', '{"images": [1, 2}', '[1]'])
+def test_malformed(text):
+    with pytest.raises(ValueError):
+        read_all(text, 4)
+
+
+def test_load_coco_json(tmp_path):
+    data = dict(
+        info={}, licenses=[], categories=[{'id': 1, 'name': 'a'}],
+        images=[{'id': i, 'file_name': f'dir\\{i}.png', 'width': 100, 'height': 80} for i in range(3)],
+        annotations=[
+            {'id': k, 'image_id': k % 3, 'category_id': 1 + k % 2, 'bbox': [0, 0, 10, 10],
+             'segmentation': [[k, 0, k + 10, 0, k + 10, 10]], 'area': 50.0, 'iscrowd': 0}
+            for k in range(8)
+        ],
+    )
+    path = tmp_path / 'ds.json'
+    path.write_text(json.dumps(data))
+    _, _, images, n_annots, image_annotations, categories = dataset_io.load_coco_json(str(path))
+    assert n_annots == 8
+    assert [im.file_name for im in images] == ['dir/0.png', 'dir/1.png', 'dir/2.png']
+    assert [c.name for c in categories] == ['a']
+    for im in images:
+        expected = [a for a in data['annotations'] if a['image_id'] == im.id]
+        annots = image_annotations[im.id]
+        assert [a.id_no for a in annots] == [a['id'] for a in expected]
+        assert [a.class_label for a in annots] == [a['category_id'] for a in expected]
+        assert [a.points.array.reshape(-1).tolist() for a in annots] == [a['segmentation'][0] for a in expected]
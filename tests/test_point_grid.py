@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from annot.point_grid import PointGrid
+
+
+def random_points(rng, n, extent):
+    return (rng.random((n, 2)) * extent - extent / 3).astype(np.float32)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_within_and_nearest_match_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    points = random_points(rng, int(rng.integers(1, 400)), rng.choice([5, 100, 1000]))
+    grid = PointGrid(points, 16)
+    for _ in range(20):
+        x, y = rng.random(2) * 1200 - 400
+        r = rng.random() * 100
+        d = np.hypot(*(points - (x, y)).T)
+        assert sorted(grid.within(x, y, r).tolist()) == np.flatnonzero(d < r).tolist()
+        assert d[grid.nearest(x, y)] == pytest.approx(d.min(), abs=1e-4)
+
+
+def test_in_box_is_a_superset():
+    rng = np.random.default_rng(0)
+    points = random_points(rng, 500, 300)
+    grid = PointGrid(points, 10)
+    x1, y1, x2, y2 = 20, -30, 95, 41
+    inside = np.flatnonzero((points[:, 0] >= x1) & (points[:, 0] <= x2) & (points[:, 1] >= y1) & (points[:, 1] <= y2))
+    assert set(inside.tolist()) <= set(grid.in_box(x1, y1, x2, y2).tolist())
+    assert not len(grid.in_box(1e4, 1e4, 1e4 + 5, 1e4 + 5))
+
+
+def test_empty():
+    grid = PointGrid(np.zeros((0, 2)), 16)
+    assert len(grid) == 0
+    assert not len(grid.within(0, 0, 100))
+    assert grid.nearest(0, 0) is None
@@ -0,0 +1,69 @@
+import cv2
+import numpy as np
+import pytest
+
+from annot.annotation import Annotation
+from annot.annotation_store import RawAnnotations
+from annot.guess_label import guess_class
+from annot.shape_features import image_shape_features, guess_classes, polygon_areas_perimeters
+
+
+def outlines(rng):
+    """circles, ellipses, stars and random polygons, of a size and number of vertices that vary."""
+    shapes = []
+    for k in range(60):
+        n = int(rng.integers(5, 80))
+        t = np.linspace(0, 2 * np.pi, n, endpoint=False)
+        r = rng.uniform(5, 60)
+        kind = k % 4
+        if kind == 0:
+            x, y = r * np.cos(t), r * np.sin(t)
+        elif kind == 1:
+            x, y = r * np.cos(t), r * rng.uniform(0.1, 0.9) * np.sin(t)
+        elif kind == 2:
+            rr = r * (1 + 0.5 * (np.arange(n) % 2))
+            x, y = rr * np.cos(t), rr * np.sin(t)
+        else:
+            rr = r * rng.uniform(0.5, 1, n)
+            x, y = rr * np.cos(t), rr * np.sin(t)
+        shapes.append(np.stack([x + 200.5, y + 150.25], axis=1))
+    return shapes
+
+
+def packed(shapes):
+    raw = RawAnnotations()
+    for i, points in enumerate(shapes):
+        raw.append(i, 0, points.reshape(-1))
+    return raw
+
+
+def test_areas_perimeters_match_opencv():
+    shapes = outlines(np.random.default_rng(0))
+    raw = packed(shapes)
+    raw.finalise()
+    areas, perimeters = polygon_areas_perimeters(raw.coords.astype(np.float64).reshape(-1, 2), raw.offsets // 2)
+    for points, area, perimeter in zip(shapes, areas, perimeters):
+        contour = points.astype(np.float32).reshape(-1, 1, 2)
+        assert area == pytest.approx(cv2.contourArea(contour), rel=1e-4)
+        assert perimeter == pytest.approx(cv2.arcLength(contour, True), rel=1e-4)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_batch_guesses_match_guess_class(seed):
+    shapes = outlines(np.random.default_rng(seed))
+    raw = packed(shapes)
+    guessed = guess_classes(image_shape_features(raw), raw.category_ids)
+    expected = [guess_class(Annotation((400, 300), points.tolist()).cv_contour()) for points in shapes]
+    assert guessed.tolist() == expected
+
+
+def test_degenerate_outlines_keep_their_labels():
+    raw = RawAnnotations()
+    raw.append(0, 0, [10, 10, 20, 20, 30, 30])
+    raw.append(1, 2, [5, 5])
+    raw.append(2, 0, [0, 0, 20, 0, 20, 20, 0, 20])
+    features = image_shape_features(raw)
+    assert np.isnan(features['convexity'][:2]).all()
+    labels = guess_classes(features, raw.category_ids)
+    assert labels[:2].tolist() == [0, 2]
+    assert labels[2] > 0
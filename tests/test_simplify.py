@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from annot.annotation_store import RawAnnotations
+from annot.simplify import METHODS, simplify_raw, simplify_points, merge_within_cells, _segment_distances
+
+
+def noisy_circle(rng, n, r=50.0):
+    t = np.sort(rng.random(n)) * 2 * np.pi
+    rr = r * (1 + 0.05 * rng.standard_normal(n))
+    return np.stack([100 + rr * np.cos(t), 100 + rr * np.sin(t)], axis=1).astype(np.float32)
+
+
+def distance_to_outline(points, outline):
+    """distance of each point from the closed polygon outline."""
+    a, b = outline, np.roll(outline, -1, axis=0)
+    n, m = len(points), len(outline)
+    d = _segment_distances(
+        np.repeat(points, m, axis=0).astype(np.float64),
+        np.tile(a, (n, 1)).astype(np.float64),
+        np.tile(b, (n, 1)).astype(np.float64),
+    )
+    return d.reshape(n, m).min(axis=1)
+
+
+@pytest.mark.parametrize('seed', range(10))
+@pytest.mark.parametrize('tolerance', [0.5, 2.0, 10.0])
+def test_douglas_peucker_within_tolerance(seed, tolerance):
+    points = noisy_circle(np.random.default_rng(seed), 200)
+    simplified = simplify_points(points, tolerance, 'dp')
+    assert 3 <= len(simplified) <= len(points)
+    assert distance_to_outline(points, simplified).max() <= tolerance + 1e-4
+
+
+@pytest.mark.parametrize('method', list(METHODS))
+def test_never_fewer_than_three_vertices(method):
+    square = np.array([[0, 0], [10, 0], [10, 10], [0, 10], [0, 5]], dtype=np.float32)
+    assert len(simplify_points(square, 1000.0, method)) >= 3
+    triangle = square[:3]
+    np.testing.assert_array_equal(simplify_points(triangle, 1000.0, method), triangle)
+
+
+@pytest.mark.parametrize('method', list(METHODS))
+def test_packed_matches_one_at_a_time(method):
+    rng = np.random.default_rng(1)
+    outlines = [noisy_circle(rng, n) for n in (3, 4, 50, 1, 200, 0, 17)]
+    raw = RawAnnotations()
+    for i, points in enumerate(outlines):
+        raw.append(i, 1 + i % 3, points.reshape(-1))
+    simplified = simplify_raw(raw, 2.0, method)
+    assert simplified.ids == raw.ids
+    assert simplified.category_ids == raw.category_ids
+    for i, points in enumerate(outlines):
+        expected = simplify_points(points, 2.0, method) if len(points) else points
+        np.testing.assert_array_equal(simplified.segmentation(i).reshape(-1, 2), expected)
+
+
+def test_merge_within_cells():
+    points = np.array([[0, 0], [1, 1], [5, 1], [11, 2], [12, 3], [3, 2]], dtype=np.float32)
+    # runs wrap around the ring: the first three vertices are in the run the last one starts
+    np.testing.assert_array_equal(merge_within_cells(points, 10), points[[3, 5]])
+    # a ring within one cell keeps a vertex
+    np.testing.assert_array_equal(merge_within_cells(points[:3], 10), points[:1])
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from annot.annotation import Annotation
+from annot.spatial_index import AnnotationIndex
+
+
+def polygon(rng, cx, cy, r):
+    t = np.sort(rng.random(int(rng.integers(3, 12)))) * 2 * np.pi
+    rr = r * rng.uniform(0.4, 1, len(t))
+    return np.stack([cx + rr * np.cos(t), cy + rr * np.sin(t)], axis=1)
+
+
+def annotations(rng, n):
+    """small and large annotations, many spanning several cells, some overlapping."""
+    radii = rng.choice([5, 30, 100, 250], n)
+    return [Annotation((1000, 800), polygon(rng, *rng.uniform(0, (1000, 800)), r).tolist()) for r in radii]
+
+
+def brute_candidates(annots, x, y):
+    return [a for a in annots if a.bounds()[0] <= x <= a.bounds()[2] and a.bounds()[1] <= y <= a.bounds()[3]]
+
+
+def brute_find(annots, xy):
+    return next((a for a in annots if xy in a), None)
+
+
+def check(index, annots, rng, n=300):
+    for x, y in rng.uniform((-50, -50), (1050, 850), (n, 2)):
+        assert index.candidates(x, y) == brute_candidates(annots, x, y)
+        assert index.find((x, y)) is brute_find(annots, (x, y))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    annots = annotations(rng, 60)
+    index = AnnotationIndex()
+    index.rebuild(annots)
+    check(index, annots, rng)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_update_and_remove(seed):
+    rng = np.random.default_rng(seed)
+    annots = annotations(rng, 40)
+    index = AnnotationIndex()
+    index.rebuild(annots)
+    for _ in range(30):
+        a = annots[int(rng.integers(len(annots)))]
+        action = rng.integers(3)
+        if action == 0:
+            # moved far, into other cells: its old ones must no longer hold it
+            a.points = polygon(rng, *rng.uniform(0, (1000, 800)), rng.choice([5, 100, 250])).tolist()
+            index.update(a)
+        elif action == 1:
+            index.remove(a)
+            annots.remove(a)
+        else:
+            b = Annotation((1000, 800), polygon(rng, *rng.uniform(0, (1000, 800)), 60).tolist())
+            annots.append(b)
+            index.update(b)
+        check(index, annots, rng, 50)
+    assert all(cell for cell in index.cells.values())
+    assert set(index.entries) == set(annots)
+
+
+def test_moved_without_update_is_refreshed_at_its_old_place():
+    a = Annotation((1000, 800), [(10, 10), (50, 10), (50, 50)])
+    index = AnnotationIndex()
+    index.rebuild([a])
+    assert index.find((40, 20)) is a
+    a.points = [(610, 410), (650, 410), (650, 450)]
+    assert index.find((40, 20)) is None
+    # found at the new place, now its stale cells have been refreshed by the query above
+    assert index.find((640, 420)) is a
+    assert a not in index.cells.get((0, 0), [])
+
+
+def test_remove_unknown_and_empty():
+    index = AnnotationIndex()
+    assert index.remove(Annotation((10, 10), [(1, 1), (2, 1), (2, 2)])) is None
+    empty = Annotation((10, 10))
+    index.update(empty)
+    assert index.candidates(0, 0) == []
+    assert index.find((0, 0)) is None
@@ -0,0 +1,53 @@
+import threading
+
+import numpy as np
+import pytest
+
+from annot.tile_pyramid import TilePyramid
+
+
+def built(image):
+    ready = threading.Event()
+    pyramid = TilePyramid(image, ready.set)
+    for level in range(pyramid.n_levels):
+        while pyramid.level(level) is None:
+            assert ready.wait(5)
+            ready.clear()
+    return pyramid
+
+
+@pytest.mark.parametrize('size, n_levels', [((100, 80), 1), ((256, 100), 1), ((512, 300), 2), ((3001, 2000), 4)])
+def test_levels_halve_down_to_the_minimum(size, n_levels):
+    w, h = size
+    pyramid = built(np.zeros((h, w), dtype=np.uint8))
+    assert pyramid.n_levels == n_levels
+    for i, level in enumerate(pyramid.levels):
+        assert level.shape == (-(-h // 2**i), -(-w // 2**i))
+        assert max(level.shape) >= min(TilePyramid.MIN_LEVEL_SIZE, max(w, h))
+
+
+def test_level_for_scale():
+    pyramid = TilePyramid(np.zeros((4000, 4000), dtype=np.uint8))
+    assert pyramid.n_levels == 4
+    assert [pyramid.level_for_scale(s) for s in (2, 1, 0.6, 0.5, 0.3, 0.25, 0.1, 0.01)] == [0, 0, 0, 1, 1, 2, 3, 3]
+
+
+def test_levels_are_area_averages():
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, (1024, 768), dtype=np.uint8)
+    level = built(image).level(1)
+    expected = image.reshape(512, 2, 384, 2).astype(float).mean(axis=(1, 3))
+    assert np.abs(level - expected).max() <= 1
+
+
+def test_visible_tiles_cover_the_region():
+    image = np.arange(1300 * 1100, dtype=np.uint32).reshape(1100, 1300).astype(np.uint8)
+    pyramid = built(image)
+    x1, y1, x2, y2 = 100, 450, 1250, 1090
+    for level in range(pyramid.n_levels):
+        scale = image.shape[1] / pyramid.levels[level].shape[1]
+        covered = np.zeros(image.shape, dtype=bool)
+        for (x, y, w, h), tile in pyramid.visible_tiles(level, x1, y1, x2, y2):
+            assert (tile.width(), tile.height()) == (round(w / scale), round(h / scale))
+            covered[int(round(y)):int(round(y + h)), int(round(x)):int(round(x + w))] = True
+        assert covered[y1:y2, x1:x2].all()